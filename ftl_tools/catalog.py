@@ -0,0 +1,142 @@
+import re
+
+import ftl_tools.tools
+
+# Tool classes by category, as grouped in the README
+CATEGORIES = {
+    "packages": ["Dnf", "Apt", "Pip", "PipRequirements", "Package"],
+    "files": [
+        "LineInFile",
+        "AddLineToFile",
+        "ReplaceLineInFile",
+        "Chown",
+        "Chmod",
+        "Mkdir",
+        "Copy",
+        "CopyFrom",
+        "GetURL",
+        "Unarchive",
+        "Template",
+        "Git",
+    ],
+    "services": ["Service", "SystemDService"],
+    "security": ["AuthorizedKey", "AuthorizedKeys", "FirewallD", "SetSeBool", "Certbot", "User", "Users"],
+    "system": ["User", "Users", "Hostname", "Timezone", "SwapFile", "GatherFacts"],
+    "containers": ["PodmanPull", "PodmanVersion", "PodmanRun"],
+    "commands": ["Bash", "JavaJar", "ReadOutput"],
+    "cloud": ["Linode"],
+    "notifications": ["Slack", "Discord"],
+}
+
+STOP_WORDS = {"a", "an", "and", "as", "by", "for", "from", "in", "is", "of", "on", "or", "the", "to", "tool", "with"}
+
+WORD = re.compile(r"[a-z0-9]+")
+
+
+def tool_classes():
+    return {cls.name: cls for cls in (getattr(ftl_tools.tools, name) for name in ftl_tools.tools.__all__)}
+
+
+def words(text):
+    """Return the normalized keywords in text, with plurals folded."""
+
+    found = set()
+    for word in WORD.findall(re.sub(r"([a-z])([A-Z])", r"\1 \2", text or "").lower()):
+        if word in STOP_WORDS:
+            continue
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        found.add(word)
+    return found
+
+
+class ToolCatalog:
+    """Index of the tools by name, module, category and description keywords.
+
+    Agents that load every tool send every schema with every model call.
+    The catalog lets them start with the tools a task needs and find more
+    with find_tools_tool when they turn out to need them.
+    """
+
+    def __init__(self, classes=None):
+        self.classes = classes or tool_classes()
+        by_class = {cls.__name__: name for name, cls in self.classes.items()}
+        self.categories = {
+            category: [by_class[c] for c in names if c in by_class] for category, names in CATEGORIES.items()
+        }
+        self.entries = {}
+        for name, cls in self.classes.items():
+            if name == "find_tools_tool":
+                # Always loaded by select, never a search result
+                continue
+            categories = [c for c, names in self.categories.items() if name in names]
+            module = getattr(cls, "module", None)
+            modules = getattr(cls, "modules", (module,))
+            self.entries[name] = dict(
+                name=name,
+                module=module,
+                modules=modules,
+                categories=categories,
+                description=cls.description,
+                names=words(name) | words(cls.__name__) | set().union(*(words(m) for m in modules)),
+                keywords=words(cls.description) | set(categories),
+            )
+
+    def describe(self, name):
+        entry = self.entries[name]
+        summary = entry["description"].strip().splitlines()[0] if entry["description"] else ""
+        return dict(name=name, module=entry["module"], categories=entry["categories"], description=summary)
+
+    def search(self, query=None, category=None, module=None, limit=None):
+        """Return the names of the tools matching a query, best first.
+
+        Tools are filtered by category and module, then ranked by how many
+        words of the query appear in their name, module or description.
+        Without a query every tool that passes the filters is returned.
+        """
+
+        if category is not None and category not in self.categories:
+            raise Exception(f"Unknown category {category}, expected one of {', '.join(self.categories)}")
+        query_words = words(query)
+        scored = []
+        for name, entry in self.entries.items():
+            if category is not None and category not in entry["categories"]:
+                continue
+            if module is not None and module not in entry["modules"]:
+                continue
+            score = 3 * len(query_words & entry["names"]) + len(query_words & entry["keywords"])
+            if query_words and not score:
+                continue
+            scored.append((-score, name))
+        return [name for _, name in sorted(scored)][:limit]
+
+    def load(self, state, names):
+        """Return instances of the named tools, by name, using state."""
+
+        unknown = [name for name in names if name not in self.classes]
+        if unknown:
+            raise Exception(f"Unknown tools {', '.join(unknown)}")
+        return {name: self.classes[name](state) for name in names}
+
+    def select(self, state, query=None, categories=(), names=(), limit=10):
+        """Return the tools for a task: those named, those in categories and the best matches for query.
+
+        find_tools_tool is always included so the agent can load more.
+        """
+
+        selected = list(names)
+        for category in categories:
+            selected += self.search(category=category)
+        if query:
+            selected += self.search(query, limit=limit)
+        selected.append("find_tools_tool")
+        return self.load(state, list(dict.fromkeys(selected)))
+
+
+def tool_catalog(state):
+    """Return the catalog kept in state, creating it on first use."""
+
+    catalog = state.get("catalog")
+    if catalog is None:
+        catalog = state["catalog"] = ToolCatalog()
+    return catalog
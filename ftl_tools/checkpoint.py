@@ -0,0 +1,107 @@
+import inspect
+import json
+import os
+import re
+import threading
+import time
+
+from ftl_tools.inventory import limit_hosts
+from ftl_tools.utils import data_path, host_status
+
+DONE = ("ok", "changed", "skipped")
+
+UNSAFE = re.compile(r"[^\w.-]")
+
+# Hosts of steps run with tools that do not target the inventory
+LOCAL = "localhost"
+
+
+class Checkpoint:
+    """Durable record of the (step, host) pairs of a sequence that completed.
+
+    The status of each host is appended to a JSON lines file and synced to
+    disk as its result arrives, so a sequence that is interrupted or fails
+    part way, even in the middle of a step, can be run again and only the
+    remaining work on each host is done.
+    """
+
+    def __init__(self, state, name, path=None):
+        self.state = state
+        self.name = name
+        self.path = path or data_path(state, f"checkpoint-{UNSAFE.sub('_', name)}.jsonl")
+        self.done = set()
+        self.lock = threading.Lock()
+        if os.path.exists(self.path):
+            self.load()
+
+    def load(self):
+        with open(self.path) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # A partial line left by a crash while appending
+                    continue
+                # The latest entry of a pair wins, entries without done mark it complete
+                if entry.get("done", True):
+                    self.done.add((entry["step"], entry["host"]))
+                else:
+                    self.done.discard((entry["step"], entry["host"]))
+
+    def completed(self, step, host_name):
+        return (step, host_name) in self.done
+
+    def mark(self, step, host_names, done=True):
+        with self.lock:
+            changed = [h for h in host_names if ((step, h) in self.done) != done]
+            if not changed:
+                return
+            now = time.time()
+            with open(self.path, "a") as f:
+                f.write("".join(json.dumps(dict(step=step, host=h, done=done, ts=now)) + "\n" for h in changed))
+                f.flush()
+                os.fsync(f.fileno())
+            if done:
+                self.done.update((step, h) for h in changed)
+            else:
+                self.done.difference_update((step, h) for h in changed)
+
+    def step(self, name, tool, limit=None, **kwargs):
+        """Run a tool as a step on the hosts that have not completed it.
+
+        Each host is recorded through state["on_host_result"] as its result
+        arrives, complete when its last dispatch during the step succeeded,
+        so the hosts that finished stay complete even if the tool raises or
+        the process dies before the step ends. Returns the output of the
+        tool, or an empty dict if every host had completed the step already.
+        """
+
+        if "limit" not in inspect.signature(tool.forward).parameters:
+            if self.completed(name, LOCAL):
+                return {}
+            output = tool.forward(**kwargs)
+            self.mark(name, [LOCAL])
+            return output
+
+        remaining = [h for h in limit_hosts(self.state, limit) if not self.completed(name, h)]
+        if not remaining:
+            return {}
+        previous = self.state.get("on_host_result")
+
+        def on_host_result(host_name, results):
+            self.mark(name, [host_name], host_status(results) in DONE)
+            if previous is not None:
+                previous(host_name, results)
+
+        self.state["on_host_result"] = on_host_result
+        try:
+            return tool.forward(limit=remaining, **kwargs)
+        finally:
+            self.state["on_host_result"] = previous
+
+    def reset(self):
+        """Forget the completed steps so the sequence runs from the start."""
+
+        self.done.clear()
+        if os.path.exists(self.path):
+            os.remove(self.path)
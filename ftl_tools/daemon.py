@@ -0,0 +1,260 @@
+import argparse
+import asyncio
+import inspect
+import json
+import logging
+import os
+import socket
+import socketserver
+import threading
+
+import yaml
+from rich.console import Console
+from smolagents.tools import Tool
+
+from ftl_tools.catalog import tool_classes
+from ftl_tools.dispatch import start_loop_thread
+from ftl_tools.gates import prebuilt_gate
+from ftl_tools.inventory import inventory_hosts
+from ftl_tools.wire import THRESHOLD, negotiate, pack, read_frame, supported, unpack, write_frame
+
+
+logger = logging.getLogger("tools")
+
+DEFAULT_SOCKET = "~/.ftl_tools/daemon.sock"
+
+
+class Handler(socketserver.StreamRequestHandler):
+    """Serve newline delimited JSON requests from one client connection."""
+
+    def handle(self):
+        wire = None
+        while True:
+            data = self.rfile.readline() if wire is None else read_frame(self.rfile)
+            if not data:
+                break
+            chosen = None
+            try:
+                request = unpack(data)
+                if request.get("op") == "hello":
+                    chosen = negotiate(request.get("supported", {}))
+                    response = {"ok": True, "result": chosen}
+                else:
+                    response = {"ok": True, "result": self.server.daemon.handle(request)}
+            except Exception as e:
+                response = {"ok": False, "error": str(e) if type(e) is Exception else f"{type(e).__name__}: {e}"}
+            if wire is None:
+                self.wfile.write(json.dumps(response, default=str).encode() + b"\n")
+                self.wfile.flush()
+            else:
+                write_frame(self.wfile, pack(response, threshold=self.server.daemon.threshold, **wire))
+            if chosen is not None:
+                # Later messages on this connection are framed and packed
+                wire = chosen
+
+
+class Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class Daemon:
+    """Own the inventory, gate cache and connections of a state between agent runs.
+
+    Agents talk to the daemon over a Unix socket through the proxy tools
+    from proxy_tools, so the gates it keeps stay warm across agent processes.
+    """
+
+    def __init__(self, state, path=DEFAULT_SOCKET, threshold=THRESHOLD):
+        self.state = state
+        self.path = os.path.expanduser(path)
+        self.threshold = threshold
+        self.tools = {}
+        self.classes = tool_classes()
+        self.lock = threading.Lock()
+        self.server = None
+
+    def tool(self, name):
+        with self.lock:
+            tool = self.tools.get(name)
+            if tool is None:
+                if name not in self.classes:
+                    raise Exception(f"Unknown tool {name}")
+                tool = self.tools[name] = self.classes[name](self.state)
+            return tool
+
+    def handle(self, request):
+        op = request.get("op", "call")
+        if op == "call":
+            return self.tool(request["tool"]).forward(**request.get("args", {}))
+        if op == "ping":
+            return "pong"
+        if op == "status":
+            return {
+                "pid": os.getpid(),
+                "hosts": len(inventory_hosts(self.state["inventory"])),
+                "gates": len(self.state["gate_cache"]),
+                "tools": sorted(self.tools),
+            }
+        if op == "shutdown":
+            threading.Thread(target=self.server.shutdown).start()
+            return "stopping"
+        raise Exception(f"Unknown operation {op}")
+
+    def serve_forever(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        self.server = Server(self.path, Handler)
+        self.server.daemon = self
+        os.chmod(self.path, 0o600)
+        logger.info(f"Serving on {self.path}")
+        try:
+            self.server.serve_forever()
+        finally:
+            self.server.server_close()
+            os.remove(self.path)
+
+
+class DaemonClient:
+    """Connection to a Daemon, shared by the proxy tools of an agent.
+
+    Messages are plain JSON lines by default, since compressing costs more
+    than it saves on a local socket. With compress the client negotiates an
+    encoding and compression with the daemon when it connects, and messages
+    larger than threshold are compressed both ways. Daemons that do not
+    support it are spoken to in plain JSON lines.
+    """
+
+    def __init__(self, path=DEFAULT_SOCKET, compress=False, threshold=THRESHOLD):
+        self.path = os.path.expanduser(path)
+        self.compress = compress
+        self.threshold = threshold
+        self.lock = threading.Lock()
+        self.sock = None
+        self.file = None
+        self.wire = None
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(self.path)
+        self.file = self.sock.makefile("rwb")
+        self.wire = None
+        if self.compress:
+            self.file.write(json.dumps({"op": "hello", "supported": supported()}).encode() + b"\n")
+            self.file.flush()
+            response = json.loads(self.file.readline() or b'{"ok": false}')
+            if response["ok"]:
+                self.wire = response["result"]
+
+    def close(self):
+        if self.sock is not None:
+            self.file.close()
+            self.sock.close()
+            self.sock = self.file = self.wire = None
+
+    def request(self, **request):
+        with self.lock:
+            if self.sock is None:
+                self.connect()
+            try:
+                if self.wire is None:
+                    self.file.write(json.dumps(request, default=str).encode() + b"\n")
+                    self.file.flush()
+                    data = self.file.readline()
+                else:
+                    write_frame(self.file, pack(request, threshold=self.threshold, **self.wire))
+                    data = read_frame(self.file)
+            except OSError:
+                self.close()
+                raise
+            if not data:
+                self.close()
+                raise Exception(f"The daemon at {self.path} closed the connection")
+        response = unpack(data)
+        if not response["ok"]:
+            raise Exception(response["error"])
+        return response["result"]
+
+    def call(self, tool_name, args):
+        return self.request(op="call", tool=tool_name, args=args)
+
+
+def proxy_class(tool_class):
+    """Return a tool class with the interface of tool_class that calls the daemon.
+
+    The proxy takes a state like the tools do, and uses the DaemonClient in
+    state["daemon"].
+    """
+
+    signature = inspect.signature(tool_class.forward)
+
+    def __init__(self, state, *args, **kwargs):
+        self.state = state
+        Tool.__init__(self, *args, **kwargs)
+
+    def forward(self, *args, **kwargs):
+        bound = signature.bind(self, *args, **kwargs)
+        arguments = dict(bound.arguments)
+        del arguments["self"]
+        return self.state["daemon"].call(tool_class.name, arguments)
+
+    forward.__signature__ = signature
+    forward.__doc__ = tool_class.forward.__doc__
+    forward.__name__ = "forward"
+
+    return type(
+        tool_class.__name__,
+        (Tool,),
+        {
+            "name": tool_class.name,
+            "module": getattr(tool_class, "module", None),
+            "description": tool_class.description,
+            "inputs": tool_class.inputs,
+            "output_type": tool_class.output_type,
+            "__init__": __init__,
+            "forward": forward,
+            "__module__": __name__,
+        },
+    )
+
+
+def proxy_tools(state, path=DEFAULT_SOCKET):
+    """Return proxy tools for every tool, connected to the daemon at path."""
+
+    state.setdefault("daemon", DaemonClient(path))
+    return {cls.name: proxy_class(cls)(state) for cls in tool_classes().values()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Keep inventory, gates and connections open for ftl_tools agents")
+    parser.add_argument("--inventory", required=True, help="inventory YAML file")
+    parser.add_argument("--modules", action="append", default=None, help="module directory, may be repeated")
+    parser.add_argument("--gate", default=None, help="prebuilt gate to use")
+    parser.add_argument("--socket", default=DEFAULT_SOCKET, help="path of the Unix socket to listen on")
+    parser.add_argument("--workspace", default=".", help="directory that Copy and Template read files from")
+    parser.add_argument("--secret", action="append", default=[], help="environment variable to pass to the tools as a secret")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    with open(args.inventory) as f:
+        inventory = yaml.safe_load(f)
+    state = {
+        "inventory": inventory,
+        "inventory_file": args.inventory,
+        "modules": args.modules or ["modules"],
+        "gate_cache": {},
+        "gate": prebuilt_gate(args.gate) if args.gate else None,
+        "loop": asyncio.new_event_loop(),
+        "console": Console(),
+        "log": None,
+        "secrets": {name: os.environ[name] for name in args.secret if name in os.environ},
+        "workspace": os.path.abspath(args.workspace),
+        "localhost": {"all": {"hosts": {"localhost": {"ansible_connection": "local"}}}},
+    }
+    # Calls from the connection threads run on the loop concurrently
+    start_loop_thread(state)
+    Daemon(state, args.socket).serve_forever()
+
+
+if __name__ == "__main__":
+    main()
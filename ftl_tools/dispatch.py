@@ -0,0 +1,506 @@
+import asyncio
+import concurrent.futures
+import shlex
+import threading
+import time
+import weakref
+
+import faster_than_light as ftl
+
+from ftl_tools.gate_build import slim_gate
+from ftl_tools.gates import check_gates, discard_gate, touch_gate
+from ftl_tools.inventory import (
+    inventory_hosts,
+    limit_inventory,
+    resolve_host_args,
+    split_inventory,
+    with_hosts,
+    without_hosts,
+)
+from ftl_tools.journal import current_call
+from ftl_tools.latency import latency_tracker
+from ftl_tools.quarantine import TRANSPORT_ERRORS, host_quarantine, is_unreachable
+from ftl_tools.schedule import duration_history
+from ftl_tools.spool import new_spool_id, spool_output
+from ftl_tools.utils import dependencies as default_dependencies
+
+# Hosts run at once when neither forks nor state["forks"] is set
+FORKS = 50
+
+
+def dispatch(state, run, inventory, ignore_quarantine=False, retry=None):
+    """Call run(inventory) and return its per-host results.
+
+    Hosts that recently failed to connect are quarantined and reported as
+    unreachable without being contacted, unless ignore_quarantine or
+    state["ignore_quarantine"] is set.
+
+    retry, or state["retry_policy"] when it is None, is a RetryPolicy. Hosts
+    whose results it accepts are run again on their own after a backoff and
+    their latest results replace the earlier ones, so hosts that succeeded
+    are never run twice.
+
+    state["on_host_result"] is called with the results of each host that
+    was run, unless run sets reports_hosts to say it calls it itself as
+    each host finishes.
+    """
+
+    policy = retry if retry is not None else state.get("retry_policy")
+    output = _dispatch(state, run, inventory, ignore_quarantine)
+    if policy is None or not isinstance(output, dict):
+        return output
+
+    for attempt in range(1, policy.attempts):
+        failed = {h for h, results in output.items() if policy.should_retry(results)}
+        if not failed:
+            break
+        time.sleep(policy.delay(attempt))
+        output.update(_dispatch(state, run, with_hosts(inventory, failed), ignore_quarantine=True, attempt=attempt + 1))
+
+    return output
+
+
+def _dispatch(state, run, inventory, ignore_quarantine, attempt=1):
+    quarantine = host_quarantine(state)
+    skipped = {}
+    if quarantine.hosts and not (ignore_quarantine or state.get("ignore_quarantine")):
+        excluded = quarantine.quarantined(inventory_hosts(inventory))
+        if excluded:
+            inventory = without_hosts(inventory, excluded)
+            skipped = {host_name: quarantine.result(host_name) for host_name in excluded}
+            if not inventory_hosts(inventory):
+                return _recorded(state, skipped, 0.0)
+
+    start = time.perf_counter()
+    try:
+        output = run(inventory)
+    except TRANSPORT_ERRORS as e:
+        # A connection error escaping the dispatch can only be attributed
+        # to a host when there is a single one.
+        hosts = inventory_hosts(inventory)
+        if len(hosts) != 1:
+            raise
+        output = {hosts[0]: dict(failed=True, unreachable=True, msg=str(e))}
+
+    if not isinstance(output, dict):
+        return output
+
+    for host_name, results in output.items():
+        if attempt > 1:
+            # Set before the journal records the hosts
+            results["attempts"] = attempt
+        if is_unreachable(results):
+            quarantine.record_failure(host_name, results.get("msg"))
+        elif host_name in quarantine.hosts:
+            quarantine.record_success(host_name)
+
+    on_result = state.get("on_host_result")
+    if on_result is not None and not getattr(run, "reports_hosts", False):
+        for host_name, results in output.items():
+            on_result(host_name, results)
+
+    output.update(skipped)
+    return _recorded(state, output, time.perf_counter() - start)
+
+
+def _recorded(state, output, elapsed):
+    journal = state.get("journal")
+    if journal is not None:
+        journal.record(current_call.get(), output, elapsed)
+    return output
+
+
+_loop_locks = weakref.WeakKeyDictionary()
+_lock = threading.Lock()
+# Loops driven by a tool call in this process rather than by another thread
+_driven = weakref.WeakSet()
+
+
+def loop_lock(state):
+    with _lock:
+        lock = _loop_locks.get(state["loop"])
+        if lock is None:
+            lock = _loop_locks[state["loop"]] = threading.Lock()
+        return lock
+
+
+def start_loop_thread(state):
+    """Run the loop of state in a background thread.
+
+    Tool calls from several threads then run on the loop concurrently
+    instead of taking turns, which lets sessions sharing a fleet interleave.
+    A loop already running in another thread is left alone, and None is
+    returned.
+    """
+
+    if state.get("loop_thread") is None and state["loop"].is_running():
+        return None
+    thread = state.get("loop_thread")
+    if thread is None or not thread.is_alive():
+        thread = threading.Thread(target=state["loop"].run_forever, name="ftl-tools-loop", daemon=True)
+        thread.start()
+        state["loop_thread"] = thread
+    return thread
+
+
+def loop_in_thread(state):
+    """Return True when the loop of state is run by another thread.
+
+    Coroutines are then submitted to that thread; otherwise the caller
+    drives the idle loop itself. The loop is in another thread when
+    start_loop_thread started it, or when it was already running before
+    state was handed to the tools, as with run_module_sync(loop=...).
+    """
+
+    loop = state["loop"]
+    return state.get("loop_thread") is not None or (loop.is_running() and loop not in _driven)
+
+
+def run_until_complete(state, coro):
+    """Run a coroutine on the loop of state, cancelling it if interrupted.
+
+    Tool calls made from several threads take turns driving an idle loop,
+    and run concurrently on a loop running in another thread. The running
+    task is kept in state["running"] so that cancel can stop it from
+    another thread.
+    """
+
+    if loop_in_thread(state):
+        return _submit(state, coro)
+
+    with loop_lock(state):
+        if loop_in_thread(state):
+            # The loop was started elsewhere while this call waited its turn
+            return _submit(state, coro)
+        return _run_until_complete(state, coro)
+
+
+def _submit(state, coro):
+    future = asyncio.run_coroutine_threadsafe(coro, state["loop"])
+    state["running"] = future
+    try:
+        return future.result()
+    except BaseException:
+        future.cancel()
+        raise
+    finally:
+        state["running"] = None
+
+
+def _run_until_complete(state, coro):
+    loop = state["loop"]
+    task = loop.create_task(coro)
+    state["running"] = task
+    _driven.add(loop)
+    try:
+        return loop.run_until_complete(task)
+    except BaseException:
+        # Tear down the in-flight remote work when the caller is interrupted
+        if not task.done():
+            task.cancel()
+            try:
+                loop.run_until_complete(task)
+            except BaseException:
+                pass
+        raise
+    finally:
+        _driven.discard(loop)
+        state["running"] = None
+
+
+def run_ftl(state, ftl_function, /, *args, **kwargs):
+    """Call a faster_than_light coroutine like copy or mkdir on the loop of state.
+
+    The loop is reached the same way as for run_module, see
+    run_until_complete. ftl_function is positional only so that the
+    helpers can take a name argument, like mkdir does.
+    """
+
+    return run_until_complete(state, getattr(ftl, ftl_function)(*args, **kwargs))
+
+
+def cancel(state):
+    """Cancel the tool call running on the loop of state from any thread."""
+
+    task = state.get("running")
+    if isinstance(task, concurrent.futures.Future):
+        task.cancel()
+    elif task is not None:
+        state["loop"].call_soon_threadsafe(task.cancel)
+
+
+def with_timeout(module_args, timeout):
+    """Wrap a command so the remote host stops it after timeout seconds."""
+
+    command = module_args.get("_raw_params")
+    if not command:
+        return module_args
+    if module_args.get("_uses_shell"):
+        command = f"sh -c {shlex.quote(command)}"
+    return dict(module_args, _raw_params=f"timeout -k 5 {timeout} {command}")
+
+
+def timed_out(results, timeout, elapsed):
+    """Return whether the timeout wrapper stopped a command.
+
+    timeout exits with 124 when the command stopped on TERM, and with 137
+    when the command ignored it and was killed 5 seconds later.
+    """
+
+    rc = results.get("rc")
+    return rc == 124 or (rc == 137 and elapsed >= timeout)
+
+
+async def run_host(state, inventory, host_name, module_name, module_args, dependencies, timeout, spool_id=None):
+    """Run a module on one host, stopping it after timeout seconds.
+
+    The time taken is recorded in the latency tracker of state and added to
+    the result as timing, along with whether the host had a warm gate.
+    Large output is spooled under spool_id.
+    """
+
+    local_timeout = timeout
+    if timeout and module_name == "command":
+        module_args = with_timeout(module_args, timeout)
+        # Leave time for the remote timeout to fire and report back first
+        local_timeout = timeout + 10
+
+    gate = state["gate"]
+    if state.get("slim_gates"):
+        gate = slim_gate(state, host_name, module_name, dependencies) or gate
+    cold = host_name not in state["gate_cache"]
+    start = time.perf_counter()
+    try:
+        output = await asyncio.wait_for(
+            ftl.run_module(
+                inventory,
+                state["modules"],
+                module_name,
+                state["gate_cache"],
+                module_args=module_args,
+                dependencies=dependencies,
+                use_gate=gate,
+            ),
+            local_timeout,
+        )
+    except asyncio.TimeoutError:
+        discard_gate(state, host_name)
+        elapsed = time.perf_counter() - start
+        _record_duration(state, module_name, host_name, elapsed, cold)
+        output = {host_name: dict(failed=True, timeout=True, msg=f"exceeded the {timeout}s timeout")}
+        return _measured(state, module_name, host_name, elapsed, cold, output)
+    except asyncio.CancelledError:
+        discard_gate(state, host_name)
+        raise
+    except TRANSPORT_ERRORS as e:
+        output = {host_name: dict(failed=True, unreachable=True, msg=str(e))}
+        return _measured(state, module_name, host_name, time.perf_counter() - start, cold, output)
+    except Exception as e:
+        output = {host_name: dict(failed=True, msg=f"{type(e).__name__}: {e}")}
+        return _measured(state, module_name, host_name, time.perf_counter() - start, cold, output)
+
+    elapsed = time.perf_counter() - start
+    _record_duration(state, module_name, host_name, elapsed, cold)
+    touch_gate(state, host_name)
+
+    results = output.get(host_name, {})
+    results["timing"] = dict(elapsed=round(elapsed, 4), gate="cold" if cold else "warm")
+    if timeout and module_name == "command" and timed_out(results, timeout, elapsed):
+        results.update(failed=True, timeout=True, msg=f"exceeded the {timeout}s timeout")
+    spool_output(state, host_name, results, spool_id)
+    return _measured(state, module_name, host_name, elapsed, cold, output)
+
+
+def _record_duration(state, module_name, host_name, elapsed, cold):
+    latency_tracker(state).record(module_name, host_name, elapsed, cold)
+    duration_history(state).update(module_name, host_name, elapsed)
+
+
+def _measured(state, module_name, host_name, elapsed, cold, output):
+    results = output.setdefault(host_name, {})
+    results.setdefault("timing", dict(elapsed=round(elapsed, 4), gate="cold" if cold else "warm"))
+    metrics = state.get("metrics")
+    if metrics is not None:
+        metrics.host_result(module_name, host_name, elapsed, cold, results)
+    on_result = state.get("on_host_result")
+    if on_result is not None:
+        on_result(host_name, results)
+    return output
+
+
+def _pool_result(state, module_name):
+    """Return the on_result for a worker pool, recording each host like run_host does."""
+
+    metrics = state.get("metrics")
+    on_result = state.get("on_host_result")
+
+    def record(host_name, results):
+        timing = results.get("timing") or {}
+        if "elapsed" in timing:
+            cold = timing.get("gate") == "cold"
+            if not results.get("unreachable"):
+                _record_duration(state, module_name, host_name, timing["elapsed"], cold)
+            if metrics is not None:
+                metrics.host_result(module_name, host_name, timing["elapsed"], cold, results)
+        if on_result is not None:
+            on_result(host_name, results)
+
+    return record
+
+
+async def run_slot(state, semaphore, *args):
+    """Run a module on a host once the forks limit and scheduler allow it."""
+
+    if semaphore is None:
+        return await run_scheduled(state, *args)
+    async with semaphore:
+        return await run_scheduled(state, *args)
+
+
+async def run_scheduled(state, *args):
+    scheduler = state.get("scheduler")
+    if scheduler is None:
+        return await run_host(state, *args)
+    session = state.get("session", "default")
+    await scheduler.acquire(session, state.get("priority", "normal"))
+    try:
+        return await run_host(state, *args)
+    finally:
+        scheduler.release(session)
+
+
+async def run_hosts(state, inventory, module_name, module_args, host_args, dependencies, timeout, deadline, forks=None, spool_id=None):
+    """Run a module on every host concurrently, each with its own timeout.
+
+    timeout applies to each host and can be overridden with the ftl_timeout
+    host variable. Hosts still running after deadline seconds are cancelled.
+
+    Hosts are started longest first by their duration history, and at most
+    forks hosts run at once when forks is set, so the slowest hosts do not
+    start last and stretch the call. Dead and idle gates of the hosts are
+    discarded first so that they are rebuilt instead of failing the call.
+    The large output of all the hosts is spooled under one spool_id.
+    """
+
+    if spool_id is None:
+        spool_id = new_spool_id()
+    resolved = resolve_host_args(inventory, module_args, host_args) or {}
+    hosts = split_inventory(inventory)
+    check_gates(state, hosts)
+    history = duration_history(state)
+    semaphore = asyncio.Semaphore(forks) if forks else None
+    tasks = {}
+    for host_name in history.longest_first(module_name, hosts):
+        host_inventory = hosts[host_name]
+        args = dict(module_args or {}, **resolved.get(host_name, {}))
+        host_timeout = timeout
+        for group in host_inventory.values():
+            host_timeout = (group.get("vars") or {}).get("ftl_timeout", host_timeout)
+            host_timeout = (group["hosts"][host_name] or {}).get("ftl_timeout", host_timeout)
+        host_run = (host_inventory, host_name, module_name, args, dependencies, host_timeout, spool_id)
+        tasks[host_name] = asyncio.ensure_future(run_slot(state, semaphore, *host_run))
+    if not tasks:
+        return {}
+
+    try:
+        _, pending = await asyncio.wait(tasks.values(), timeout=deadline)
+    except asyncio.CancelledError:
+        for task in tasks.values():
+            task.cancel()
+        await asyncio.gather(*tasks.values(), return_exceptions=True)
+        raise
+    finally:
+        history.save()
+
+    output = {}
+    for host_name in hosts:
+        task = tasks[host_name]
+        if task in pending:
+            task.cancel()
+            output[host_name] = dict(failed=True, timeout=True, msg=f"exceeded the {deadline}s deadline of the call")
+        else:
+            output.update(task.result())
+    if pending:
+        await asyncio.gather(*pending, return_exceptions=True)
+    return output
+
+
+def run_module(
+    state,
+    module_name,
+    module_args=None,
+    host_args=None,
+    dependencies=default_dependencies,
+    inventory=None,
+    limit=None,
+    ignore_quarantine=False,
+    retry=None,
+    timeout=None,
+    deadline=None,
+    forks=None,
+    spool_id=None,
+):
+    """Run a module on every host of the inventory in one concurrent dispatch.
+
+    String arguments may reference inventory variables like {{ host_name }}
+    and host_args maps host names to arguments that override module_args on
+    that host, so one call can set a different value on each host. limit
+    is a host pattern that restricts the run to part of state["inventory"].
+
+    timeout is the number of seconds each host may take, and deadline the
+    number of seconds the whole call may take; they default to
+    state["timeout"] and state["deadline"]. Commands are also stopped on the
+    remote host when they time out. forks, or state["forks"], limits how
+    many hosts run at once, slowest first, and defaults to FORKS; 0 runs
+    them all at once. See dispatch for ignore_quarantine and retry. The
+    large output of the call is spooled under spool_id, which defaults to
+    the id of the journaled tool call or a new one.
+
+    When state["shard_pool"] or state["coordinator"] is set the hosts are
+    run by its worker processes instead. Quarantine, retries, the journal,
+    latency and metrics are still handled in this process, and
+    state["on_host_result"] is called as each host finishes.
+    """
+
+    if inventory is None:
+        inventory = limit_inventory(state, limit)
+    if timeout is None:
+        timeout = state.get("timeout")
+    if deadline is None:
+        deadline = state.get("deadline")
+    if forks is None:
+        forks = state.get("forks", FORKS)
+    if spool_id is None:
+        # Shared by the retries and worker processes of the dispatch
+        spool_id = new_spool_id()
+
+    pool = state.get("shard_pool") or state.get("coordinator")
+    if pool is not None:
+
+        def run(inventory):
+            # The workers neither quarantine nor retry, dispatch does it here
+            return pool.run_module(
+                inventory,
+                module_name,
+                on_result=_pool_result(state, module_name),
+                module_args=module_args,
+                host_args=host_args,
+                dependencies=dependencies,
+                ignore_quarantine=True,
+                timeout=timeout,
+                deadline=deadline,
+                forks=forks,
+                spool_id=spool_id,
+            )
+
+    else:
+
+        def run(inventory):
+            return run_until_complete(
+                state,
+                run_hosts(state, inventory, module_name, module_args, host_args, dependencies, timeout, deadline, forks, spool_id),
+            )
+
+    # run_host and the pools call state["on_host_result"] as each host finishes
+    run.reports_hosts = True
+    return dispatch(state, run, inventory, ignore_quarantine, retry)
@@ -0,0 +1,222 @@
+import json
+import os
+import threading
+import time
+
+from ftl_tools.dispatch import run_module
+from ftl_tools.inventory import limit_hosts
+from ftl_tools.utils import data_path
+
+
+FACTS_SCRIPT = """\
+. /etc/os-release 2> /dev/null
+echo "distribution=${ID:-unknown}"
+echo "distribution_version=${VERSION_ID:-unknown}"
+echo "distribution_like=${ID_LIKE:-${ID:-unknown}}"
+echo "architecture=$(uname -m)"
+for m in dnf yum apt-get zypper apk; do
+  if command -v $m > /dev/null 2>&1; then echo "pkg_mgr=${m%-get}"; break; fi
+done
+echo "init=$(cat /proc/1/comm 2> /dev/null || echo unknown)"
+if command -v getenforce > /dev/null 2>&1; then
+  echo "selinux=$(getenforce | tr A-Z a-z)"
+else
+  echo "selinux=disabled"
+fi
+echo "disk_free_kb=$(df -Pk / | awk 'NR == 2 {print $4}')"
+echo "mem_available_kb=$(awk '/^MemAvailable/ {print $2}' /proc/meminfo)"
+if python3 -c 'import dnf' > /dev/null 2>&1; then echo "python3_dnf=yes"; else echo "python3_dnf=no"; fi
+"""
+
+OS_FAMILIES = {
+    "rhel": "RedHat",
+    "fedora": "RedHat",
+    "centos": "RedHat",
+    "debian": "Debian",
+    "ubuntu": "Debian",
+    "suse": "Suse",
+    "opensuse": "Suse",
+    "alpine": "Alpine",
+}
+
+INTEGER_FACTS = ("disk_free_kb", "mem_available_kb")
+
+DEFAULT_TTL = 3600
+
+# Facts that change while a host is running expire sooner than the rest.
+DEFAULT_TTLS = {
+    "disk_free_kb": 300,
+    "mem_available_kb": 300,
+}
+
+
+def parse_facts(stdout):
+    """Parse the key=value lines printed by FACTS_SCRIPT."""
+
+    facts = {}
+    for line in stdout.splitlines():
+        key, sep, value = line.partition("=")
+        if not sep:
+            continue
+        if key in INTEGER_FACTS:
+            value = int(value) if value.isdigit() else None
+        facts[key] = value
+    for name in [facts.get("distribution", "")] + facts.get("distribution_like", "").split():
+        if name in OS_FAMILIES:
+            facts["os_family"] = OS_FAMILIES[name]
+            break
+    else:
+        facts["os_family"] = "unknown"
+    return facts
+
+
+class FactCache:
+    """Per-host facts with expiry times, persisted as JSON.
+
+    Each fact is stored with the time it was gathered and expires after the
+    TTL in ttls for that fact, or default_ttl. Sessions share the cache, so
+    changes and saves hold lock.
+    """
+
+    def __init__(self, path=None, default_ttl=DEFAULT_TTL, ttls=None):
+        self.path = path
+        self.default_ttl = default_ttl
+        self.ttls = dict(DEFAULT_TTLS, **(ttls or {}))
+        self.hosts = {}
+        self.lock = threading.Lock()
+        if path is not None and os.path.exists(path):
+            self.load()
+
+    def load(self):
+        with open(self.path) as f:
+            self.hosts = json.load(f)
+
+    def save(self):
+        if self.path is None:
+            return
+        # Other processes may save the same file
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with self.lock:
+            with open(tmp, "w") as f:
+                json.dump(self.hosts, f)
+            os.replace(tmp, self.path)
+
+    def set(self, host_name, facts, now=None):
+        now = time.time() if now is None else now
+        with self.lock:
+            entry = self.hosts.setdefault(host_name, {})
+            for key, value in facts.items():
+                entry[key] = [now, value]
+
+    def get(self, host_name, key, default=None, now=None):
+        """Return a fact about a host, or default if it is unknown or expired."""
+
+        entry = self.hosts.get(host_name, {}).get(key)
+        if entry is None:
+            return default
+        now = time.time() if now is None else now
+        if now - entry[0] > self.ttls.get(key, self.default_ttl):
+            return default
+        return entry[1]
+
+    def facts(self, host_name, now=None):
+        """Return the unexpired facts about a host."""
+
+        now = time.time() if now is None else now
+        return {
+            key: value
+            for key, (gathered, value) in self.hosts.get(host_name, {}).items()
+            if now - gathered <= self.ttls.get(key, self.default_ttl)
+        }
+
+    def fresh(self, host_name, now=None, keys=None):
+        """Return True if the facts in keys, or every fact gathered, about a host are unexpired."""
+
+        entry = self.hosts.get(host_name)
+        if not entry:
+            return False
+        now = time.time() if now is None else now
+        if keys is None:
+            keys = list(entry)
+        return all(
+            key in entry and now - entry[key][0] <= self.ttls.get(key, self.default_ttl)
+            for key in keys
+        )
+
+    def invalidate(self, host_name=None):
+        with self.lock:
+            if host_name is None:
+                self.hosts.clear()
+            else:
+                self.hosts.pop(host_name, None)
+
+
+def fact_cache(state):
+    """Return the fact cache of state, loading it from disk on first use."""
+
+    cache = state.get("facts")
+    if cache is None:
+        path = state.get("facts_file") or data_path(state, "facts.json")
+        cache = state["facts"] = FactCache(path)
+    return cache
+
+
+def gather_facts(state, limit=None, refresh=False, failures=None, keys=None):
+    """Gather facts from the hosts whose cached facts are missing or expired.
+
+    All stale hosts are probed in one concurrent dispatch and the cache is
+    saved afterwards. Returns the facts of every selected host. When keys
+    lists the facts the caller needs, only those have to be unexpired, so
+    facts that expire sooner do not make every call probe again. When
+    failures is a dict, the results of the hosts whose probe failed are
+    added to it.
+    """
+
+    cache = fact_cache(state)
+    hosts = limit_hosts(state, limit)
+    stale = hosts if refresh else [h for h in hosts if not cache.fresh(h, keys=keys)]
+    if stale:
+        output = run_module(
+            state,
+            "command",
+            module_args=dict(_uses_shell=True, _raw_params=FACTS_SCRIPT),
+            limit=stale,
+        )
+        for host_name, results in output.items():
+            if not results.get("failed"):
+                cache.set(host_name, parse_facts(results.get("stdout", "")))
+            elif failures is not None:
+                failures[host_name] = results
+        cache.save()
+    return {host_name: cache.facts(host_name) for host_name in hosts}
+
+
+def group_by_fact(state, limit, key):
+    """Group the selected hosts by a cached fact without probing them.
+
+    Hosts without a cached value for the fact are grouped under None.
+    """
+
+    cache = fact_cache(state)
+    groups = {}
+    for host_name in limit_hosts(state, limit):
+        groups.setdefault(cache.get(host_name, key), []).append(host_name)
+    return groups
+
+
+def skip_unsupported(state, limit, key, supported, msg):
+    """Split the selected hosts on whether a cached fact is supported.
+
+    Returns the hosts to run on, which include hosts without cached facts,
+    and skipped results for the hosts whose facts rule the work out.
+    """
+
+    hosts = []
+    skipped = {}
+    for value, group in group_by_fact(state, limit, key).items():
+        if value is None or value in supported:
+            hosts.extend(group)
+        else:
+            for host_name in group:
+                skipped[host_name] = dict(changed=False, skipped=True, msg=f"{msg} ({key}={value})")
+    return hosts, skipped
@@ -0,0 +1,192 @@
+import ast
+import functools
+import hashlib
+import importlib.util
+import logging
+import marshal
+import os
+import re
+import shutil
+import sys
+import time
+import zipfile
+
+from ftl_tools.gates import discard_gate
+from ftl_tools.utils import data_path
+
+
+logger = logging.getLogger("tools")
+
+REQUIREMENT_NAME = re.compile(r"^\s*([A-Za-z0-9_.\-]+)")
+
+
+def find_module(module_dirs, module_name):
+    for module_dir in module_dirs or ():
+        for candidate in (f"{module_name}.py", module_name):
+            path = os.path.join(module_dir, candidate)
+            if os.path.isfile(path):
+                return path
+    return None
+
+
+def imported_names(path):
+    """Return the top level names imported by a Python module, or None if it is not Python."""
+
+    try:
+        with open(path, "rb") as f:
+            tree = ast.parse(f.read(), path)
+    except (SyntaxError, ValueError):
+        return None
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names.update(alias.name.split(".")[0] for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            names.add(node.module.split(".")[0])
+    return names
+
+
+def requirement_name(requirement):
+    return REQUIREMENT_NAME.match(requirement).group(1).replace("-", "_").lower()
+
+
+def module_closure(module_dirs, module_name, dependencies):
+    """Return the modules and dependencies a module needs, or None if unknown.
+
+    The closure holds the module, the modules from module_dirs it imports,
+    recursively, and the dependencies whose packages any of them import.
+    Modules that are not found or are not Python need every dependency.
+    """
+
+    path = find_module(module_dirs, module_name)
+    if path is None:
+        return None
+    modules = {}
+    imports = set()
+    pending = [(module_name, path)]
+    while pending:
+        name, path = pending.pop()
+        if name in modules:
+            continue
+        modules[name] = path
+        names = imported_names(path)
+        if names is None:
+            if name == module_name:
+                return None
+            continue
+        imports.update(names)
+        for imported in names:
+            imported_path = find_module(module_dirs, imported)
+            if imported_path is not None and imported not in modules:
+                pending.append((imported, imported_path))
+    needed = tuple(d for d in dependencies or () if requirement_name(d) in imports)
+    return tuple(sorted(modules)), needed
+
+
+def add_bytecode(source, dest):
+    """Copy a gate zipapp adding compiled .pyc files next to its .py files.
+
+    zipimport loads the .pyc when it was compiled by the same Python version
+    as the remote interpreter and falls back to the source otherwise.
+    """
+
+    with open(source, "rb") as f:
+        first = f.readline()
+    with zipfile.ZipFile(source) as src, open(dest + ".tmp", "wb") as f:
+        if first.startswith(b"#!"):
+            # Keep the interpreter line that zipapp writes before the archive
+            f.write(first)
+        with zipfile.ZipFile(f, "w", zipfile.ZIP_DEFLATED) as out:
+            names = set(src.namelist())
+            for info in src.infolist():
+                data = src.read(info)
+                out.writestr(info, data)
+                if not info.filename.endswith(".py") or info.filename + "c" in names:
+                    continue
+                try:
+                    code = compile(data, info.filename, "exec", dont_inherit=True)
+                except SyntaxError:
+                    continue
+                # zipimport checks the .pyc against the time stamp of the .py entry
+                mtime = int(time.mktime(info.date_time + (0, 0, -1)))
+                header = importlib.util.MAGIC_NUMBER + (0).to_bytes(4, "little")
+                header += (mtime & 0xFFFFFFFF).to_bytes(4, "little") + (len(data) & 0xFFFFFFFF).to_bytes(4, "little")
+                out.writestr(zipfile.ZipInfo(info.filename + "c", info.date_time), header + marshal.dumps(code))
+    os.replace(dest + ".tmp", dest)
+
+
+def build_gate(state, modules, dependencies, interpreter=None):
+    """Build a gate with the given modules and dependencies and return its path and hash.
+
+    slim_gate hands this to ftl as a gate builder, which calls it with the
+    interpreter of the host. Gates are cached in the data directory under a
+    hash of the contents of the modules, the dependencies and the
+    interpreter, and are built once.
+    """
+
+    # Only needed when slim gates are turned on
+    from faster_than_light.gate import build_ftl_gate
+
+    interpreter = interpreter or sys.executable
+    bytecode = state.get("gate_bytecode", True)
+    digest = hashlib.sha256()
+    for name in modules:
+        digest.update(name.encode())
+        with open(find_module(state["modules"], name), "rb") as f:
+            digest.update(f.read())
+    for requirement in dependencies:
+        digest.update(requirement.encode())
+    digest.update(interpreter.encode())
+    digest.update(sys.version.encode())
+    digest.update(b"bytecode" if bytecode else b"source")
+    key = digest.hexdigest()
+
+    built = state.setdefault("gates_built", {})
+    if key in built:
+        return built[key], key
+    path = data_path(state, f"gates/ftl_gate_{key[:16]}.pyz")
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        start = time.perf_counter()
+        gate_path, _ = build_ftl_gate(
+            modules=list(modules),
+            module_dirs=state["modules"],
+            dependencies=list(dependencies),
+            interpreter=interpreter,
+        )
+        if bytecode:
+            add_bytecode(gate_path, path)
+        else:
+            shutil.copyfile(gate_path, path)
+        logger.info(f"Built gate {key[:16]} with {', '.join(modules) or 'no modules'} in {time.perf_counter() - start:.1f}s")
+    built[key] = path
+    return path, key
+
+
+def slim_gate(state, host_name, module_name, dependencies):
+    """Return the gate builder to start a host with for a module, or None for the default.
+
+    The gate holds the closure of the module, merged with the closure of the
+    gate the host already runs. When the cached gate of the host lacks part
+    of the closure it is discarded so that the larger gate replaces it.
+    """
+
+    closure = module_closure(state["modules"], module_name, dependencies)
+    if closure is None:
+        return None
+    modules, needed = closure
+    contents = state.setdefault("gate_contents", {})
+    current = contents.get(host_name)
+    if host_name in state["gate_cache"] and current is None:
+        # The host runs a gate started before slim gates were turned on
+        return None
+    if host_name in state["gate_cache"]:
+        if set(modules) <= set(current[0]) and set(needed) <= set(current[1]):
+            return current[2]
+        discard_gate(state, host_name)
+    if current is not None:
+        modules = tuple(sorted(set(modules) | set(current[0])))
+        needed = tuple(sorted(set(needed) | set(current[1])))
+    builder = functools.partial(build_gate, state, modules, needed)
+    contents[host_name] = (modules, needed, builder)
+    return builder
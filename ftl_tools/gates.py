@@ -0,0 +1,193 @@
+import asyncio
+import functools
+import hashlib
+import logging
+import os
+import threading
+import time
+
+import faster_than_light as ftl
+from faster_than_light.gate import use_gate
+
+from ftl_tools.inventory import host_vars
+from ftl_tools.utils import dependencies
+
+
+logger = logging.getLogger("tools")
+
+
+def prebuilt_gate(path):
+    """Return a gate builder for state["gate"] that uses a gate built ahead of time."""
+
+    path = os.path.abspath(os.path.expanduser(path))
+    if not os.path.isfile(path):
+        raise Exception(f"{path} does not exist")
+    with open(path, "rb") as f:
+        gate_hash = hashlib.sha256(f.read()).hexdigest()
+    return functools.partial(use_gate, path, gate_hash)
+
+
+def discard_gate(state, host_name):
+    """Drop the cached gate of a host and close its process and connection.
+
+    Used when work on a host is abandoned, so the next call starts a fresh
+    gate instead of reusing one that may still be busy.
+    """
+
+    gate = state["gate_cache"].pop(host_name, None)
+    if gate is None:
+        return
+    for part in (getattr(gate, "gate_process", None), getattr(gate, "conn", None)):
+        if part is None:
+            continue
+        try:
+            part.close()
+        except Exception as e:
+            logger.debug(f"Closing the gate of {host_name} failed: {e}")
+
+
+def touch_gate(state, host_name):
+    """Record that the gate of a host was used by a tool call."""
+
+    state.setdefault("gate_used", {})[host_name] = time.monotonic()
+
+
+def gate_alive(gate):
+    """Return False if the process or connection of a gate has gone away."""
+
+    process = getattr(gate, "gate_process", None)
+    if process is not None:
+        if getattr(process, "exit_status", None) is not None:
+            return False
+        is_closing = getattr(process, "is_closing", None)
+        if callable(is_closing) and is_closing():
+            return False
+    conn = getattr(gate, "conn", None)
+    if conn is not None:
+        is_closed = getattr(conn, "is_closed", None)
+        if callable(is_closed) and is_closed():
+            return False
+    return True
+
+
+def check_gates(state, host_names=None):
+    """Discard dead gates and gates left idle for too long.
+
+    Gates unused for state["gate_idle_timeout"] seconds, 30 minutes by
+    default, are closed so their connections and remote processes do not
+    pile up. Only the cached objects are inspected, nothing is sent to the
+    hosts. Returns the hosts whose gates were discarded.
+    """
+
+    gate_cache = state["gate_cache"]
+    used = state.setdefault("gate_used", {})
+    idle_timeout = state.get("gate_idle_timeout", 1800)
+    now = time.monotonic()
+    discarded = []
+    for host_name in list(gate_cache if host_names is None else host_names):
+        gate = gate_cache.get(host_name)
+        if gate is None:
+            continue
+        idle = idle_timeout is not None and now - used.setdefault(host_name, now) > idle_timeout
+        if idle or not gate_alive(gate):
+            logger.debug(f"Discarding the {'idle' if idle else 'dead'} gate of {host_name}")
+            discard_gate(state, host_name)
+            used.pop(host_name, None)
+            discarded.append(host_name)
+    return discarded
+
+
+async def probe_gates(state, host_names, timeout=10):
+    """Run a no-op command through the cached gates of hosts.
+
+    This keeps their connections from idling out and discards the gates
+    that do not answer, so the next call builds a fresh one. Returns the
+    hosts whose gates were discarded.
+    """
+
+    async def probe(host_name):
+        inventory = {"all": {"hosts": {host_name: inventory_vars.get(host_name, {})}}}
+        try:
+            output = await asyncio.wait_for(
+                ftl.run_module(
+                    inventory,
+                    state["modules"],
+                    "command",
+                    state["gate_cache"],
+                    module_args=dict(_raw_params="true"),
+                    dependencies=dependencies,
+                    use_gate=state["gate"],
+                ),
+                timeout,
+            )
+            if not output.get(host_name, {}).get("failed"):
+                return None
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.debug(f"Probing the gate of {host_name} failed: {e}")
+        discard_gate(state, host_name)
+        return host_name
+
+    inventory_vars = host_vars(state["inventory"])
+    results = await asyncio.gather(*(probe(h) for h in host_names if h in state["gate_cache"]))
+    return [h for h in results if h is not None]
+
+
+async def maintain_gates(state, keepalive=300):
+    """Discard idle and dead gates and probe those unused for keepalive seconds.
+
+    ftl reads and deletes state["gate_cache"] entries on the loop, so the
+    cache is only changed from a coroutine running there too.
+    """
+
+    check_gates(state)
+    used = state.get("gate_used", {})
+    now = time.monotonic()
+    stale = [h for h in list(state["gate_cache"]) if now - used.get(h, now) > keepalive]
+    if stale:
+        return await probe_gates(state, stale)
+    return []
+
+
+class GateKeeper:
+    """Background thread that keeps the cached gates of a state healthy.
+
+    Every interval seconds idle and dead gates are discarded, and gates
+    unused for keepalive seconds are probed, by maintain_gates on the loop.
+    """
+
+    def __init__(self, state, interval=60, keepalive=300):
+        self.state = state
+        self.interval = interval
+        self.keepalive = keepalive
+        self.stop = threading.Event()
+        self.thread = threading.Thread(target=self.run, name="ftl-tools-gates", daemon=True)
+
+    def maintain(self):
+        # dispatch imports this module for discard_gate
+        from ftl_tools.dispatch import run_until_complete
+
+        return run_until_complete(self.state, maintain_gates(self.state, self.keepalive))
+
+    def run(self):
+        while not self.stop.wait(self.interval):
+            try:
+                self.maintain()
+            except Exception as e:
+                logger.warning(f"Gate maintenance failed: {e}")
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def close(self):
+        self.stop.set()
+        self.thread.join()
+
+
+def keep_gates(state, interval=60, keepalive=300):
+    """Start a GateKeeper for state, kept in state["gate_keeper"]."""
+
+    state["gate_keeper"] = GateKeeper(state, interval, keepalive).start()
+    return state["gate_keeper"]
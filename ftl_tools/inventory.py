@@ -0,0 +1,260 @@
+import fnmatch
+import re
+
+
+TEMPLATE = re.compile(r"\{\{\s*(\w+)\s*\}\}")
+
+
+def host_vars(inventory):
+    """Return the variables of each host with group vars merged under host vars."""
+
+    all_vars = inventory.get("all", {}).get("vars") or {}
+    hosts = {}
+    for group in inventory.values():
+        group_vars = group.get("vars") or {}
+        for host_name, host in (group.get("hosts") or {}).items():
+            merged = hosts.get(host_name)
+            if merged is None:
+                merged = hosts[host_name] = dict(all_vars, inventory_hostname=host_name)
+            merged.update(group_vars)
+            merged.update(host or {})
+    return hosts
+
+
+def inventory_hosts(inventory):
+    """Return the unique host names of an inventory in inventory order."""
+
+    hosts = {}
+    for group in inventory.values():
+        hosts.update(dict.fromkeys(group.get("hosts") or ()))
+    return list(hosts)
+
+
+def split_inventory(inventory):
+    """Return a single-host inventory for each host, keeping its groups and vars."""
+
+    hosts = {}
+    for name, group in inventory.items():
+        for host_name, host in (group.get("hosts") or {}).items():
+            subgroup = dict(group, hosts={host_name: host})
+            hosts.setdefault(host_name, {})[name] = subgroup
+    return hosts
+
+
+def with_hosts(inventory, included):
+    """Return a copy of an inventory with only the included hosts."""
+
+    subset = {}
+    for name, group in inventory.items():
+        hosts = {h: v for h, v in (group.get("hosts") or {}).items() if h in included}
+        if hosts:
+            subset[name] = dict(group, hosts=hosts)
+    return subset
+
+
+def without_hosts(inventory, excluded):
+    """Return a copy of an inventory with the excluded hosts removed."""
+
+    return {
+        name: dict(group, hosts={h: v for h, v in (group.get("hosts") or {}).items() if h not in excluded})
+        for name, group in inventory.items()
+    }
+
+
+def has_template(value):
+    if isinstance(value, str):
+        return "{{" in value
+    if isinstance(value, (list, tuple)):
+        return any(has_template(v) for v in value)
+    return False
+
+
+def render(value, variables):
+    """Replace {{ var }} references with inventory variables.
+
+    References to unknown variables are left untouched so that commands
+    containing other template syntax pass through unchanged.
+    """
+
+    if isinstance(value, str):
+        return TEMPLATE.sub(
+            lambda m: str(variables[m.group(1)]) if m.group(1) in variables else m.group(0),
+            value,
+        )
+    if isinstance(value, (list, tuple)):
+        return [render(v, variables) for v in value]
+    return value
+
+
+def resolve_host_args(inventory, module_args, host_args=None):
+    """Merge templated module args and explicit per-host args into host_args."""
+
+    templated = {k: v for k, v in (module_args or {}).items() if has_template(v)}
+    if not templated:
+        return host_args
+    resolved = {}
+    for host_name, variables in host_vars(inventory).items():
+        args = {k: render(v, variables) for k, v in templated.items()}
+        args.update((host_args or {}).get(host_name, {}))
+        resolved[host_name] = args
+    return resolved
+
+
+class InventoryIndex:
+    """Index of an inventory for resolving host patterns without scanning it.
+
+    groups maps group names to their hosts, host_groups maps host names to
+    the groups they belong to. refresh only re-indexes groups whose hosts
+    mapping was replaced or whose host names changed, so checking an
+    unchanged inventory costs one comparison of key sets per group.
+    """
+
+    def __init__(self, inventory):
+        self.inventory = inventory
+        self.groups = {}
+        self.host_groups = {}
+        self.hosts = {}
+        self._signatures = {}
+        self._selections = {}
+        self.refresh()
+
+    def refresh(self):
+        changed = [name for name in self._signatures if name not in self.inventory]
+        for name in changed:
+            self._remove_group(name)
+        for name, group in self.inventory.items():
+            hosts = group.get("hosts") or {}
+            signature = self._signatures.get(name)
+            # Hosts replaced in place keep the size of the group but not its keys
+            if signature is None or signature[0] != id(hosts) or hosts.keys() != signature[1]:
+                self._remove_group(name)
+                self._add_group(name, hosts, (id(hosts), frozenset(hosts)))
+                changed.append(name)
+        if changed:
+            self._selections.clear()
+        return bool(changed)
+
+    def _remove_group(self, name):
+        for host_name in self.groups.pop(name, ()):
+            groups = self.host_groups.get(host_name)
+            if groups is None:
+                continue
+            groups.discard(name)
+            if not groups:
+                del self.host_groups[host_name]
+                del self.hosts[host_name]
+        self._signatures.pop(name, None)
+
+    def _add_group(self, name, hosts, signature):
+        self.groups[name] = list(hosts)
+        for host_name in hosts:
+            self.host_groups.setdefault(host_name, set()).add(name)
+            self.hosts.setdefault(host_name, None)
+        self._signatures[name] = signature
+
+    def select(self, limit):
+        """Return the host names matching a limit pattern.
+
+        A limit is a list of terms separated by commas, or by colons when
+        there are no commas. A term is a group name, a host name, a glob
+        like web*, or a regular expression prefixed with ~. Terms prefixed
+        with & intersect the selection and terms prefixed with ! exclude
+        hosts from it. all and * select every host, as does a pattern with
+        only & and ! terms, so !web3 selects every host but web3.
+        """
+
+        selected = self._selections.get(limit)
+        if selected is not None:
+            return selected
+        terms = [t.strip() for t in re.split("," if "," in limit else "[,:]", limit) if t.strip()]
+        include, intersect, exclude = [], [], set()
+        for term in terms:
+            if term.startswith("!"):
+                exclude.update(self._match(term[1:]))
+            elif term.startswith("&"):
+                intersect.append(set(self._match(term[1:])))
+            else:
+                include.extend(self._match(term))
+        if terms and all(t.startswith(("!", "&")) for t in terms):
+            include = list(self.hosts)
+        selected = []
+        seen = set()
+        for host_name in include:
+            if host_name in seen or host_name in exclude:
+                continue
+            if any(host_name not in hosts for hosts in intersect):
+                continue
+            seen.add(host_name)
+            selected.append(host_name)
+        self._selections[limit] = selected
+        return selected
+
+    def _match(self, term):
+        if term in ("all", "*"):
+            return list(self.hosts)
+        if term.startswith("~"):
+            pattern = re.compile(term[1:])
+            return [h for h in self.hosts if pattern.match(h)]
+        if any(c in term for c in "*?["):
+            hosts = [h for h in self.hosts if fnmatch.fnmatchcase(h, term)]
+            for name, group_hosts in self.groups.items():
+                if fnmatch.fnmatchcase(name, term):
+                    hosts.extend(group_hosts)
+            return hosts
+        if term in self.groups:
+            return self.groups[term]
+        if term in self.hosts:
+            return [term]
+        return []
+
+    def subset(self, host_names):
+        """Return an inventory containing only the given hosts."""
+
+        inventory = {}
+        for host_name in host_names:
+            for name in self.host_groups[host_name]:
+                group = self.inventory[name]
+                subgroup = inventory.get(name)
+                if subgroup is None:
+                    subgroup = inventory[name] = {"hosts": {}}
+                    if group.get("vars"):
+                        subgroup["vars"] = group["vars"]
+                subgroup["hosts"][host_name] = group["hosts"][host_name]
+        return inventory
+
+
+def inventory_index(state):
+    """Return the index of state["inventory"], refreshing it if it changed."""
+
+    index = state.get("inventory_index")
+    if index is None or index.inventory is not state["inventory"]:
+        index = state["inventory_index"] = InventoryIndex(state["inventory"])
+    else:
+        index.refresh()
+    return index
+
+
+def limit_hosts(state, limit=None):
+    """Return the host names selected by a limit pattern or list of host names.
+
+    No limit, or an empty pattern, selects every host; an empty list selects none.
+    """
+
+    index = inventory_index(state)
+    if limit is None or (isinstance(limit, str) and not limit):
+        return list(index.hosts)
+    if isinstance(limit, (list, tuple, set)):
+        return [h for h in limit if h in index.hosts]
+    return index.select(limit)
+
+
+def limit_inventory(state, limit=None):
+    """Return the part of state["inventory"] selected by a limit pattern.
+
+    limit may also be a list of host names, which tools use to run on the
+    hosts that remain after filtering a selection.
+    """
+
+    if limit is None or (isinstance(limit, str) and not limit):
+        return state["inventory"]
+    return inventory_index(state).subset(limit_hosts(state, limit))
@@ -0,0 +1,197 @@
+import contextvars
+import functools
+import hashlib
+import json
+import sqlite3
+import time
+import uuid
+
+from ftl_tools.utils import data_path, host_status
+
+
+SCHEMA = """\
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    call_id TEXT,
+    tool TEXT,
+    module TEXT,
+    args_hash TEXT,
+    host TEXT NOT NULL,
+    status TEXT NOT NULL,
+    changed INTEGER NOT NULL,
+    elapsed REAL,
+    output_bytes INTEGER,
+    attempts INTEGER,
+    msg TEXT
+);
+CREATE INDEX IF NOT EXISTS runs_host_ts ON runs (host, ts);
+CREATE INDEX IF NOT EXISTS runs_tool_ts ON runs (tool, ts);
+CREATE INDEX IF NOT EXISTS runs_ts ON runs (ts);
+CREATE INDEX IF NOT EXISTS runs_call_id ON runs (call_id);
+"""
+
+# The tool call that dispatches are journaled under, set by the journaled wrapper.
+# Coroutines submitted to the loop thread inherit it from the calling thread.
+current_call = contextvars.ContextVar("ftl_tools_call", default=None)
+
+COLUMNS = ("id", "ts", "call_id", "tool", "module", "args_hash", "host", "status", "changed", "elapsed", "output_bytes", "attempts", "msg")
+
+
+def args_hash(*args, **kwargs):
+    """Return a short stable hash of tool arguments, so they are not stored."""
+
+    encoded = json.dumps([args, kwargs], sort_keys=True, default=str)
+    return hashlib.sha256(encoded.encode()).hexdigest()[:16]
+
+
+class Journal:
+    """Append-only journal of per-host results in SQLite.
+
+    Rows are only ever inserted, one per host per dispatch, and are indexed
+    by host, tool and time. Arguments are stored as a hash so that secrets
+    passed to tools do not end up on disk.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript(SCHEMA)
+
+    def record(self, call, output, elapsed):
+        """Append the results of one dispatch.
+
+        call is the tool call context set by the tool wrapper, and elapsed
+        is used for hosts whose results carry no timing of their own.
+        """
+
+        call = call or {}
+        now = time.time()
+        rows = []
+        for host_name, results in output.items():
+            if not isinstance(results, dict):
+                continue
+            timing = results.get("timing") or {}
+            msg = results.get("msg")
+            rows.append(
+                (
+                    now,
+                    call.get("id"),
+                    call.get("tool"),
+                    call.get("module"),
+                    call.get("args_hash"),
+                    host_name,
+                    host_status(results),
+                    int(bool(results.get("changed"))),
+                    timing.get("elapsed", elapsed),
+                    len(json.dumps(results, default=str)),
+                    results.get("attempts", 1),
+                    str(msg)[:500] if msg is not None else None,
+                )
+            )
+        with self.db:
+            self.db.executemany(
+                f"INSERT INTO runs ({', '.join(COLUMNS[1:])}) VALUES ({', '.join('?' * (len(COLUMNS) - 1))})",
+                rows,
+            )
+
+    def query(self, host=None, tool=None, status=None, call_id=None, since=None, until=None, limit=100):
+        """Return journal rows as dicts, newest first.
+
+        since and until are Unix timestamps; a negative since is taken as
+        that many seconds ago.
+        """
+
+        where, params = [], []
+        for column, value in (("host", host), ("tool", tool), ("status", status), ("call_id", call_id)):
+            if value is not None:
+                where.append(f"{column} = ?")
+                params.append(value)
+        if since is not None:
+            where.append("ts >= ?")
+            params.append(time.time() + since if since < 0 else since)
+        if until is not None:
+            where.append("ts < ?")
+            params.append(until)
+        sql = f"SELECT {', '.join(COLUMNS)} FROM runs"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY ts DESC, id DESC LIMIT ?"
+        params.append(limit)
+        return [dict(zip(COLUMNS, row)) for row in self.db.execute(sql, params)]
+
+    def last(self, host, tool=None):
+        """Return the latest row for a host, optionally for one tool."""
+
+        rows = self.query(host=host, tool=tool, limit=1)
+        return rows[0] if rows else None
+
+    def summary(self, by="status", since=None, **filters):
+        """Count rows grouped by a column like status, host or tool."""
+
+        if by not in COLUMNS:
+            raise Exception(f"Cannot group the journal by {by}")
+        where, params = [], []
+        for column, value in filters.items():
+            if column not in COLUMNS:
+                raise Exception(f"Unknown journal column {column}")
+            where.append(f"{column} = ?")
+            params.append(value)
+        if since is not None:
+            where.append("ts >= ?")
+            params.append(time.time() + since if since < 0 else since)
+        sql = f"SELECT {by}, COUNT(*), AVG(elapsed) FROM runs"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += f" GROUP BY {by} ORDER BY COUNT(*) DESC"
+        return {key: {"count": count, "mean_elapsed": mean} for key, count, mean in self.db.execute(sql, params)}
+
+    def close(self):
+        self.db.close()
+
+
+def enable_journal(state, path=None):
+    """Record every dispatch of the tools using state in a run journal.
+
+    The journal defaults to journal.sqlite in the data directory.
+    """
+
+    state["journal"] = Journal(path or data_path(state, "journal.sqlite"))
+    return state["journal"]
+
+
+def start_call(tool, args, kwargs):
+    """Set the tool call context that dispatches are journaled under.
+
+    Returns the token to reset current_call with when the call ends.
+    """
+
+    return current_call.set({
+        "id": uuid.uuid4().hex,
+        "tool": tool.name,
+        "module": getattr(tool, "module", None),
+        "args_hash": args_hash(*args, **kwargs),
+    })
+
+
+def journaled(tool_class):
+    """Wrap the forward method of a tool class to journal its dispatches under the call.
+
+    Costs one dictionary lookup per call when state["journal"] is not set.
+    """
+
+    forward = tool_class.forward
+
+    @functools.wraps(forward)
+    def wrapper(self, *args, **kwargs):
+        if self.state.get("journal") is None:
+            return forward(self, *args, **kwargs)
+        token = start_call(self, args, kwargs)
+        try:
+            return forward(self, *args, **kwargs)
+        finally:
+            current_call.reset(token)
+
+    tool_class.forward = wrapper
+    return tool_class
@@ -0,0 +1,104 @@
+import math
+
+
+class LatencyHistogram:
+    """Rolling histogram of latencies in power of two millisecond buckets.
+
+    Bucket i counts samples up to 2**i milliseconds. Once window samples
+    have been added every count is halved, so old samples fade out and the
+    histogram follows recent behaviour in constant memory.
+    """
+
+    BUCKETS = 24
+
+    def __init__(self, window=64):
+        self.window = window
+        self.counts = [0.0] * self.BUCKETS
+        self.added = 0
+        self.samples = 0
+
+    def add(self, seconds):
+        ms = max(seconds * 1000, 1)
+        bucket = min(self.BUCKETS - 1, math.ceil(math.log2(ms)))
+        self.counts[bucket] += 1
+        self.samples += 1
+        self.added += 1
+        if self.added >= self.window:
+            self.counts = [c / 2 for c in self.counts]
+            self.added = 0
+
+    def quantile(self, q):
+        """Return the upper bound in seconds of the bucket holding quantile q."""
+
+        total = sum(self.counts)
+        if not total:
+            return None
+        seen = 0
+        for bucket, count in enumerate(self.counts):
+            seen += count
+            if seen >= q * total:
+                return 2 ** bucket / 1000
+        return 2 ** (self.BUCKETS - 1) / 1000
+
+    def as_dict(self):
+        return {
+            "samples": self.samples,
+            "p50": self.quantile(0.5),
+            "p90": self.quantile(0.9),
+            "p99": self.quantile(0.99),
+            "buckets": {f"le_{2 ** i}ms": round(c, 2) for i, c in enumerate(self.counts) if c},
+        }
+
+
+class LatencyTracker:
+    """Per-host and per-module latency histograms for straggler detection.
+
+    Only runs that reused a warm gate are used to find stragglers, since the
+    first run on a host also pays for connecting and uploading the gate.
+    """
+
+    def __init__(self, window=64):
+        self.window = window
+        self.hosts = {}
+        self.cold_hosts = {}
+        self.modules = {}
+
+    def _histogram(self, histograms, key):
+        histogram = histograms.get(key)
+        if histogram is None:
+            histogram = histograms[key] = LatencyHistogram(self.window)
+        return histogram
+
+    def record(self, module_name, host_name, seconds, cold=False):
+        self._histogram(self.cold_hosts if cold else self.hosts, host_name).add(seconds)
+        self._histogram(self.modules, module_name).add(seconds)
+
+    def stragglers(self, factor=3.0, min_samples=5):
+        """Return the hosts whose median latency is persistently high.
+
+        A host is a straggler when it has at least min_samples warm runs and
+        its median is more than factor times the median of all hosts.
+        Returns (host name, host median, fleet median) tuples, slowest first.
+        """
+
+        medians = {h: hist.quantile(0.5) for h, hist in self.hosts.items() if hist.samples >= min_samples}
+        if len(medians) < 2:
+            return []
+        ordered = sorted(medians.values())
+        fleet = ordered[len(ordered) // 2]
+        slow = [(h, m, fleet) for h, m in medians.items() if m > factor * fleet]
+        return sorted(slow, key=lambda s: s[1], reverse=True)
+
+    def report(self):
+        return {
+            "modules": {name: hist.as_dict() for name, hist in self.modules.items()},
+            "hosts": {name: hist.as_dict() for name, hist in self.hosts.items()},
+            "stragglers": [host_name for host_name, _, _ in self.stragglers()],
+        }
+
+
+def latency_tracker(state):
+    tracker = state.get("latency")
+    if tracker is None:
+        tracker = state["latency"] = LatencyTracker()
+    return tracker
@@ -0,0 +1,197 @@
+import functools
+import json
+import logging
+import os
+import threading
+import time
+
+from ftl_tools.utils import data_path, host_status
+
+
+logger = logging.getLogger("tools")
+
+STREAMS = ("stdout", "stderr")
+
+
+HELP = {
+    "ftl_tools_tool_calls_total": ("counter", "Tool calls"),
+    "ftl_tools_tool_failures_total": ("counter", "Tool calls that raised"),
+    "ftl_tools_tool_seconds": ("summary", "Time spent in tool calls"),
+    "ftl_tools_hosts_contacted_total": ("counter", "Hosts a module was run on"),
+    "ftl_tools_host_failures_total": ("counter", "Hosts a module failed on, by kind"),
+    "ftl_tools_host_seconds": ("summary", "Time spent running a module on a host"),
+    "ftl_tools_gate_cache_hits_total": ("counter", "Hosts that reused a cached gate"),
+    "ftl_tools_gate_cache_misses_total": ("counter", "Hosts that needed a new gate"),
+    "ftl_tools_bytes_received_total": ("counter", "Bytes of command output received"),
+}
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    escaped = (
+        (k, str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for k, v in labels
+    )
+    return "{" + ",".join(f'{k}="{v}"' for k, v in escaped) + "}"
+
+
+class Metrics:
+    """Counters and timers for tool calls, exported as Prometheus text and JSONL.
+
+    The Prometheus file is rewritten and buffered trace events are appended
+    to the JSONL file after every tool call, so both can be tailed or
+    scraped while agents run. Hosts are recorded on the loop thread while
+    tool calls export from theirs, so both hold lock.
+    """
+
+    def __init__(self, prometheus_file=None, trace_file=None):
+        self.prometheus_file = prometheus_file
+        self.trace_file = trace_file
+        self.counters = {}
+        self.summaries = {}
+        self.events = []
+        self.lock = threading.RLock()
+        self.export_lock = threading.Lock()
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, seconds, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            summary = self.summaries.get(key)
+            if summary is None:
+                summary = self.summaries[key] = [0, 0.0]
+            summary[0] += 1
+            summary[1] += seconds
+
+    def trace(self, event, **fields):
+        if self.trace_file is not None:
+            with self.lock:
+                self.events.append(dict(ts=time.time(), event=event, **fields))
+
+    def host_result(self, module_name, host_name, seconds, cold, results):
+        """Record the run of a module on one host."""
+
+        # The size of the output streams, without serializing the results
+        received = sum(
+            results[f"{s}_spool"]["bytes"] if f"{s}_spool" in results else len(results.get(s) or "")
+            for s in STREAMS
+        )
+        status = host_status(results)
+        with self.lock:
+            self.inc("ftl_tools_hosts_contacted_total", module=module_name)
+            self.observe("ftl_tools_host_seconds", seconds, module=module_name)
+            if cold:
+                self.inc("ftl_tools_gate_cache_misses_total", module=module_name)
+            else:
+                self.inc("ftl_tools_gate_cache_hits_total", module=module_name)
+            self.inc("ftl_tools_bytes_received_total", received, module=module_name)
+            if status not in ("ok", "changed", "skipped"):
+                self.inc("ftl_tools_host_failures_total", module=module_name, kind=status)
+            self.trace(
+                "host",
+                module=module_name,
+                host=host_name,
+                seconds=round(seconds, 6),
+                gate="cold" if cold else "warm",
+                status=status,
+                bytes_received=received,
+            )
+
+    def tool_call(self, tool_name, seconds, failed):
+        """Record a tool call and export the metrics.
+
+        Errors exporting are logged, never raised into the tool call.
+        """
+
+        with self.lock:
+            self.inc("ftl_tools_tool_calls_total", tool=tool_name)
+            self.observe("ftl_tools_tool_seconds", seconds, tool=tool_name)
+            if failed:
+                self.inc("ftl_tools_tool_failures_total", tool=tool_name)
+            self.trace("tool", tool=tool_name, seconds=round(seconds, 6), failed=failed)
+        try:
+            self.export()
+        except Exception as e:
+            logger.warning(f"Could not export metrics: {type(e).__name__}: {e}")
+
+    def prometheus(self):
+        lines = []
+        described = set()
+
+        def describe(name):
+            if name not in described and name in HELP:
+                kind, text = HELP[name]
+                lines.append(f"# HELP {name} {text}")
+                lines.append(f"# TYPE {name} {kind}")
+                described.add(name)
+
+        with self.lock:
+            counters = sorted(self.counters.items())
+            summaries = sorted((key, tuple(value)) for key, value in self.summaries.items())
+        for (name, labels), value in counters:
+            describe(name)
+            lines.append(f"{name}{_labels(labels)} {value}")
+        for (name, labels), (count, total) in summaries:
+            describe(name)
+            lines.append(f"{name}_count{_labels(labels)} {count}")
+            lines.append(f"{name}_sum{_labels(labels)} {total}")
+        return "\n".join(lines) + "\n"
+
+    def export(self):
+        # Tool calls in other threads export too, and share the temporary file
+        with self.export_lock:
+            if self.prometheus_file is not None:
+                tmp = f"{self.prometheus_file}.tmp"
+                with open(tmp, "w") as f:
+                    f.write(self.prometheus())
+                os.replace(tmp, self.prometheus_file)
+            with self.lock:
+                events, self.events = self.events, []
+            if self.trace_file is not None and events:
+                with open(self.trace_file, "a") as f:
+                    f.write("".join(json.dumps(e, default=str) + "\n" for e in events))
+
+
+def enable_metrics(state, prometheus_file=None, trace_file=None):
+    """Turn on metrics for the tools using state.
+
+    The files default to metrics.prom and trace.jsonl in the data directory.
+    """
+
+    state["metrics"] = Metrics(
+        prometheus_file or data_path(state, "metrics.prom"),
+        trace_file or data_path(state, "trace.jsonl"),
+    )
+    return state["metrics"]
+
+
+def instrument(tool_class):
+    """Wrap the forward method of a tool class to record calls in state["metrics"].
+
+    The wrapper keeps the signature of forward, and costs one dictionary
+    lookup per call when metrics are off.
+    """
+
+    forward = tool_class.forward
+
+    @functools.wraps(forward)
+    def instrumented(self, *args, **kwargs):
+        metrics = self.state.get("metrics")
+        if metrics is None:
+            return forward(self, *args, **kwargs)
+        start = time.perf_counter()
+        failed = True
+        try:
+            result = forward(self, *args, **kwargs)
+            failed = False
+            return result
+        finally:
+            metrics.tool_call(self.name, time.perf_counter() - start, failed)
+
+    tool_class.forward = instrumented
+    return tool_class
@@ -0,0 +1,80 @@
+import time
+
+import asyncssh
+
+
+# Errors raised while connecting to a host or talking to its gate, as
+# opposed to failures reported by the module run on the host
+TRANSPORT_ERRORS = (OSError, asyncssh.Error)
+
+
+def is_unreachable(results):
+    """Return True if a host result reports a connection failure.
+
+    Only run_host marks results unreachable, when the connection or gate
+    raised one of TRANSPORT_ERRORS. The messages of module failures are not
+    looked at, since a module that fails to reach a mirror or a URL says
+    nothing about whether its host can be reached.
+    """
+
+    return bool(results.get("unreachable"))
+
+
+class Quarantine:
+    """Tracks unreachable hosts and when they may be probed again.
+
+    Each consecutive connection failure doubles the time a host is skipped,
+    from base_delay up to max_delay. Once that time has passed the next call
+    probes the host again; a success releases it and another failure puts it
+    back for longer.
+    """
+
+    def __init__(self, base_delay=30, max_delay=3600):
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.hosts = {}
+
+    def record_failure(self, host_name, msg=None, now=None):
+        now = time.time() if now is None else now
+        failures = self.hosts.get(host_name, {}).get("failures", 0) + 1
+        delay = min(self.max_delay, self.base_delay * 2 ** (failures - 1))
+        self.hosts[host_name] = dict(failures=failures, until=now + delay, msg=msg)
+
+    def record_success(self, host_name):
+        self.hosts.pop(host_name, None)
+
+    def quarantined(self, host_names, now=None):
+        """Return the hosts that are still quarantined among host_names."""
+
+        if not self.hosts:
+            return set()
+        now = time.time() if now is None else now
+        return {
+            h for h in host_names
+            if h in self.hosts and now < self.hosts[h]["until"]
+        }
+
+    def result(self, host_name):
+        entry = self.hosts[host_name]
+        return dict(
+            changed=False,
+            unreachable=True,
+            quarantined=True,
+            msg=f"host is quarantined after {entry['failures']} connection failures, "
+            f"next probe in {max(0, int(entry['until'] - time.time()))}s: {entry['msg']}",
+        )
+
+    def reset(self, host_name=None):
+        """Release one host, or every host, from quarantine."""
+
+        if host_name is None:
+            self.hosts.clear()
+        else:
+            self.hosts.pop(host_name, None)
+
+
+def host_quarantine(state):
+    quarantine = state.get("quarantine")
+    if quarantine is None:
+        quarantine = state["quarantine"] = Quarantine()
+    return quarantine
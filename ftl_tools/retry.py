@@ -0,0 +1,78 @@
+import functools
+import random
+import re
+
+from ftl_tools.quarantine import is_unreachable
+
+
+@functools.lru_cache(maxsize=None)
+def word_pattern(text):
+    """Return a regular expression matching text as whole words, ignoring case."""
+
+    return re.compile(rf"(?<!\w){re.escape(text.lower())}(?!\w)")
+
+
+class RetryPolicy:
+    """Which failed hosts to run again, how often, and how long to wait.
+
+    retry_on lists error classes: unreachable for connection failures,
+    timeout for results mentioning a timeout and failed for any failure.
+    Any other entry is matched case-insensitively against whole words of
+    the failure message, so transient errors can be named by their text.
+    A number, like "503", also matches the HTTP status_code of the result.
+    """
+
+    def __init__(self, attempts=3, backoff=1.0, max_backoff=30.0, retry_on=("unreachable", "timeout")):
+        self.attempts = attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.retry_on = tuple(retry_on)
+
+    def should_retry(self, results):
+        if results.get("quarantined"):
+            return False
+        unreachable = is_unreachable(results)
+        if not (unreachable or results.get("failed")):
+            return False
+        msg = str(results.get("msg", "")).lower()
+        for error in self.retry_on:
+            if error == "failed":
+                return True
+            if error == "unreachable":
+                if unreachable:
+                    return True
+            elif error == "timeout":
+                if results.get("timeout") or "timed out" in msg:
+                    return True
+            elif error.isdigit() and str(results.get("status_code")) == error:
+                return True
+            elif word_pattern(error).search(msg):
+                return True
+        return False
+
+    def delay(self, attempt):
+        """Return the seconds to wait before the given retry, starting at 1."""
+
+        delay = min(self.max_backoff, self.backoff * 2 ** (attempt - 1))
+        return delay + random.uniform(0, delay / 10)
+
+
+# Package managers and downloads fail transiently when a mirror hiccups.
+# Only connection and transfer errors are retried: a run that hit its own
+# timeout would most likely hit it again, taking three times as long.
+DOWNLOAD_RETRY = RetryPolicy(
+    attempts=3,
+    backoff=2.0,
+    retry_on=(
+        "unreachable",
+        "connection timed out",
+        "read timed out",
+        "timeout was reached",
+        "failed to download",
+        "cannot download",
+        "could not resolve host",
+        "temporary failure",
+        "connection reset",
+        "503",
+    ),
+)
@@ -0,0 +1,65 @@
+import json
+import os
+
+from ftl_tools.utils import data_path
+
+
+class DurationHistory:
+    """Moving averages of how long each module takes on each host.
+
+    Durations are kept as exponentially weighted moving averages, so a host
+    that becomes faster or slower is picked up after a few runs, and are
+    persisted as JSON between sessions.
+    """
+
+    def __init__(self, path=None, alpha=0.3):
+        self.path = path
+        self.alpha = alpha
+        self.modules = {}
+        if path is not None and os.path.exists(path):
+            self.load()
+
+    def load(self):
+        with open(self.path) as f:
+            self.modules = json.load(f)
+
+    def save(self):
+        if self.path is None:
+            return
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.modules, f)
+        os.replace(tmp, self.path)
+
+    def update(self, module_name, host_name, seconds):
+        hosts = self.modules.setdefault(module_name, {})
+        previous = hosts.get(host_name)
+        if previous is None:
+            hosts[host_name] = seconds
+        else:
+            hosts[host_name] = previous + self.alpha * (seconds - previous)
+
+    def estimate(self, module_name, host_name, default=None):
+        return self.modules.get(module_name, {}).get(host_name, default)
+
+    def longest_first(self, module_name, host_names):
+        """Order hosts by their expected duration, slowest first.
+
+        Hosts without history are expected to take the mean duration of the
+        module, or are started first if the module has never been run.
+        """
+
+        hosts = self.modules.get(module_name, {})
+        if not hosts:
+            return list(host_names)
+        mean = sum(hosts.values()) / len(hosts)
+        return sorted(host_names, key=lambda h: hosts.get(h, mean), reverse=True)
+
+
+def duration_history(state):
+    """Return the duration history of state, loading it from disk on first use."""
+
+    history = state.get("durations")
+    if history is None:
+        history = state["durations"] = DurationHistory(data_path(state, "durations.json"))
+    return history
@@ -0,0 +1,154 @@
+import asyncio
+from collections import OrderedDict, deque
+
+from ftl_tools.dispatch import start_loop_thread
+from ftl_tools.facts import fact_cache
+from ftl_tools.inventory import inventory_index
+from ftl_tools.latency import latency_tracker
+from ftl_tools.quarantine import host_quarantine
+from ftl_tools.schedule import duration_history
+from ftl_tools.singleflight import single_flight
+
+PRIORITIES = {"high": 0, "normal": 1, "low": 2}
+
+
+class Scheduler:
+    """Share a fleet between sessions by handing out in-flight host slots.
+
+    At most capacity hosts run at once across all sessions, and at most the
+    quota of a session run for that session. Waiting hosts are served by
+    priority class, and sessions within a class take turns, so a session
+    that queues a thousand hosts cannot starve one that queues ten.
+
+    The scheduler is used from the event loop only and needs no locking.
+    """
+
+    def __init__(self, capacity=None, quota=None, quotas=None):
+        self.capacity = capacity
+        self.quota = quota
+        self.quotas = dict(quotas or {})
+        self.in_flight = 0
+        self.sessions = {}
+        self.queues = {p: OrderedDict() for p in sorted(set(PRIORITIES.values()))}
+
+    def session_quota(self, session):
+        return self.quotas.get(session, self.quota)
+
+    def _available(self, session):
+        if self.capacity is not None and self.in_flight >= self.capacity:
+            return False
+        quota = self.session_quota(session)
+        return quota is None or self.sessions.get(session, 0) < quota
+
+    def _grant(self, session):
+        self.in_flight += 1
+        self.sessions[session] = self.sessions.get(session, 0) + 1
+
+    async def acquire(self, session="default", priority="normal"):
+        if priority not in PRIORITIES:
+            raise Exception(f"Unknown priority {priority}, expected one of {', '.join(PRIORITIES)}")
+        level = PRIORITIES[priority]
+        future = asyncio.get_running_loop().create_future()
+        self.queues[level].setdefault(session, deque()).append(future)
+        self._wake()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # The slot was granted just as the waiter was cancelled
+                self.release(session)
+            else:
+                self._forget(level, session, future)
+            raise
+
+    def _forget(self, level, session, future):
+        waiters = self.queues[level].get(session)
+        if waiters is None:
+            return
+        try:
+            waiters.remove(future)
+        except ValueError:
+            pass
+        if not waiters:
+            del self.queues[level][session]
+
+    def release(self, session="default"):
+        self.in_flight -= 1
+        self.sessions[session] -= 1
+        if not self.sessions[session]:
+            del self.sessions[session]
+        self._wake()
+
+    def _wake(self):
+        granted = True
+        while granted:
+            granted = False
+            for queue in self.queues.values():
+                for session in list(queue):
+                    if self.capacity is not None and self.in_flight >= self.capacity:
+                        return
+                    waiters = queue[session]
+                    while waiters and waiters[0].done():
+                        waiters.popleft()
+                    if waiters and self._available(session):
+                        self._grant(session)
+                        waiters.popleft().set_result(None)
+                        # Serve the other sessions of the class before this one again
+                        queue.move_to_end(session)
+                        granted = True
+                    if not waiters:
+                        del queue[session]
+                if granted:
+                    # Start again from the highest priority class
+                    break
+
+    def status(self):
+        return {
+            "in_flight": self.in_flight,
+            "sessions": dict(self.sessions),
+            "waiting": {
+                name: {session: len(w) for session, w in self.queues[level].items()}
+                for name, level in PRIORITIES.items()
+                if self.queues[level]
+            },
+        }
+
+
+def enable_scheduler(state, capacity=None, quota=None, quotas=None):
+    """Share the fleet of state between sessions through a Scheduler.
+
+    The loop of state is moved to its own thread so that the tool calls of
+    different sessions run at the same time. Create the sessions with
+    session_state afterwards.
+    """
+
+    state["scheduler"] = Scheduler(capacity, quota, quotas)
+    if not state["loop"].is_running():
+        start_loop_thread(state)
+    return state["scheduler"]
+
+
+def share_stores(state):
+    """Create the caches of state that are otherwise created on first use.
+
+    Session states are copies of state, so a cache created later in one of
+    them would not be seen by the others.
+    """
+
+    host_quarantine(state)
+    latency_tracker(state)
+    fact_cache(state)
+    inventory_index(state)
+    duration_history(state)
+    single_flight(state)
+    for name in ("gate_used", "gate_contents", "gates_built"):
+        state.setdefault(name, {})
+
+
+def session_state(state, session, priority="normal"):
+    """Return a state for one session that shares the fleet, loop and caches of state."""
+
+    if priority not in PRIORITIES:
+        raise Exception(f"Unknown priority {priority}, expected one of {', '.join(PRIORITIES)}")
+    share_stores(state)
+    return dict(state, session=session, priority=priority, running=None)
@@ -0,0 +1,188 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import time
+import traceback
+import uuid
+import zlib
+
+from ftl_tools.dispatch import run_module
+from ftl_tools.inventory import inventory_hosts, with_hosts
+from ftl_tools.schedule import DurationHistory
+from ftl_tools.utils import data_path
+
+
+logger = logging.getLogger("tools")
+
+
+def _worker(index, modules, gate, data_dir, tasks, results):
+    """Run module calls for one shard of the fleet with its own loop and gates."""
+
+    state = {
+        "inventory": {},
+        "modules": modules,
+        "gate_cache": {},
+        "gate": gate,
+        "loop": asyncio.new_event_loop(),
+        "console": None,
+        "log": None,
+        "data_dir": data_dir,
+    }
+    state["durations"] = DurationHistory(data_path(state, f"durations-{index}.json"))
+
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        call_id, inventory, module_name, kwargs = task
+        sent = {}
+
+        def on_host_result(host_name, result, call_id=call_id, sent=sent):
+            # Copied, since the queue pickles it later in another thread
+            sent[host_name] = dict(result)
+            results.put(("host", call_id, host_name, sent[host_name]))
+
+        state["on_host_result"] = on_host_result
+        try:
+            output = run_module(state, module_name, inventory=inventory, **kwargs)
+            # Only the results that were not streamed as they are, like those changed afterwards
+            results.put(("done", call_id, index, {h: r for h, r in output.items() if sent.get(h) != r}))
+        except BaseException as e:
+            results.put(("error", call_id, index, f"{type(e).__name__}: {e}\n{traceback.format_exc()}"))
+    state["loop"].close()
+
+
+class ShardPool:
+    """Worker processes that each run modules on a fixed shard of the fleet.
+
+    Every host is always sent to the same worker, so the gates each worker
+    keeps in its own gate cache stay warm across calls. Results from the
+    workers are streamed back as hosts finish and merged into one report.
+    A reader thread routes them to their call, so calls from several
+    sessions run on the workers at the same time.
+    """
+
+    def __init__(self, state, workers=None, context="spawn"):
+        self.state = state
+        self.workers = workers or os.cpu_count() or 1
+        ctx = multiprocessing.get_context(context)
+        self.results = ctx.Queue()
+        self.lock = threading.Lock()
+        self.calls = {}
+        self.tasks = []
+        self.processes = []
+        data_dir = os.path.expanduser(state.get("data_dir", "~/.ftl_tools"))
+        for index in range(self.workers):
+            tasks = ctx.Queue()
+            process = ctx.Process(
+                target=_worker,
+                args=(index, state["modules"], state["gate"], data_dir, tasks, self.results),
+                name=f"ftl-tools-shard-{index}",
+                daemon=True,
+            )
+            process.start()
+            self.tasks.append(tasks)
+            self.processes.append(process)
+        self.reader = threading.Thread(target=self.read, name="ftl-tools-shard-results", daemon=True)
+        self.reader.start()
+
+    def read(self):
+        """Route the messages of the workers to the queues of their calls."""
+
+        while True:
+            message = self.results.get()
+            if message is None:
+                break
+            with self.lock:
+                call = self.calls.get(message[1])
+            if call is None:
+                logger.debug(f"Dropping a result of an abandoned call {message[1]}")
+                continue
+            call.put(message)
+
+    def shard(self, host_name):
+        return zlib.crc32(host_name.encode()) % self.workers
+
+    def run_module(self, inventory, module_name, on_result=None, host_args=None, **kwargs):
+        """Run a module on the hosts of inventory across the workers.
+
+        on_result, or state["on_host_result"], is called with each host name
+        and result as the host finishes. The keyword arguments are passed to
+        dispatch.run_module in the workers.
+        """
+
+        on_result = on_result or self.state.get("on_host_result")
+        hosts = inventory_hosts(inventory)
+        shards = {}
+        for host_name in hosts:
+            shards.setdefault(self.shard(host_name), []).append(host_name)
+
+        call_id = uuid.uuid4().hex
+        messages = queue.Queue()
+        with self.lock:
+            self.calls[call_id] = messages
+        try:
+            return self._collect(call_id, messages, inventory, module_name, on_result, host_args, hosts, shards, kwargs)
+        finally:
+            with self.lock:
+                del self.calls[call_id]
+
+    def _collect(self, call_id, messages, inventory, module_name, on_result, host_args, hosts, shards, kwargs):
+        for index, shard_hosts in shards.items():
+            shard_args = {h: a for h, a in (host_args or {}).items() if h in shard_hosts} or None
+            self.tasks[index].put(
+                (call_id, with_hosts(inventory, set(shard_hosts)), module_name, dict(kwargs, host_args=shard_args))
+            )
+
+        output = {}
+        pending = set(shards)
+        errors = []
+        while pending:
+            try:
+                kind, _, key, value = messages.get(timeout=1)
+            except queue.Empty:
+                dead = [i for i in pending if not self.processes[i].is_alive()]
+                if dead:
+                    raise Exception(f"Shard workers {', '.join(map(str, dead))} exited during the call")
+                continue
+            if kind == "host":
+                output[key] = value
+                if on_result is not None:
+                    on_result(key, value)
+            elif kind == "done":
+                for host_name, result in value.items():
+                    output[host_name] = result
+                    if on_result is not None:
+                        on_result(host_name, result)
+                pending.discard(key)
+            else:
+                errors.append(value)
+                pending.discard(key)
+        if errors:
+            raise Exception(f"Shard workers failed: {errors[0]}")
+        return {h: output[h] for h in hosts if h in output}
+
+    def close(self):
+        for tasks in self.tasks:
+            tasks.put(None)
+        deadline = time.monotonic() + 5
+        for process in self.processes:
+            process.join(max(0, deadline - time.monotonic()))
+            if process.is_alive():
+                process.terminate()
+        self.results.put(None)
+        self.reader.join(5)
+
+
+def enable_sharding(state, workers=None, context="spawn"):
+    """Run the modules of the tools using state across worker processes.
+
+    Each worker has its own event loop and gate cache. The pool is kept in
+    state["shard_pool"] and run_module sends every call to it.
+    """
+
+    state["shard_pool"] = ShardPool(state, workers, context)
+    return state["shard_pool"]
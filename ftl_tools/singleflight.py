@@ -0,0 +1,120 @@
+import functools
+import inspect
+import threading
+
+from ftl_tools.inventory import limit_hosts
+from ftl_tools.journal import args_hash
+
+
+class Flight:
+    def __init__(self, hosts):
+        self.hosts = hosts
+        self.done = threading.Event()
+        self.output = None
+        self.error = None
+
+
+class SingleFlight:
+    """Coalesce identical tool calls that run at the same time.
+
+    Calls are keyed by tool, arguments and the hosts they select. A call
+    whose hosts are all covered by an identical call that is still running
+    waits for it and gets its results for those hosts, instead of running
+    the same work on the same hosts a second time.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.flights = {}
+        self.coalesced = 0
+
+    def call(self, state, tool, signature, forward, args, kwargs):
+        """Call forward(tool, *args, **kwargs) or wait for an identical call.
+
+        signature is the signature of the forward method of the tool, used
+        to key the call the same whether arguments are passed by position
+        or by name.
+        """
+
+        bound = signature.bind(tool, *args, **kwargs)
+        bound.apply_defaults()
+        arguments = dict(bound.arguments)
+        del arguments["self"]
+        if "limit" in arguments:
+            hosts = frozenset(limit_hosts(state, arguments.pop("limit")))
+        else:
+            hosts = None
+        key = (tool.name, args_hash(**arguments))
+
+        with self.lock:
+            for flight in self.flights.get(key, ()):
+                if flight.hosts == hosts or (hosts is not None and flight.hosts is not None and hosts <= flight.hosts):
+                    self.coalesced += 1
+                    break
+            else:
+                flight = None
+            if flight is None:
+                leader = Flight(hosts)
+                self.flights.setdefault(key, []).append(leader)
+
+        if flight is not None:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            if hosts is None or not isinstance(flight.output, dict):
+                return flight.output
+            return {h: r for h, r in flight.output.items() if h in hosts}
+
+        try:
+            leader.output = forward(tool, *args, **kwargs)
+            return leader.output
+        except BaseException as e:
+            leader.error = e
+            raise
+        finally:
+            with self.lock:
+                self.flights[key].remove(leader)
+                if not self.flights[key]:
+                    del self.flights[key]
+            leader.done.set()
+
+
+_lock = threading.Lock()
+
+
+def single_flight(state):
+    """Return the SingleFlight of state, creating it on first use.
+
+    scheduler.share_stores creates it before session states are copied, so
+    that identical calls from different sessions are coalesced too.
+    """
+
+    with _lock:
+        flights = state.get("single_flight_calls")
+        if flights is None:
+            flights = state["single_flight_calls"] = SingleFlight()
+        return flights
+
+
+def coalesced(tool_class):
+    """Wrap the forward method of a tool class to coalesce identical calls.
+
+    Only tool classes that set single_flight = True are wrapped: those whose
+    calls converge hosts to a state or read from them, so running a call
+    once for two callers gives both what they asked for. Calls pass straight
+    through when state["single_flight"] is False.
+    """
+
+    if not getattr(tool_class, "single_flight", False):
+        return tool_class
+    forward = tool_class.forward
+    signature = inspect.signature(forward)
+
+    @functools.wraps(forward)
+    def wrapper(self, *args, **kwargs):
+        if not self.state.get("single_flight", True):
+            return forward(self, *args, **kwargs)
+        return single_flight(self.state).call(self.state, self, signature, forward, args, kwargs)
+
+    tool_class.forward = wrapper
+    return tool_class
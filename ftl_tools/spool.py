@@ -0,0 +1,151 @@
+import mmap
+import os
+import re
+import shutil
+import time
+import uuid
+
+from ftl_tools.journal import current_call
+from ftl_tools.utils import data_path, safe_join_path
+
+
+THRESHOLD = 64 * 1024
+PREVIEW_LINES = 10
+STREAMS = ("stdout", "stderr")
+
+
+def spool_dir(state):
+    return data_path(state, "spool")
+
+
+def preview(text, lines=PREVIEW_LINES):
+    """Return the first and last lines of text with a marker for what is left out."""
+
+    split = text.splitlines()
+    if len(split) <= 2 * lines:
+        # Few very long lines
+        if len(text) <= 4000:
+            return text
+        return f"{text[:2000]}\n... {len(text) - 4000} characters omitted ...\n{text[-2000:]}"
+    omitted = len(split) - 2 * lines
+    return "\n".join(split[:lines] + [f"... {omitted} lines omitted ..."] + split[-lines:])
+
+
+def new_spool_id():
+    """Return the directory name for the output spooled by one dispatch."""
+
+    return (current_call.get() or {}).get("id") or uuid.uuid4().hex
+
+
+def spool_output(state, host_name, results, spool_id=None):
+    """Move stdout and stderr larger than the spool threshold of state to files.
+
+    Each large stream is written to the spool directory, under spool_id so
+    that the hosts of one dispatch share a directory, and replaced in the
+    results by a preview of its first and last lines. results gets a
+    <stream>_spool entry with the handle to read the rest with SpooledOutput
+    or the read_output tool. The <stream>_lines copies are dropped.
+    """
+
+    threshold = state.get("spool_threshold", THRESHOLD)
+    if threshold is None:
+        return results
+    for stream in STREAMS:
+        text = results.get(stream)
+        if not isinstance(text, str) or len(text) < threshold:
+            continue
+        if spool_id is None:
+            spool_id = new_spool_id()
+        handle = f"{spool_id}/{host_name.replace(os.sep, '_')}.{stream}"
+        path = os.path.join(spool_dir(state), handle)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = text.encode(errors="replace")
+        with open(path, "wb") as f:
+            f.write(data)
+        results[stream] = preview(text)
+        results[f"{stream}_spool"] = dict(handle=handle, bytes=len(data), lines=text.count("\n") + 1)
+        results.pop(f"{stream}_lines", None)
+    return results
+
+
+class SpooledOutput:
+    """Read access to a spooled stream through a memory map.
+
+    Only the pages that are read are brought into memory, so paging through
+    the output of a chatty command on a large fleet stays cheap.
+    """
+
+    def __init__(self, state, handle):
+        path = safe_join_path(spool_dir(state), handle)
+        if path is None or not os.path.isfile(path):
+            raise Exception(f"No spooled output {handle}")
+        self.handle = handle
+        self.path = path
+        self.size = os.path.getsize(path)
+        self.file = open(path, "rb")
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if self.size else b""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if isinstance(self.map, mmap.mmap):
+            self.map.close()
+        self.file.close()
+
+    def read(self, offset=0, size=THRESHOLD):
+        return self.map[offset:offset + size].decode(errors="replace")
+
+    def _line_offset(self, line):
+        offset = 0
+        for _ in range(line):
+            offset = self.map.find(b"\n", offset) + 1
+            if offset == 0:
+                return self.size
+        return offset
+
+    def lines(self, start=0, count=100):
+        """Return count lines starting at line start, counting from zero."""
+
+        begin = self._line_offset(start)
+        end = begin
+        for _ in range(count):
+            end = self.map.find(b"\n", end) + 1
+            if end == 0:
+                end = self.size
+                break
+        return self.map[begin:end].decode(errors="replace").splitlines()
+
+    def grep(self, pattern, limit=100):
+        """Return up to limit (line number, line) pairs matching a regular expression."""
+
+        regex = re.compile(pattern.encode())
+        matches = []
+        line = counted = 0
+        for match in regex.finditer(self.map):
+            begin = self.map.rfind(b"\n", 0, match.start()) + 1
+            if begin < counted or (matches and begin == counted):
+                # Another match on the line already returned
+                continue
+            line += self.map[counted:begin].count(b"\n")
+            counted = begin
+            end = self.map.find(b"\n", begin)
+            end = self.size if end == -1 else end
+            matches.append((line, self.map[begin:end].decode(errors="replace")))
+            if len(matches) >= limit:
+                break
+        return matches
+
+
+def purge_spool(state, older_than=7 * 24 * 3600):
+    """Remove spooled output of calls older than older_than seconds."""
+
+    directory = spool_dir(state)
+    cutoff = time.time() - older_than
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        if os.path.getmtime(path) < cutoff:
+            shutil.rmtree(path, ignore_errors=True)
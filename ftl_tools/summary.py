@@ -0,0 +1,138 @@
+import functools
+import json
+import os
+import uuid
+
+from ftl_tools.journal import current_call
+from ftl_tools.spool import spool_dir
+from ftl_tools.utils import HostsFailed, group_results, host_status
+
+VERBOSITY = ("full", "summary", "brief")
+# Keys of which a module result has at least one, unlike the facts of GatherFacts
+RESULT_KEYS = ("changed", "failed", "unreachable", "skipped", "msg", "rc")
+EXCERPT = 300
+HOSTS = 20
+
+
+def excerpt(text, size=EXCERPT):
+    text = str(text)
+    if len(text) <= size:
+        return text
+    return f"...{text[-size:]}"
+
+
+def error_excerpt(results, size=EXCERPT):
+    """Return the end of the message, stderr or stdout of a failed host."""
+
+    for key in ("msg", "stderr", "stdout"):
+        if results.get(key):
+            return excerpt(results[key], size)
+    return ""
+
+
+def trim(value, size=EXCERPT):
+    """Return value with long strings shortened and the *_lines copies dropped."""
+
+    if isinstance(value, str):
+        return value if len(value) <= size else f"{value[:size]}... ({len(value)} characters)"
+    if isinstance(value, dict):
+        return {k: trim(v, size) for k, v in value.items() if not k.endswith("_lines")}
+    if isinstance(value, list):
+        return [trim(v, size) for v in value[:HOSTS]] + ([f"... {len(value) - HOSTS} more"] if len(value) > HOSTS else [])
+    return value
+
+
+def host_list(hosts):
+    if len(hosts) <= HOSTS:
+        return hosts
+    return hosts[:HOSTS] + [f"... {len(hosts) - HOSTS} more"]
+
+
+def save_detail(state, output):
+    """Write the full output of a call to the spool and return its handle."""
+
+    call_id = (current_call.get() or {}).get("id") or uuid.uuid4().hex
+    handle = f"{call_id}/output.json"
+    path = os.path.join(spool_dir(state), handle)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(output, f, indent=1, default=str)
+    return handle
+
+
+def is_host_output(output):
+    return (
+        isinstance(output, dict)
+        and bool(output)
+        and all(isinstance(r, dict) and any(k in r for k in RESULT_KEYS) for r in output.values())
+    )
+
+
+def summarize(state, output, verbosity=None):
+    """Return the result of a tool call at the verbosity of state.
+
+    full returns the per-host output unchanged. summary returns the number
+    of hosts by status, the changed hosts, an excerpt of the error of each
+    failed host, the distinct results with the hosts that returned each,
+    shortened, and the handle of the full output for read_output_tool.
+    brief leaves out the distinct results. Results that are not per-host
+    output are returned unchanged.
+    """
+
+    verbosity = verbosity or state.get("verbosity", "full")
+    if verbosity not in VERBOSITY:
+        raise Exception(f"Unknown verbosity {verbosity}, expected one of {', '.join(VERBOSITY)}")
+    if verbosity == "full" or not is_host_output(output):
+        return output
+
+    statuses = {}
+    changed = []
+    failed = {}
+    for host_name, results in output.items():
+        status = host_status(results)
+        statuses[status] = statuses.get(status, 0) + 1
+        if status == "changed":
+            changed.append(host_name)
+        elif status in ("failed", "timeout", "unreachable") and len(failed) < HOSTS:
+            failed[host_name] = error_excerpt(results)
+
+    summary = dict(hosts=len(output), status=statuses)
+    if changed:
+        summary["changed"] = host_list(changed)
+    if failed:
+        summary["failed"] = failed
+    if verbosity == "summary":
+        summary["results"] = [
+            dict(count=g["count"], hosts=host_list(g["hosts"]), result=trim(g["result"]))
+            for g in group_results(output)[:HOSTS]
+        ]
+    summary["detail"] = save_detail(state, output)
+    return summary
+
+
+def summarized(tool_class):
+    """Wrap the forward method of a tool class to summarize its result at state["verbosity"].
+
+    Tools raise when a host fails, so a failed call raises an exception
+    whose message is the summary of the call instead, with the excerpts of
+    the errors of the failed hosts. Costs one dictionary lookup per call at
+    the full verbosity.
+    """
+
+    forward = tool_class.forward
+
+    @functools.wraps(forward)
+    def wrapper(self, *args, **kwargs):
+        verbosity = self.state.get("verbosity")
+        if verbosity is None or verbosity == "full":
+            return forward(self, *args, **kwargs)
+        try:
+            output = forward(self, *args, **kwargs)
+        except HostsFailed as e:
+            if not is_host_output(e.output):
+                raise
+            raise Exception(json.dumps(summarize(self.state, e.output, verbosity), default=str)) from e
+        return summarize(self.state, output, verbosity)
+
+    tool_class.forward = wrapper
+    return tool_class
@@ -1,4 +1,9 @@
 #!/usr/bin/env python3
+from ftl_tools.journal import journaled
+from ftl_tools.metrics import instrument
+from ftl_tools.singleflight import coalesced
+from ftl_tools.summary import summarized
+
 # Import all tools from individual files
 from .timezone import Timezone
 from .git import Git
@@ -10,8 +15,8 @@ from .template import Template
 # Import tools that were extracted from this file
 from .service import Service
 from .lineinfile import LineInFile, AddLineToFile, ReplaceLineInFile
-from .authorized_key import AuthorizedKey
-from .user import User
+from .authorized_key import AuthorizedKey, AuthorizedKeys
+from .user import User, Users
 from .dnf import Dnf
 from .apt import Apt
 from .pip import Pip, PipRequirements
@@ -31,6 +36,10 @@ from .get_url import GetURL
 from .unarchive import Unarchive
 from .java_jar import JavaJar
 from .bash import Bash
+from .facts import GatherFacts
+from .package import Package
+from .read_output import ReadOutput
+from .find_tools import FindTools
 
 __all__ = [
     "Service",
@@ -38,7 +47,9 @@ __all__ = [
     "AddLineToFile",
     "ReplaceLineInFile",
     "AuthorizedKey",
+    "AuthorizedKeys",
     "User",
+    "Users",
     "Dnf",
     "Apt",
     "Hostname",
@@ -67,4 +78,15 @@ __all__ = [
     "Certbot",
     "SetSeBool",
     "Template",
+    "GatherFacts",
+    "Package",
+    "ReadOutput",
+    "FindTools",
 ]
+
+# Each feature wraps forward with a wrapper that passes straight through when
+# it is turned off in state. The first applied runs innermost.
+for _name in __all__:
+    for _wrap in (instrument, journaled, coalesced, summarized):
+        _wrap(globals()[_name])
+del _name, _wrap
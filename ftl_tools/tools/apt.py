@@ -1,39 +1,48 @@
 from smolagents.tools import Tool
 from ftlagents.tools import get_json_schema
-import faster_than_light as ftl
-from ftl_tools.utils import dependencies, display_results, display_tool
+from ftl_tools.dispatch import run_module
+from ftl_tools.facts import skip_unsupported
+from ftl_tools.retry import DOWNLOAD_RETRY
+from ftl_tools.utils import display_results, display_tool
 
 
 class Apt(Tool):
     name = "apt_tool"
     module = "apt"
+    single_flight = True
 
     def __init__(self, state, *args, **kwargs):
         self.state = state
         super().__init__(*args, **kwargs)
 
-    def forward(self, update_cache: bool = False, upgrade: str = "no") -> bool:
+    def forward(self, update_cache: bool = False, upgrade: str = "no", limit: str = None) -> bool:
         """Control apt packages
 
         Args:
             update_cache: Update the cache if true
             upgrade: Either yes, safe, or no.
+            limit: a host pattern that restricts the hosts to run on, like web:!web3
 
         Returns:
             boolean
         """
         display_tool(self, self.state["console"], self.state["log"])
-        output = ftl.run_module_sync(
-            self.state["inventory"],
-            self.state["modules"],
-            "apt",
-            self.state["gate_cache"],
-            module_args=dict(update_cache=update_cache, upgrade=upgrade),
-            dependencies=dependencies,
-            loop=self.state["loop"],
-            use_gate=self.state["gate"],
+
+        hosts, output = skip_unsupported(
+            self.state, limit, "pkg_mgr", ("apt",), "apt is not available"
         )
 
+        if hosts:
+            output.update(
+                run_module(
+                    self.state,
+                    "apt",
+                    module_args=dict(update_cache=update_cache, upgrade=upgrade),
+                    limit=hosts,
+                    retry=DOWNLOAD_RETRY,
+                )
+            )
+
         display_results(output, self.state["console"], self.state["log"])
 
         return output
@@ -1,8 +1,70 @@
-import os
+import shlex
 from smolagents.tools import Tool
 from ftlagents.tools import get_json_schema
-import faster_than_light as ftl
-from ftl_tools.utils import dependencies, display_results, display_tool
+from ftl_tools.dispatch import run_module
+from ftl_tools.utils import display_results, display_tool, read_key_file
+
+
+def key_lines(key_files):
+    """Return the unique public keys contained in a list of local key files."""
+
+    keys = []
+    for key_file in key_files:
+        for line in read_key_file(key_file).splitlines():
+            line = line.strip()
+            if line and not line.startswith("#") and line not in keys:
+                keys.append(line)
+    return keys
+
+
+def authorized_keys_script(user, keys, state="present"):
+    """Build shell commands that reconcile the authorized keys of a user.
+
+    Every modification echoes a line starting with CHANGED so that
+    report_changes can tell changed hosts from unchanged ones. Keys are
+    already absent for a user that does not exist, so that is not an error.
+    """
+
+    q_user = shlex.quote(user)
+    lines = [f"home=$(getent passwd {q_user} | cut -d: -f6)"]
+    if state == "present":
+        lines += [
+            f'[ -n "$home" ] || {{ echo {shlex.quote(f"user {user} does not exist")} >&2; exit 1; }}',
+            'keys="$home/.ssh/authorized_keys"',
+            f'install -d -m 700 -o {q_user} -g "$(id -gn {q_user})" "$home/.ssh"',
+            '[ -f "$keys" ] || touch "$keys"',
+            'chmod 600 "$keys"',
+            f'chown {q_user}: "$keys"',
+        ]
+        for key in keys:
+            q_key = shlex.quote(key)
+            lines.append(
+                f'grep -qxF {q_key} "$keys" || {{ echo {q_key} >> "$keys"; echo {shlex.quote(f"CHANGED key {user}")}; }}'
+            )
+    elif state == "absent":
+        lines.append('keys="$home/.ssh/authorized_keys"')
+        for key in keys:
+            q_key = shlex.quote(key)
+            lines.append(
+                f'if [ -n "$home" ] && [ -f "$keys" ] && grep -qxF {q_key} "$keys"; then '
+                f'grep -vxF {q_key} "$keys" > "$keys.tmp" || true; '
+                f'cat "$keys.tmp" > "$keys"; rm -f "$keys.tmp"; echo {shlex.quote(f"CHANGED key {user}")}; fi'
+            )
+    else:
+        raise Exception(f"Unknown state {state}")
+    return lines
+
+
+def report_changes(output):
+    """Set changed on command results from the CHANGED markers in stdout."""
+
+    for results in output.values():
+        if results.get("failed"):
+            continue
+        results["changed"] = any(
+            line.startswith("CHANGED") for line in results.get("stdout", "").splitlines()
+        )
+    return output
 
 
 class AuthorizedKey(Tool):
@@ -13,32 +75,25 @@ class AuthorizedKey(Tool):
         self.state = state
         super().__init__(*args, **kwargs)
 
-    def forward(self, user: str, key_file: str, state: str = "present") -> bool:
+    def forward(self, user: str, key_file: str, state: str = "present", limit: str = None) -> bool:
         """Manage authorized keys and upload public keys to the remote node
 
         Args:
             user: the name of the user
             state: one of present or absent
             key_file: the path to the file containing the public key_file
+            limit: a host pattern that restricts the hosts to run on, like web:!web3
 
         Returns:
             boolean
         """
         display_tool(self, self.state["console"], self.state["log"])
-        key_file = os.path.abspath(os.path.expanduser(key_file))
-        if not os.path.exists(key_file) or not os.path.isfile(key_file):
-            raise Exception(f"{key_file} does not exist")
-        with open(key_file) as f:
-            key_value = f.read()
-        output = ftl.run_module_sync(
-            self.state["inventory"],
-            self.state["modules"],
+        key_value = read_key_file(key_file)
+        output = run_module(
+            self.state,
             "authorized_key",
-            self.state["gate_cache"],
             module_args=dict(user=user, state=state, key=key_value),
-            dependencies=dependencies,
-            loop=self.state["loop"],
-            use_gate=self.state["gate"],
+            limit=limit,
         )
 
         display_results(output, self.state["console"], self.state["log"])
@@ -46,3 +101,42 @@ class AuthorizedKey(Tool):
         return output
 
     description, inputs, output_type = get_json_schema(forward)
+
+
+class AuthorizedKeys(Tool):
+    name = "authorized_keys_tool"
+    module = "command"
+
+    def __init__(self, state, *args, **kwargs):
+        self.state = state
+        super().__init__(*args, **kwargs)
+
+    def forward(self, keys: dict, state: str = "present", limit: str = None) -> bool:
+        """Manage the authorized keys of many users in a single run per host
+
+        Args:
+            keys: a mapping of user name to a list of paths of public key files
+            state: one of present or absent
+            limit: a host pattern that restricts the hosts to run on, like web:!web3
+
+        Returns:
+            boolean
+        """
+        display_tool(self, self.state["console"], self.state["log"])
+        script = ["set -e"]
+        for user, key_files in keys.items():
+            if isinstance(key_files, str):
+                key_files = [key_files]
+            script += authorized_keys_script(user, key_lines(key_files), state)
+        output = run_module(
+            self.state,
+            "command",
+            module_args=dict(_uses_shell=True, _raw_params="\n".join(script)),
+            limit=limit,
+        )
+
+        display_results(report_changes(output), self.state["console"], self.state["log"])
+
+        return output
+
+    description, inputs, output_type = get_json_schema(forward)
@@ -2,9 +2,8 @@
 from smolagents.tools import Tool
 from ftlagents.tools import get_json_schema
 
-import faster_than_light as ftl
-
-from ftl_tools.utils import dependencies, display_results, display_tool
+from ftl_tools.dispatch import run_module
+from ftl_tools.utils import display_results, display_tool
 
 
 class Chown(Tool):
@@ -15,30 +14,27 @@ class Chown(Tool):
         self.state = state
         super().__init__(*args, **kwargs)
 
-    def forward(self, user: str, location: str) -> bool:
+    def forward(self, user: str, location: str, limit: str = None) -> bool:
         """Changes the ownership of a directory and the files in it.
 
         Args:
             location: The location of the swapfile
             user: The new owner of the location
+            limit: a host pattern that restricts the hosts to run on, like web:!web3
 
         Returns:
             boolean
         """
         display_tool(self, self.state["console"], self.state["log"])
 
-        output = ftl.run_module_sync(
-            self.state["inventory"],
-            self.state["modules"],
+        output = run_module(
+            self.state,
             "command",
-            self.state["gate_cache"],
             module_args=dict(
                 _uses_shell=True,
                 _raw_params=f"chown -R {user} {location}",
             ),
-            dependencies=dependencies,
-            loop=self.state["loop"],
-            use_gate=self.state["gate"],
+            limit=limit,
         )
 
         display_results(output, self.state["console"], self.state["log"])
@@ -2,8 +2,8 @@
 from smolagents.tools import Tool
 from ftlagents.tools import get_json_schema
 
-import faster_than_light as ftl
-
+from ftl_tools.dispatch import dispatch, run_ftl
+from ftl_tools.inventory import limit_inventory
 from ftl_tools.utils import display_results, display_tool, safe_join_path
 
 
@@ -14,12 +14,13 @@ class Copy(Tool):
         self.state = state
         super().__init__(*args, **kwargs)
 
-    def forward(self, src: str, dest: str) -> bool:
+    def forward(self, src: str, dest: str, limit: str = None) -> bool:
         """Copy file to remote machine
 
         Args:
             src: The source of the file
             dest: The destination of the file
+            limit: a host pattern that restricts the hosts to run on, like web:!web3
 
         Returns:
             boolean
@@ -31,15 +32,20 @@ class Copy(Tool):
             return False
 
         display_tool(self, self.state["console"], self.state["log"])
-        output = ftl.copy_sync(
-            self.state["inventory"],
-            self.state["gate_cache"],
-            src=safe_join_path(self.state["workspace"], src),
-            dest=dest,
-            loop=self.state["loop"],
-        )
-
-        display_results({}, self.state["console"], self.state["log"])
+
+        def copy(inventory):
+            return run_ftl(
+                self.state,
+                "copy",
+                inventory,
+                self.state["gate_cache"],
+                src=safe_join_path(self.state["workspace"], src),
+                dest=dest,
+            )
+
+        output = dispatch(self.state, copy, limit_inventory(self.state, limit))
+
+        display_results(output, self.state["console"], self.state["log"])
 
         return output
 
@@ -2,8 +2,8 @@
 from smolagents.tools import Tool
 from ftlagents.tools import get_json_schema
 
-import faster_than_light as ftl
-
+from ftl_tools.dispatch import dispatch, run_ftl
+from ftl_tools.inventory import limit_inventory
 from ftl_tools.utils import display_results, display_tool, safe_join_path
 
 
@@ -14,12 +14,13 @@ class CopyFrom(Tool):
         self.state = state
         super().__init__(*args, **kwargs)
 
-    def forward(self, src: str, dest: str) -> bool:
+    def forward(self, src: str, dest: str, limit: str = None) -> bool:
         """Copy file from remote machine locally
 
         Args:
             src: The remote source of the file
             dest: The local destination of the file
+            limit: a host pattern that restricts the hosts to run on, like web:!web3
 
         Returns:
             boolean
@@ -31,16 +32,21 @@ class CopyFrom(Tool):
             return False
 
         display_tool(self, self.state["console"], self.state["log"])
-        ftl.copy_from_sync(
-            self.state["inventory"],
-            self.state["gate_cache"],
-            src=src,
-            dest=dest,
-            loop=self.state["loop"],
-        )
 
-        display_results({}, self.state["console"], self.state["log"])
+        def copy_from(inventory):
+            return run_ftl(
+                self.state,
+                "copy_from",
+                inventory,
+                self.state["gate_cache"],
+                src=src,
+                dest=dest,
+            )
+
+        output = dispatch(self.state, copy_from, limit_inventory(self.state, limit))
+
+        display_results(output, self.state["console"], self.state["log"])
 
-        return True
+        return output
 
     description, inputs, output_type = get_json_schema(forward)
\ No newline at end of file
@@ -1,7 +1,7 @@
 from smolagents.tools import Tool
 from ftlagents.tools import get_json_schema
-import faster_than_light as ftl
-from ftl_tools.utils import dependencies, display_results, display_tool
+from ftl_tools.dispatch import run_module
+from ftl_tools.utils import display_results, display_tool
 
 
 class Discord(Tool):
@@ -21,18 +21,16 @@ class Discord(Tool):
             boolean
         """
         display_tool(self, self.state["console"], self.state["log"])
-        output = ftl.run_module_sync(
-            self.state["localhost"],
-            self.state["modules"],
+        output = run_module(
+            self.state,
             "discord",
-            self.state["gate_cache"],
             module_args=dict(
                 content=message,
                 webhook_token=str(self.state["secrets"]["DISCORD_TOKEN"]),
                 webhook_id=self.state["discord_channel"],
             ),
-            loop=self.state["loop"],
-            use_gate=self.state["gate"],
+            dependencies=None,
+            inventory=self.state["localhost"],
         )
 
         display_results(output, self.state["console"], self.state["log"])
@@ -1,56 +1,77 @@
 from smolagents.tools import Tool
 from ftlagents.tools import get_json_schema
-import faster_than_light as ftl
-from ftl_tools.utils import dependencies, display_results, display_tool
+from ftl_tools.dispatch import run_module
+from ftl_tools.facts import fact_cache, skip_unsupported
+from ftl_tools.retry import DOWNLOAD_RETRY
+from ftl_tools.utils import display_results, display_tool
+
+
+def ensure_python3_dnf(state, hosts):
+    """Install python3-dnf on the hosts not known to have it already."""
+
+    cache = fact_cache(state)
+    missing = [h for h in hosts if cache.get(h, "python3_dnf") != "yes"]
+    if not missing:
+        return {}
+
+    output = run_module(
+        state,
+        "command",
+        module_args=dict(
+            _uses_shell=True,
+            _raw_params="dnf install -y python3-dnf",
+        ),
+        limit=missing,
+        retry=DOWNLOAD_RETRY,
+    )
+
+    for host_name, results in output.items():
+        if not results.get("failed") and host_name in cache.hosts:
+            cache.set(host_name, dict(python3_dnf="yes"))
+    return output
 
 
 class Dnf(Tool):
     name = "dnf_tool"
     module = "dnf"
+    single_flight = True
 
     def __init__(self, state, *args, **kwargs):
         self.state = state
         super().__init__(*args, **kwargs)
 
-    def forward(self, name: str, state: str) -> bool:
+    def forward(self, name: str, state: str, limit: str = None) -> bool:
         """Control dnf packages
 
         Args:
             name: the name of the package, use '*' for all packages
             state: one of latest, present, absent
+            limit: a host pattern that restricts the hosts to run on, like web:!web3
 
         Returns:
             boolean
         """
         display_tool(self, self.state["console"], self.state["log"])
 
-        # Ensure that python3-dnf is install so the dnf module doesn't fail
-        output = ftl.run_module_sync(
-            self.state["inventory"],
-            self.state["modules"],
-            "command",
-            self.state["gate_cache"],
-            module_args=dict(
-                _uses_shell=True,
-                _raw_params=f"dnf install -y python3-dnf",
-            ),
-            dependencies=dependencies,
-            loop=self.state["loop"],
-            use_gate=self.state["gate"],
+        hosts, output = skip_unsupported(
+            self.state, limit, "pkg_mgr", ("dnf", "yum"), "dnf is not available"
         )
 
-        display_results(output, self.state["console"], self.state["log"])
+        # Ensure that python3-dnf is install so the dnf module doesn't fail
+        bootstrap = ensure_python3_dnf(self.state, hosts)
+        if bootstrap:
+            display_results(bootstrap, self.state["console"], self.state["log"])
 
-        output = ftl.run_module_sync(
-            self.state["inventory"],
-            self.state["modules"],
-            "dnf",
-            self.state["gate_cache"],
-            module_args=dict(name=name, state=state),
-            dependencies=dependencies,
-            loop=self.state["loop"],
-            use_gate=self.state["gate"],
-        )
+        if hosts:
+            output.update(
+                run_module(
+                    self.state,
+                    "dnf",
+                    module_args=dict(name=name, state=state),
+                    limit=hosts,
+                    retry=DOWNLOAD_RETRY,
+                )
+            )
 
         display_results(output, self.state["console"], self.state["log"])
 
@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+from smolagents.tools import Tool
+from ftlagents.tools import get_json_schema
+
+from ftl_tools.facts import gather_facts
+from ftl_tools.utils import display_results, display_tool
+
+
+class GatherFacts(Tool):
+    name = "gather_facts_tool"
+    module = "command"
+    single_flight = True
+
+    def __init__(self, state, *args, **kwargs):
+        self.state = state
+        super().__init__(*args, **kwargs)
+
+    def forward(self, refresh: bool = False, limit: str = None) -> dict:
+        """Gather facts like the OS family, package manager, init system, SELinux mode and free disk space of the hosts
+
+        Args:
+            refresh: gather facts again even if cached facts have not expired
+            limit: a host pattern that restricts the hosts to run on, like web:!web3
+
+        Returns:
+            object
+        """
+        display_tool(self, self.state["console"], self.state["log"])
+
+        facts = gather_facts(self.state, limit, refresh=refresh)
+
+        display_results(
+            {host_name: dict(changed=False, facts=f) for host_name, f in facts.items()},
+            self.state["console"],
+            self.state["log"],
+        )
+
+        return facts
+
+    description, inputs, output_type = get_json_schema(forward)
@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+from smolagents.tools import Tool
+from ftlagents.tools import get_json_schema
+
+from ftl_tools.utils import display_tool
+
+
+class FindTools(Tool):
+    name = "find_tools_tool"
+    module = None
+
+    def __init__(self, state, *args, **kwargs):
+        self.state = state
+        super().__init__(*args, **kwargs)
+
+    def forward(self, query: str = None, category: str = None, load: bool = True) -> list:
+        """Find more tools by keywords or category and make them available
+
+        Args:
+            query: words describing what the tool should do, like install package or open port
+            category: one of packages, files, services, security, system, containers, commands, cloud, notifications
+            load: add the tools found to the tools that can be called
+
+        Returns:
+            list
+        """
+        # Imported here since the catalog indexes this package
+        from ftl_tools.catalog import tool_catalog
+
+        display_tool(self, self.state["console"], self.state["log"])
+
+        catalog = tool_catalog(self.state)
+        names = catalog.search(query, category=category, limit=10)
+        agent_tools = self.state.get("agent_tools")
+        if load and agent_tools is not None:
+            missing = [name for name in names if name not in agent_tools]
+            agent_tools.update(catalog.load(self.state, missing))
+        return [catalog.describe(name) for name in names]
+
+    description, inputs, output_type = get_json_schema(forward)
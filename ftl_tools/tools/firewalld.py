@@ -2,9 +2,8 @@
 from smolagents.tools import Tool
 from ftlagents.tools import get_json_schema
 
-import faster_than_light as ftl
-
-from ftl_tools.utils import dependencies, display_results, display_tool
+from ftl_tools.dispatch import run_module
+from ftl_tools.utils import display_results, display_tool
 
 
 class FirewallD(Tool):
@@ -15,7 +14,7 @@ class FirewallD(Tool):
         super().__init__(*args, **kwargs)
 
     def forward(
-        self, port: str, state: str, protocol: str = None, permanent: bool = True
+        self, port: str, state: str, protocol: str = None, permanent: bool = True, limit: str = None
     ) -> bool:
         """Configure firewalld
 
@@ -24,6 +23,7 @@ class FirewallD(Tool):
             state: One of enabled or disabled
             protocol: tcp or udp
             permanent: True if permanent
+            limit: a host pattern that restricts the hosts to run on, like web:!web3
 
         Returns:
             boolean
@@ -43,19 +43,15 @@ class FirewallD(Tool):
             else:
                 port = f"{port}/tcp"
         display_tool(self, self.state["console"], self.state["log"])
-        output = ftl.run_module_sync(
-            self.state["inventory"],
-            self.state["modules"],
+        output = run_module(
+            self.state,
             "firewalld",
-            self.state["gate_cache"],
             module_args=dict(
                 port=port,
                 state=state,
                 permanent=permanent,
             ),
-            dependencies=dependencies,
-            loop=self.state["loop"],
-            use_gate=self.state["gate"],
+            limit=limit,
         )
 
         display_results(output, self.state["console"], self.state["log"])
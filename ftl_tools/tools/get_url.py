@@ -2,8 +2,8 @@
 from smolagents.tools import Tool
 from ftlagents.tools import get_json_schema
 
-import faster_than_light as ftl
-
+from ftl_tools.dispatch import run_module
+from ftl_tools.retry import DOWNLOAD_RETRY
 from ftl_tools.utils import display_results, display_tool
 
 
@@ -14,28 +14,28 @@ class GetURL(Tool):
         self.state = state
         super().__init__(*args, **kwargs)
 
-    def forward(self, url: str, dest: str) -> bool:
+    def forward(self, url: str, dest: str, limit: str = None) -> bool:
         """Downloads a file
 
         Args:
             url: The url of the file
             dest: the destination of the file
+            limit: a host pattern that restricts the hosts to run on, like web:!web3
 
         Returns:
             boolean
         """
         display_tool(self, self.state["console"], self.state["log"])
-        output = ftl.run_module_sync(
-            self.state["inventory"],
-            self.state["modules"],
+        output = run_module(
+            self.state,
             "get_url",
-            self.state["gate_cache"],
             module_args=dict(
                 url=url,
                 dest=dest,
             ),
-            loop=self.state["loop"],
-            use_gate=self.state["gate"],
+            dependencies=None,
+            limit=limit,
+            retry=DOWNLOAD_RETRY,
         )
 
         display_results(output, self.state["console"], self.state["log"])
@@ -1,7 +1,7 @@
 from smolagents.tools import Tool
 from ftlagents.tools import get_json_schema
-import faster_than_light as ftl
-from ftl_tools.utils import dependencies, display_results, display_tool
+from ftl_tools.dispatch import run_module
+from ftl_tools.utils import display_results, display_tool
 
 
 class Git(Tool):
@@ -12,28 +12,25 @@ class Git(Tool):
         self.state = state
         super().__init__(*args, **kwargs)
 
-    def forward(self, repo: str, dest: str, update: bool = True) -> bool:
+    def forward(self, repo: str, dest: str, update: bool = True, limit: str = None) -> bool:
         '''Deploy software (or files) from git checkouts
 
         Args:
             repo: git, SSH, or HTTP(S) protocol address of the git repository
             dest: The path of where the repository should be checked out
             update: If false, do not retrieve new revisions from the origin repository
+            limit: a host pattern that restricts the hosts to run on, like web:!web3
 
         Returns:
             boolean
         '''
         display_tool(self, self.state["console"], self.state["log"])
 
-        output = ftl.run_module_sync(
-            self.state["inventory"],
-            self.state["modules"],
+        output = run_module(
+            self.state,
             self.module,
-            self.state["gate_cache"],
             module_args=dict(repo=repo, dest=dest, update=update),
-            dependencies=dependencies,
-            loop=self.state["loop"],
-            use_gate=self.state["gate"],
+            limit=limit,
         )
 
         display_results(output, self.state["console"], self.state["log"])
@@ -2,9 +2,8 @@
 from smolagents.tools import Tool
 from ftlagents.tools import get_json_schema
 
-import faster_than_light as ftl
-
-from ftl_tools.utils import dependencies, display_results, display_tool
+from ftl_tools.dispatch import run_module
+from ftl_tools.utils import display_results, display_tool
 
 
 class Hostname(Tool):
@@ -15,25 +14,24 @@ class Hostname(Tool):
         self.state = state
         super().__init__(*args, **kwargs)
 
-    def forward(self, name: str) -> bool:
+    def forward(self, name: str, per_host: dict = None, limit: str = None) -> bool:
         """Sets the hostname of the machine.
 
         Args:
-            name: the name to set
+            name: the name to set, may reference inventory variables like {{ host_name }}
+            per_host: a mapping of host name to the name to set on that host
+            limit: a host pattern that restricts the hosts to run on, like web:!web3
 
         Returns:
             boolean
         """
         display_tool(self, self.state["console"], self.state["log"])
-        output = ftl.run_module_sync(
-            self.state["inventory"],
-            self.state["modules"],
+        output = run_module(
+            self.state,
             "hostname",
-            self.state["gate_cache"],
             module_args=dict(name=name),
-            dependencies=dependencies,
-            loop=self.state["loop"],
-            use_gate=self.state["gate"],
+            host_args={host: dict(name=value) for host, value in (per_host or {}).items()},
+            limit=limit,
         )
 
         display_results(output, self.state["console"], self.state["log"])
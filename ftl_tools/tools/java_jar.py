@@ -2,9 +2,8 @@
 from smolagents.tools import Tool
 from ftlagents.tools import get_json_schema
 
-import faster_than_light as ftl
-
-from ftl_tools.utils import dependencies, display_results, display_tool
+from ftl_tools.dispatch import run_module
+from ftl_tools.utils import display_results, display_tool
 
 
 class JavaJar(Tool):
@@ -15,30 +14,29 @@ class JavaJar(Tool):
         self.state = state
         super().__init__(*args, **kwargs)
 
-    def forward(self, jar: str, args: list) -> bool:
+    def forward(self, jar: str, args: list, limit: str = None, timeout: int = None) -> bool:
         """Run a java jar
 
         Args:
             jar: the path of the jar file
             args: other arguments to the jar
+            limit: a host pattern that restricts the hosts to run on, like web:!web3
+            timeout: the number of seconds after which the command is stopped on each host
 
         Returns:
             boolean
         """
         display_tool(self, self.state["console"], self.state["log"])
 
-        output = ftl.run_module_sync(
-            self.state["inventory"],
-            self.state["modules"],
+        output = run_module(
+            self.state,
             "command",
-            self.state["gate_cache"],
             module_args=dict(
                 _uses_shell=True,
                 _raw_params=f"java -jar {jar} {' '.join(args)}",
             ),
-            dependencies=dependencies,
-            loop=self.state["loop"],
-            use_gate=self.state["gate"],
+            limit=limit,
+            timeout=timeout,
         )
 
         display_results(output, self.state["console"], self.state["log"])
@@ -1,7 +1,7 @@
 from smolagents.tools import Tool
 from ftlagents.tools import get_json_schema
-import faster_than_light as ftl
-from ftl_tools.utils import dependencies, display_results, display_tool
+from ftl_tools.dispatch import run_module
+from ftl_tools.utils import display_results, display_tool
 
 
 class LineInFile(Tool):
@@ -13,7 +13,7 @@ class LineInFile(Tool):
         super().__init__(*args, **kwargs)
 
     def forward(
-        self, line: str, path: str, state: str = "present", regexp: str = None
+        self, line: str, path: str, state: str = "present", regexp: str = None, limit: str = None
     ) -> bool:
         """Add a line to a file
 
@@ -22,20 +22,17 @@ class LineInFile(Tool):
             state: one of present or absent
             path: the path to the file
             regexp: the regular expression of the line to replace
+            limit: a host pattern that restricts the hosts to run on, like web:!web3
 
         Returns:
             boolean
         """
         display_tool(self, self.state["console"], self.state["log"])
-        output = ftl.run_module_sync(
-            self.state["inventory"],
-            self.state["modules"],
+        output = run_module(
+            self.state,
             "lineinfile",
-            self.state["gate_cache"],
             module_args=dict(line=line, state=state, path=path, regexp=regexp),
-            dependencies=dependencies,
-            loop=self.state["loop"],
-            use_gate=self.state["gate"],
+            limit=limit,
         )
 
         display_results(output, self.state["console"], self.state["log"])
@@ -57,26 +54,24 @@ class AddLineToFile(Tool):
         self,
         line: str,
         path: str,
+        limit: str = None,
     ) -> bool:
         """Add a line to a file
 
         Args:
             line: the line to add
             path: the path to the file
+            limit: a host pattern that restricts the hosts to run on, like web:!web3
 
         Returns:
             boolean
         """
         display_tool(self, self.state["console"], self.state["log"])
-        output = ftl.run_module_sync(
-            self.state["inventory"],
-            self.state["modules"],
+        output = run_module(
+            self.state,
             "lineinfile",
-            self.state["gate_cache"],
             module_args=dict(line=line, state="present", path=path),
-            dependencies=dependencies,
-            loop=self.state["loop"],
-            use_gate=self.state["gate"],
+            limit=limit,
         )
 
         display_results(output, self.state["console"], self.state["log"])
@@ -94,27 +89,24 @@ class ReplaceLineInFile(Tool):
         self.state = state
         super().__init__(*args, **kwargs)
 
-    def forward(self, line: str, path: str, pattern: str = None) -> bool:
+    def forward(self, line: str, path: str, pattern: str = None, limit: str = None) -> bool:
         """Replace a line in a file with another line
 
         Args:
             line: the line to add
             pattern: the line to replace
             path: the path to the file
+            limit: a host pattern that restricts the hosts to run on, like web:!web3
 
         Returns:
             boolean
         """
         display_tool(self, self.state["console"], self.state["log"])
-        output = ftl.run_module_sync(
-            self.state["inventory"],
-            self.state["modules"],
+        output = run_module(
+            self.state,
             "lineinfile",
-            self.state["gate_cache"],
             module_args=dict(line=line, state="present", path=path, regexp=pattern),
-            dependencies=dependencies,
-            loop=self.state["loop"],
-            use_gate=self.state["gate"],
+            limit=limit,
         )
 
         display_results(output, self.state["console"], self.state["log"])
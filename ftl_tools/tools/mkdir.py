@@ -2,8 +2,8 @@
 from smolagents.tools import Tool
 from ftlagents.tools import get_json_schema
 
-import faster_than_light as ftl
-
+from ftl_tools.dispatch import dispatch, run_ftl
+from ftl_tools.inventory import limit_inventory
 from ftl_tools.utils import display_results, display_tool
 
 
@@ -14,25 +14,31 @@ class Mkdir(Tool):
         self.state = state
         super().__init__(*args, **kwargs)
 
-    def forward(self, name: str) -> bool:
+    def forward(self, name: str, limit: str = None) -> bool:
         """Make a directory on the remote machine
 
         Args:
             name: The name of the directory
+            limit: a host pattern that restricts the hosts to run on, like web:!web3
 
         Returns:
             boolean
         """
         display_tool(self, self.state["console"], self.state["log"])
-        ftl.mkdir_sync(
-            self.state["inventory"],
-            self.state["gate_cache"],
-            name=name,
-            loop=self.state["loop"],
-        )
 
-        display_results({}, self.state["console"], self.state["log"])
+        def mkdir(inventory):
+            return run_ftl(
+                self.state,
+                "mkdir",
+                inventory,
+                self.state["gate_cache"],
+                name=name,
+            )
+
+        output = dispatch(self.state, mkdir, limit_inventory(self.state, limit))
+
+        display_results(output, self.state["console"], self.state["log"])
 
-        return True
+        return output
 
     description, inputs, output_type = get_json_schema(forward)
\ No newline at end of file
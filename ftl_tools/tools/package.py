@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+from smolagents.tools import Tool
+from ftlagents.tools import get_json_schema
+
+from ftl_tools.dispatch import run_module
+from ftl_tools.facts import gather_facts
+from ftl_tools.retry import DOWNLOAD_RETRY
+from ftl_tools.tools.dnf import ensure_python3_dnf
+from ftl_tools.utils import display_results, display_tool
+
+
+# The facts Package needs, so the facts that expire sooner do not cause a probe
+PACKAGE_FACTS = ("pkg_mgr",)
+
+
+class Package(Tool):
+    name = "package_tool"
+    module = "dnf"
+    # dnf or apt by the package manager of each host
+    modules = ("dnf", "apt")
+    single_flight = True
+
+    def __init__(self, state, *args, **kwargs):
+        self.state = state
+        super().__init__(*args, **kwargs)
+
+    def forward(self, name: str, state: str = "present", limit: str = None) -> bool:
+        """Control packages with the package manager of each host
+
+        Args:
+            name: the name of the package
+            state: one of latest, present, absent
+            limit: a host pattern that restricts the hosts to run on, like web:!web3
+
+        Returns:
+            boolean
+        """
+        display_tool(self, self.state["console"], self.state["log"])
+
+        # Only hosts without fresh cached facts are probed here
+        output = {}
+        by_pkg_mgr = {}
+        for host_name, facts in gather_facts(self.state, limit, failures=output, keys=PACKAGE_FACTS).items():
+            if host_name not in output:
+                by_pkg_mgr.setdefault(facts.get("pkg_mgr"), []).append(host_name)
+
+        for pkg_mgr, hosts in by_pkg_mgr.items():
+            if pkg_mgr in ("dnf", "yum"):
+                bootstrap = ensure_python3_dnf(self.state, hosts)
+                if bootstrap:
+                    display_results(bootstrap, self.state["console"], self.state["log"])
+                module = "dnf"
+            elif pkg_mgr == "apt":
+                module = "apt"
+            else:
+                for host_name in hosts:
+                    output[host_name] = dict(failed=True, msg=f"Unsupported package manager {pkg_mgr}")
+                continue
+            output.update(
+                run_module(
+                    self.state,
+                    module,
+                    module_args=dict(name=name, state=state),
+                    limit=hosts,
+                    retry=DOWNLOAD_RETRY,
+                )
+            )
+
+        display_results(output, self.state["console"], self.state["log"])
+
+        return output
+
+    description, inputs, output_type = get_json_schema(forward)
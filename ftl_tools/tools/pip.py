@@ -1,37 +1,37 @@
 from smolagents.tools import Tool
 from ftlagents.tools import get_json_schema
-import faster_than_light as ftl
-from ftl_tools.utils import dependencies, display_results, display_tool
+from ftl_tools.dispatch import run_module
+from ftl_tools.retry import DOWNLOAD_RETRY
+from ftl_tools.utils import display_results, display_tool
 
 
 class Pip(Tool):
     name = "pip_tool"
     module = "pip"
+    single_flight = True
 
     def __init__(self, state, *args, **kwargs):
         self.state = state
         super().__init__(*args, **kwargs)
 
-    def forward(self, name: str, state: str = "present") -> bool:
+    def forward(self, name: str, state: str = "present", limit: str = None) -> bool:
         """Install python packages using pip
 
         Args:
             name: the name of the package
             state: one of latest, present, absent
+            limit: a host pattern that restricts the hosts to run on, like web:!web3
 
         Returns:
             boolean
         """
         display_tool(self, self.state["console"], self.state["log"])
-        output = ftl.run_module_sync(
-            self.state["inventory"],
-            self.state["modules"],
+        output = run_module(
+            self.state,
             "pip",
-            self.state["gate_cache"],
             module_args=dict(name=name, state=state),
-            dependencies=dependencies,
-            loop=self.state["loop"],
-            use_gate=self.state["gate"],
+            limit=limit,
+            retry=DOWNLOAD_RETRY,
         )
 
         display_results(output, self.state["console"], self.state["log"])
@@ -44,35 +44,34 @@ class Pip(Tool):
 class PipRequirements(Tool):
     name = "pip_requirements_tool"
     module = "pip"
+    single_flight = True
 
     def __init__(self, state, *args, **kwargs):
         self.state = state
         super().__init__(*args, **kwargs)
 
-    def forward(self, requirements: str, venv: str) -> bool:
+    def forward(self, requirements: str, venv: str, limit: str = None) -> bool:
         """Install dependencies from python requirements.txt files using pip.
 
         Args:
             requirements: the path to the requirements.txt file
             venv: the path to the virtual environment to install the packages to
+            limit: a host pattern that restricts the hosts to run on, like web:!web3
 
         Returns:
             boolean
         """
         display_tool(self, self.state["console"], self.state["log"])
-        output = ftl.run_module_sync(
-            self.state["inventory"],
-            self.state["modules"],
+        output = run_module(
+            self.state,
             "pip",
-            self.state["gate_cache"],
             module_args=dict(
                 requirements=requirements,
                 virtualenv=venv,
                 virtualenv_command="python3 -m venv",
             ),
-            dependencies=dependencies,
-            loop=self.state["loop"],
-            use_gate=self.state["gate"],
+            limit=limit,
+            retry=DOWNLOAD_RETRY,
         )
 
         display_results(output, self.state["console"], self.state["log"])
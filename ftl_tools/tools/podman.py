@@ -1,42 +1,42 @@
 from smolagents.tools import Tool
 from ftlagents.tools import get_json_schema
-import faster_than_light as ftl
-from ftl_tools.utils import dependencies, display_results, display_tool
+from ftl_tools.dispatch import run_module
+from ftl_tools.utils import display_results, display_tool
 
 
 class PodmanVersion(Tool):
     name = "podman_version_tool"
     module = "command"
+    single_flight = True
 
     def __init__(self, state, *args, **kwargs):
         self.state = state
         super().__init__(*args, **kwargs)
 
-    def forward(self) -> bool:
+    def forward(self, limit: str = None) -> bool:
         """Gets the podman version
 
+        Args:
+            limit: a host pattern that restricts the hosts to run on, like web:!web3
+
         Returns:
             boolean
         """
         display_tool(self, self.state["console"], self.state["log"])
 
-        output = ftl.run_module_sync(
-            self.state["inventory"],
-            self.state["modules"],
+        output = run_module(
+            self.state,
             "command",
-            self.state["gate_cache"],
             module_args=dict(
                 _uses_shell=True,
                 _raw_params="podman --version",
             ),
-            dependencies=dependencies,
-            loop=self.state["loop"],
-            use_gate=self.state["gate"],
+            limit=limit,
         )
 
         display_results(output, self.state["console"], self.state["log"])
 
-        return True
+        return output
 
     description, inputs, output_type = get_json_schema(forward)
 
@@ -44,39 +44,37 @@ class PodmanVersion(Tool):
 class PodmanPull(Tool):
     name = "podman_pull_tool"
     module = "command"
+    single_flight = True
 
     def __init__(self, state, *args, **kwargs):
         self.state = state
         super().__init__(*args, **kwargs)
 
-    def forward(self, image: str) -> bool:
+    def forward(self, image: str, limit: str = None) -> bool:
         """Pulls a container image using podman
 
         Args:
             image: the container image to pull
+            limit: a host pattern that restricts the hosts to run on, like web:!web3
 
         Returns:
             boolean
         """
         display_tool(self, self.state["console"], self.state["log"])
 
-        output = ftl.run_module_sync(
-            self.state["inventory"],
-            self.state["modules"],
+        output = run_module(
+            self.state,
             "command",
-            self.state["gate_cache"],
             module_args=dict(
                 _uses_shell=True,
                 _raw_params=f"podman pull {image}",
             ),
-            dependencies=dependencies,
-            loop=self.state["loop"],
-            use_gate=self.state["gate"],
+            limit=limit,
         )
 
         display_results(output, self.state["console"], self.state["log"])
 
-        return True
+        return output
 
     description, inputs, output_type = get_json_schema(forward)
 
@@ -89,33 +87,32 @@ class PodmanRun(Tool):
         self.state = state
         super().__init__(*args, **kwargs)
 
-    def forward(self, image: str) -> bool:
+    def forward(self, image: str, limit: str = None, timeout: int = None) -> bool:
         """Runs a container image using podman
 
         Args:
             image: the container image to run
+            limit: a host pattern that restricts the hosts to run on, like web:!web3
+            timeout: the number of seconds after which the command is stopped on each host
 
         Returns:
             boolean
         """
         display_tool(self, self.state["console"], self.state["log"])
 
-        output = ftl.run_module_sync(
-            self.state["inventory"],
-            self.state["modules"],
+        output = run_module(
+            self.state,
             "command",
-            self.state["gate_cache"],
             module_args=dict(
                 _uses_shell=True,
                 _raw_params=f"podman run -it {image}",
             ),
-            dependencies=dependencies,
-            loop=self.state["loop"],
-            use_gate=self.state["gate"],
+            limit=limit,
+            timeout=timeout,
         )
 
         display_results(output, self.state["console"], self.state["log"])
 
-        return True
+        return output
 
     description, inputs, output_type = get_json_schema(forward)
@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+from smolagents.tools import Tool
+from ftlagents.tools import get_json_schema
+
+from ftl_tools.spool import SpooledOutput
+from ftl_tools.utils import display_tool
+
+
+class ReadOutput(Tool):
+    name = "read_output_tool"
+    module = None
+
+    def __init__(self, state, *args, **kwargs):
+        self.state = state
+        super().__init__(*args, **kwargs)
+
+    def forward(self, handle: str, start: int = 0, lines: int = 100, pattern: str = None) -> str:
+        """Read a page of command output that was too large to return in full
+
+        Args:
+            handle: the handle from the stdout_spool or stderr_spool of a host result
+            start: the number of the first line to return, counting from zero
+            lines: the number of lines to return
+            pattern: a regular expression; if given, return up to lines matching lines instead
+
+        Returns:
+            string
+        """
+        display_tool(self, self.state["console"], self.state["log"])
+
+        with SpooledOutput(self.state, handle) as spooled:
+            if pattern:
+                return "\n".join(f"{n}: {line}" for n, line in spooled.grep(pattern, lines))
+            return "\n".join(spooled.lines(start, lines))
+
+    description, inputs, output_type = get_json_schema(forward)
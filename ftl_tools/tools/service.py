@@ -1,7 +1,7 @@
 from smolagents.tools import Tool
 from ftlagents.tools import get_json_schema
-import faster_than_light as ftl
-from ftl_tools.utils import dependencies, display_results, display_tool
+from ftl_tools.dispatch import run_module
+from ftl_tools.utils import display_results, display_tool
 
 
 class Service(Tool):
@@ -12,27 +12,24 @@ class Service(Tool):
         self.state = state
         super().__init__(*args, **kwargs)
 
-    def forward(self, name: str, state: str) -> bool:
+    def forward(self, name: str, state: str, limit: str = None) -> bool:
         """Manager a service
 
         Args:
             name: the name of the service
             state: one of started, restarted, or stopped
+            limit: a host pattern that restricts the hosts to run on, like web:!web3
 
         Returns:
             boolean
         """
         display_tool(self, self.state["console"], self.state["log"])
 
-        output = ftl.run_module_sync(
-            self.state["inventory"],
-            self.state["modules"],
+        output = run_module(
+            self.state,
             "service",
-            self.state["gate_cache"],
             module_args=dict(name=name, state=state),
-            dependencies=dependencies,
-            loop=self.state["loop"],
-            use_gate=self.state["gate"],
+            limit=limit,
         )
 
         display_results(output, self.state["console"], self.state["log"])
@@ -1,7 +1,7 @@
 from smolagents.tools import Tool
 from ftlagents.tools import get_json_schema
-import faster_than_light as ftl
-from ftl_tools.utils import dependencies, display_results, display_tool
+from ftl_tools.dispatch import run_module
+from ftl_tools.utils import display_results, display_tool
 
 
 class SetSeBool(Tool):
@@ -12,30 +12,27 @@ class SetSeBool(Tool):
         self.state = state
         super().__init__(*args, **kwargs)
 
-    def forward(self, name: str, value: str) -> bool:
+    def forward(self, name: str, value: str, limit: str = None) -> bool:
         """Sets SE linux boolen values
 
         Args:
             name: The name of the boolean to set
             value: The value to set.  One of `on` or `off`.
+            limit: a host pattern that restricts the hosts to run on, like web:!web3
 
         Returns:
             boolean
         """
         display_tool(self, self.state["console"], self.state["log"])
 
-        output = ftl.run_module_sync(
-            self.state["inventory"],
-            self.state["modules"],
+        output = run_module(
+            self.state,
             "command",
-            self.state["gate_cache"],
             module_args=dict(
                 _uses_shell=True,
                 _raw_params=f"setsebool {name} {value}",
             ),
-            dependencies=dependencies,
-            loop=self.state["loop"],
-            use_gate=self.state["gate"],
+            limit=limit,
         )
 
         display_results(output, self.state["console"], self.state["log"])
@@ -1,7 +1,7 @@
 from smolagents.tools import Tool
 from ftlagents.tools import get_json_schema
-import faster_than_light as ftl
-from ftl_tools.utils import dependencies, display_results, display_tool
+from ftl_tools.dispatch import run_module
+from ftl_tools.utils import display_results, display_tool
 
 
 class Slack(Tool):
@@ -22,14 +22,12 @@ class Slack(Tool):
             boolean
         """
         display_tool(self, self.state["console"], self.state["log"])
-        output = ftl.run_module_sync(
-            self.state["localhost"],
-            self.state["modules"],
+        output = run_module(
+            self.state,
             "slack",
-            self.state["gate_cache"],
             module_args=dict(msg=msg, token=str(self.state["secrets"]["SLACK_TOKEN"])),
-            loop=self.state["loop"],
-            use_gate=self.state["gate"],
+            dependencies=None,
+            inventory=self.state["localhost"],
         )
 
         display_results(output, self.state["console"], self.state["log"])
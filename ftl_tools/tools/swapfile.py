@@ -2,9 +2,8 @@
 from smolagents.tools import Tool
 from ftlagents.tools import get_json_schema
 
-import faster_than_light as ftl
-
-from ftl_tools.utils import dependencies, display_results, display_tool
+from ftl_tools.dispatch import run_module
+from ftl_tools.utils import display_results, display_tool
 
 
 class SwapFile(Tool):
@@ -15,13 +14,14 @@ class SwapFile(Tool):
         self.state = state
         super().__init__(*args, **kwargs)
 
-    def forward(self, location: str, size: int, permanent: bool = True) -> bool:
+    def forward(self, location: str, size: int, permanent: bool = True, limit: str = None) -> bool:
         """Creates a swapfile
 
         Args:
             location: The location of the swapfile
             size: The size of the swapfile
             permanent: True if permanent
+            limit: a host pattern that restricts the hosts to run on, like web:!web3
 
         Returns:
             boolean
@@ -30,19 +30,15 @@ class SwapFile(Tool):
 
         def run_command(command):
 
-            output = ftl.run_module_sync(
-                self.state["inventory"],
-                self.state["modules"],
+            output = run_module(
+                self.state,
                 "command",
-                self.state["gate_cache"],
                 module_args=dict(
                     _uses_shell=True,
                     _raw_params=command,
                     creates=location,
                 ),
-                dependencies=dependencies,
-                loop=self.state["loop"],
-                use_gate=self.state["gate"],
+                limit=limit,
             )
 
             display_results(output, self.state["console"], self.state["log"])
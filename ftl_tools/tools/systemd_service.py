@@ -2,9 +2,9 @@
 from smolagents.tools import Tool
 from ftlagents.tools import get_json_schema
 
-import faster_than_light as ftl
-
-from ftl_tools.utils import dependencies, display_results, display_tool
+from ftl_tools.dispatch import run_module
+from ftl_tools.facts import skip_unsupported
+from ftl_tools.utils import display_results, display_tool
 
 
 class SystemDService(Tool):
@@ -14,29 +14,34 @@ class SystemDService(Tool):
         self.state = state
         super().__init__(*args, **kwargs)
 
-    def forward(self, name: str, state: str = "started", enabled: bool = False) -> bool:
+    def forward(self, name: str, state: str = "started", enabled: bool = False, limit: str = None) -> bool:
         """Control systemd services
 
         Args:
             name: the name of the service
             state: one of reloaded, restarted, started, or stopped
             enabled: start on boot
+            limit: a host pattern that restricts the hosts to run on, like web:!web3
 
         Returns:
             boolean
         """
         display_tool(self, self.state["console"], self.state["log"])
-        output = ftl.run_module_sync(
-            self.state["inventory"],
-            self.state["modules"],
-            "systemd_service",
-            self.state["gate_cache"],
-            module_args=dict(name=name, state=state, enabled=enabled),
-            dependencies=dependencies,
-            loop=self.state["loop"],
-            use_gate=self.state["gate"],
+
+        hosts, output = skip_unsupported(
+            self.state, limit, "init", ("systemd",), "systemd is not the init system"
         )
 
+        if hosts:
+            output.update(
+                run_module(
+                    self.state,
+                    "systemd_service",
+                    module_args=dict(name=name, state=state, enabled=enabled),
+                    limit=hosts,
+                )
+            )
+
         display_results(output, self.state["console"], self.state["log"])
 
         return output
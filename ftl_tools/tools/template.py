@@ -1,6 +1,7 @@
 from smolagents.tools import Tool
 from ftlagents.tools import get_json_schema
-import faster_than_light as ftl
+from ftl_tools.dispatch import dispatch, run_ftl
+from ftl_tools.inventory import limit_inventory
 from ftl_tools.utils import dependencies, display_results, display_tool, safe_join_path
 
 
@@ -14,12 +15,13 @@ class Template(Tool):
         super().__init__(*args, **kwargs)
 
 
-    def forward(self, src: str, dest: str) -> bool:
+    def forward(self, src: str, dest: str, limit: str = None) -> bool:
         """Template a local file and copy the result to a remote machine.
 
         Args:
             src: The source of the template to be copied
             dest: The destination of the file
+            limit: a host pattern that restricts the hosts to run on, like web:!web3
 
         Returns:
             boolean
@@ -31,13 +33,18 @@ class Template(Tool):
             return False
 
         display_tool(self, self.state["console"], self.state["log"])
-        output = ftl.template_sync(
-            self.state["inventory"],
-            self.state["gate_cache"],
-            src=src,
-            dest=dest,
-            loop=self.state["loop"],
-        )
+
+        def template(inventory):
+            return run_ftl(
+                self.state,
+                "template",
+                inventory,
+                self.state["gate_cache"],
+                src=src,
+                dest=dest,
+            )
+
+        output = dispatch(self.state, template, limit_inventory(self.state, limit))
 
         display_results(output, self.state["console"], self.state["log"])
 
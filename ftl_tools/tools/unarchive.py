@@ -2,9 +2,8 @@
 from smolagents.tools import Tool
 from ftlagents.tools import get_json_schema
 
-import faster_than_light as ftl
-
-from ftl_tools.utils import dependencies, display_results, display_tool
+from ftl_tools.dispatch import run_module
+from ftl_tools.utils import display_results, display_tool
 
 
 class Unarchive(Tool):
@@ -14,26 +13,23 @@ class Unarchive(Tool):
         self.state = state
         super().__init__(*args, **kwargs)
 
-    def forward(self, src: str, dest: str) -> bool:
+    def forward(self, src: str, dest: str, limit: str = None) -> bool:
         """Unarchives files from the archive file to the destination directory.
 
         Args:
             src: the name of the archive
             dest: the destination of the unarchived files
+            limit: a host pattern that restricts the hosts to run on, like web:!web3
 
         Returns:
             boolean
         """
         display_tool(self, self.state["console"], self.state["log"])
-        output = ftl.run_module_sync(
-            self.state["inventory"],
-            self.state["modules"],
+        output = run_module(
+            self.state,
             "unarchive",
-            self.state["gate_cache"],
             module_args=dict(src=src, dest=dest, remote_src=True),
-            dependencies=dependencies,
-            loop=self.state["loop"],
-            use_gate=self.state["gate"],
+            limit=limit,
         )
 
         display_results(output, self.state["console"], self.state["log"])
@@ -1,10 +1,35 @@
 #!/usr/bin/env python3
+import shlex
 from smolagents.tools import Tool
 from ftlagents.tools import get_json_schema
 
-import faster_than_light as ftl
+from ftl_tools.dispatch import run_module
+from ftl_tools.utils import display_results, display_tool
+from ftl_tools.tools.authorized_key import authorized_keys_script, key_lines, report_changes
 
-from ftl_tools.utils import dependencies, display_results, display_tool
+
+def users_script(name, group, groups=()):
+    """Build shell commands that reconcile a user and its groups."""
+
+    q_name = shlex.quote(name)
+    q_group = shlex.quote(group)
+    lines = []
+    for g in [group, *groups]:
+        q_g = shlex.quote(g)
+        lines.append(f'getent group {q_g} > /dev/null || {{ groupadd {q_g}; echo {shlex.quote(f"CHANGED group {g}")}; }}')
+    lines += [
+        f"if id -u {q_name} > /dev/null 2>&1; then",
+        f'  [ "$(id -gn {q_name})" = {q_group} ] || {{ usermod -g {q_group} {q_name}; echo {shlex.quote(f"CHANGED user {name}")}; }}',
+        "else",
+        f'  useradd -m -g {q_group} {q_name}; echo {shlex.quote(f"CHANGED user {name}")}',
+        "fi",
+    ]
+    for g in groups:
+        q_g = shlex.quote(g)
+        lines.append(
+            f'id -nG {q_name} | tr " " "\\n" | grep -qxF {q_g} || {{ usermod -aG {q_g} {q_name}; echo {shlex.quote(f"CHANGED user {name}")}; }}'
+        )
+    return lines
 
 
 class User(Tool):
@@ -15,34 +40,71 @@ class User(Tool):
         self.state = state
         super().__init__(*args, **kwargs)
 
-    def forward(self, name: str, group: str) -> bool:
+    def forward(self, name: str, group: str, limit: str = None) -> bool:
         """Create a user
 
         Args:
             name: the name of the user
             group: the group the user should belong to
+            limit: a host pattern that restricts the hosts to run on, like web:!web3
 
         Returns:
             boolean
         """
         display_tool(self, self.state["console"], self.state["log"])
-        output = ftl.run_module_sync(
-            self.state["inventory"],
-            self.state["modules"],
+        output = run_module(
+            self.state,
             "user",
-            self.state["gate_cache"],
             module_args=dict(
                 name=name,
                 create_home=True,
                 group=group,
             ),
-            dependencies=dependencies,
-            loop=self.state["loop"],
-            use_gate=self.state["gate"],
+            limit=limit,
         )
 
         display_results(output, self.state["console"], self.state["log"])
 
         return output
 
-    description, inputs, output_type = get_json_schema(forward)
\ No newline at end of file
+    description, inputs, output_type = get_json_schema(forward)
+
+
+class Users(Tool):
+    name = "users_tool"
+    module = "command"
+
+    def __init__(self, state, *args, **kwargs):
+        self.state = state
+        super().__init__(*args, **kwargs)
+
+    def forward(self, users: list, limit: str = None) -> bool:
+        """Create many users and upload their public keys in a single run per host
+
+        Args:
+            users: a list of users, each a dict with name, group, and optionally groups (a list of supplementary groups) and key_files (a list of paths to public key files)
+            limit: a host pattern that restricts the hosts to run on, like web:!web3
+
+        Returns:
+            boolean
+        """
+        display_tool(self, self.state["console"], self.state["log"])
+        script = ["set -e"]
+        for user in users:
+            if not user.get("name") or not user.get("group"):
+                raise Exception(f"name and group are required for {user}")
+            script += users_script(user["name"], user["group"], user.get("groups", []))
+            if user.get("key_files"):
+                script += authorized_keys_script(user["name"], key_lines(user["key_files"]))
+        output = run_module(
+            self.state,
+            "command",
+            module_args=dict(_uses_shell=True, _raw_params="\n".join(script)),
+            limit=limit,
+        )
+
+        display_results(report_changes(output), self.state["console"], self.state["log"])
+
+        return output
+
+    description, inputs, output_type = get_json_schema(forward)
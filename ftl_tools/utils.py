@@ -1,6 +1,9 @@
 
+import hashlib
 import json
+import os
 
+from rich.markup import escape
 from rich.pretty import pprint
 from rich.rule import Rule
 from pathlib import Path
@@ -12,6 +15,14 @@ dependencies = [
 ]
 
 
+class HostsFailed(Exception):
+    """Raised by display_results for a failed host, with the output of the whole call."""
+
+    def __init__(self, msg, output):
+        super().__init__(msg)
+        self.output = output
+
+
 def write_or_print(output, console, log):
 
     if log is None:
@@ -29,28 +40,106 @@ def display_tool(tool, console, log):
 
 
 def display_results(output, console, log):
+    groups = group_results(output)
     if log is None:
-        pprint(output, console=console)
-        for name, results in output.items():
+        pprint(groups, console=console)
+        for group in groups:
+            results = group["result"]
+            # Escaped, or the brackets around the names are read as markup
+            names = escape(f"[{host_names(group['hosts'])}]")
+            if results.get("unreachable"):
+                console.print(f"[red] unreachable: {names}")
+                continue
             if results.get("failed"):
-                raise Exception(results.get("msg"))
+                raise HostsFailed(results.get("msg"), output)
             if results.get("changed"):
-                console.print(f"[yellow] changed: [{name}]")
+                console.print(f"[yellow] changed: {names}")
+            elif results.get("skipped"):
+                console.print(f"[cyan] skipping: {names}")
             else:
-                console.print(f"[green] ok: [{name}]")
+                console.print(f"[green] ok: {names}")
         console.print("")
-        console.print_json(json.dumps(output))
+        console.print_json(json.dumps(groups, default=str))
     else:
-        log.write(output)
-        for name, results in output.items():
+        log.write(groups)
+        for group in groups:
+            results = group["result"]
+            names = host_names(group["hosts"])
+            if results.get("unreachable"):
+                log.write(f"[red] unreachable: [{names}]")
+                continue
             if results.get("failed"):
-                raise Exception(results.get("msg"))
+                raise HostsFailed(results.get("msg"), output)
             if results.get("changed"):
-                log.write(f"[yellow] changed: [{name}]")
+                log.write(f"[yellow] changed: [{names}]")
+            elif results.get("skipped"):
+                log.write(f"[cyan] skipping: [{names}]")
             else:
-                log.write(f"[green] ok: [{name}]")
+                log.write(f"[green] ok: [{names}]")
         log.write("")
-        log.write(json.dumps(output))
+        log.write(json.dumps(groups, default=str))
+
+
+def host_names(hosts, limit=10):
+    """Return a short description of a list of host names."""
+
+    if len(hosts) <= limit:
+        return ", ".join(hosts)
+    return f"{', '.join(hosts[:limit])} and {len(hosts) - limit} more"
+
+
+# Keys that differ between hosts even when they did the same thing
+VOLATILE = ("timing", "start", "end", "delta")
+
+
+def normalize_result(results):
+    """Return a host result without the keys that vary from host to host."""
+
+    normalized = {k: v for k, v in results.items() if k not in VOLATILE}
+    for key, value in results.items():
+        if key.endswith("_spool") and isinstance(value, dict):
+            # Spool handles name the host
+            normalized[key] = {k: v for k, v in value.items() if k != "handle"}
+    return normalized
+
+
+def result_key(results):
+    normalized = json.dumps(normalize_result(results), sort_keys=True, default=str)
+    return hashlib.sha1(normalized.encode()).hexdigest()
+
+
+def group_results(output):
+    """Group hosts with identical results.
+
+    Returns a list of groups, largest first, each with the status, the
+    count and names of its hosts and the normalized result they share.
+    """
+
+    groups = {}
+    for host_name, results in output.items():
+        key = result_key(results)
+        group = groups.get(key)
+        if group is None:
+            group = groups[key] = dict(status=host_status(results), count=0, hosts=[], result=normalize_result(results))
+        group["count"] += 1
+        group["hosts"].append(host_name)
+    return sorted(groups.values(), key=lambda g: -g["count"])
+
+
+def host_status(results):
+    """Return the status of a host result as a single word."""
+
+    if results.get("unreachable"):
+        return "unreachable"
+    if results.get("timeout"):
+        return "timeout"
+    if results.get("failed"):
+        return "failed"
+    if results.get("skipped"):
+        return "skipped"
+    if results.get("changed"):
+        return "changed"
+    return "ok"
 
 
 def safe_join_path(a, b):
@@ -63,3 +152,31 @@ def safe_join_path(a, b):
         return None
 
     return str(combined)
+
+
+_key_cache = {}
+
+
+def read_key_file(key_file):
+    """Read a public key file, caching the contents until the file changes."""
+
+    key_file = os.path.abspath(os.path.expanduser(key_file))
+    if not os.path.exists(key_file) or not os.path.isfile(key_file):
+        raise Exception(f"{key_file} does not exist")
+    stat = os.stat(key_file)
+    version = (stat.st_mtime_ns, stat.st_size)
+    cached = _key_cache.get(key_file)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    with open(key_file) as f:
+        key_value = f.read()
+    _key_cache[key_file] = (version, key_value)
+    return key_value
+
+
+def data_path(state, name):
+    """Return the path of a file kept in the ftl_tools data directory."""
+
+    data_dir = os.path.expanduser(state.get("data_dir", "~/.ftl_tools"))
+    os.makedirs(data_dir, exist_ok=True)
+    return os.path.join(data_dir, name)
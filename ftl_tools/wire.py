@@ -0,0 +1,125 @@
+import json
+import struct
+import zlib
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+MAGIC = b"F"
+THRESHOLD = 4096
+FRAME = struct.Struct(">I")
+
+ENCODINGS = {"json": b"j"}
+if msgpack is not None:
+    ENCODINGS["msgpack"] = b"m"
+
+COMPRESSIONS = {"none": b"-", "zlib": b"z"}
+if zstandard is not None:
+    COMPRESSIONS["zstd"] = b"s"
+
+# Preferred first
+PREFERENCE = {
+    "encoding": ["msgpack", "json"],
+    "compression": ["zstd", "zlib", "none"],
+}
+
+
+def supported():
+    """Return the encodings and compressions this side can read and write."""
+
+    return {
+        "encoding": [e for e in PREFERENCE["encoding"] if e in ENCODINGS],
+        "compression": [c for c in PREFERENCE["compression"] if c in COMPRESSIONS],
+    }
+
+
+def negotiate(offered):
+    """Return the best encoding and compression supported by both sides.
+
+    offered is the supported() of the other side. JSON and zlib are always
+    available, so negotiation never fails.
+    """
+
+    ours = supported()
+    return {
+        kind: next((name for name in ours[kind] if name in offered.get(kind, ())), PREFERENCE[kind][-1])
+        for kind in ours
+    }
+
+
+def _encode(obj, encoding):
+    if encoding == "msgpack":
+        return msgpack.packb(obj, default=str, use_bin_type=True)
+    return json.dumps(obj, default=str, separators=(",", ":")).encode()
+
+
+def pack(obj, encoding="json", compression="zlib", threshold=THRESHOLD):
+    """Encode obj, compressing it when the encoded size reaches threshold.
+
+    The result starts with a three byte header naming the encoding and
+    compression, so unpack needs no options.
+    """
+
+    if encoding not in ENCODINGS:
+        raise Exception(f"Unsupported encoding {encoding}, expected one of {', '.join(ENCODINGS)}")
+    if compression not in COMPRESSIONS:
+        raise Exception(f"Unsupported compression {compression}, expected one of {', '.join(COMPRESSIONS)}")
+    data = _encode(obj, encoding)
+    if compression == "none" or threshold is None or len(data) < threshold:
+        compression = "none"
+    elif compression == "zstd":
+        data = zstandard.ZstdCompressor(level=3).compress(data)
+    else:
+        data = zlib.compress(data, 6)
+    return MAGIC + ENCODINGS[encoding] + COMPRESSIONS[compression] + data
+
+
+def unpack(data):
+    """Decode the output of pack. Plain JSON text or bytes are decoded as JSON."""
+
+    if isinstance(data, str):
+        return json.loads(data)
+    if data[:1] != MAGIC:
+        return json.loads(data)
+    encoding, compression, data = data[1:2], data[2:3], data[3:]
+    if compression == b"z":
+        data = zlib.decompress(data)
+    elif compression == b"s":
+        if zstandard is None:
+            raise Exception("Received zstd compressed data but zstandard is not installed")
+        data = zstandard.ZstdDecompressor().decompress(data)
+    elif compression != b"-":
+        raise Exception(f"Unknown compression {compression!r}")
+    if encoding == b"m":
+        if msgpack is None:
+            raise Exception("Received msgpack encoded data but msgpack is not installed")
+        return msgpack.unpackb(data, raw=False)
+    if encoding != b"j":
+        raise Exception(f"Unknown encoding {encoding!r}")
+    return json.loads(data)
+
+
+def write_frame(f, data):
+    f.write(FRAME.pack(len(data)) + data)
+    f.flush()
+
+
+def read_frame(f):
+    """Read one length prefixed frame, or return None at the end of the stream."""
+
+    header = f.read(FRAME.size)
+    if len(header) < FRAME.size:
+        return None
+    (size,) = FRAME.unpack(header)
+    data = f.read(size)
+    if len(data) < size:
+        raise Exception(f"Connection closed after {len(data)} of {size} bytes")
+    return data
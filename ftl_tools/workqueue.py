@@ -0,0 +1,366 @@
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+
+from ftl_tools.dispatch import run_module, start_loop_thread
+from ftl_tools.gates import prebuilt_gate
+from ftl_tools.inventory import split_inventory
+from ftl_tools.retry import RetryPolicy
+from ftl_tools.utils import data_path
+from ftl_tools.wire import pack, unpack
+
+
+logger = logging.getLogger("tools")
+
+
+SCHEMA = """\
+CREATE TABLE IF NOT EXISTS tasks (
+    id TEXT PRIMARY KEY,
+    call_id TEXT NOT NULL,
+    host TEXT NOT NULL,
+    module TEXT NOT NULL,
+    inventory TEXT NOT NULL,
+    kwargs TEXT NOT NULL,
+    status TEXT NOT NULL,
+    worker TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    result TEXT,
+    created REAL NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS tasks_status ON tasks (status, lease_expires, created);
+CREATE INDEX IF NOT EXISTS tasks_call ON tasks (call_id, status);
+"""
+
+
+class WorkQueue:
+    """Durable queue of per-host module runs in SQLite, shared by processes.
+
+    Workers lease tasks for a number of seconds and must renew the lease
+    while they run them. Tasks whose lease expires, because the worker died
+    or hung, are leased again by another worker, up to max_attempts times.
+    A worker can only complete a task it still holds the lease on.
+
+    Results are stored with wire.pack, compressed with compression when
+    large. zlib is the default since every worker can read it.
+    """
+
+    def __init__(self, path, max_attempts=3, compression="zlib"):
+        self.path = path
+        self.max_attempts = max_attempts
+        self.compression = compression
+        self.db = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript(SCHEMA)
+        self.lock = threading.Lock()
+
+    def submit(self, call_id, module_name, host_inventories, host_kwargs):
+        now = time.time()
+        rows = [
+            (uuid.uuid4().hex, call_id, host_name, module_name, json.dumps(inventory), json.dumps(host_kwargs[host_name]), "queued", now, now)
+            for host_name, inventory in host_inventories.items()
+        ]
+        with self.lock:
+            self.db.execute("BEGIN IMMEDIATE")
+            self.db.executemany(
+                "INSERT INTO tasks (id, call_id, host, module, inventory, kwargs, status, created, updated) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            self.db.execute("COMMIT")
+
+    def lease(self, worker, lease_seconds=60, limit=50):
+        """Lease up to limit queued or expired tasks of one call."""
+
+        now = time.time()
+        with self.lock:
+            self.db.execute("BEGIN IMMEDIATE")
+            try:
+                expired = self.db.execute(
+                    "SELECT id, host, attempts FROM tasks WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?",
+                    (now, self.max_attempts),
+                ).fetchall()
+                for task_id, host_name, attempts in expired:
+                    result = dict(failed=True, msg=f"the lease on {host_name} expired {attempts} times")
+                    self.db.execute(
+                        "UPDATE tasks SET status = 'done', result = ?, updated = ? WHERE id = ?",
+                        (json.dumps(result), now, task_id),
+                    )
+                first = self.db.execute(
+                    "SELECT call_id FROM tasks WHERE status = 'queued' OR (status = 'leased' AND lease_expires < ?) ORDER BY created LIMIT 1",
+                    (now,),
+                ).fetchone()
+                if first is None:
+                    self.db.execute("COMMIT")
+                    return []
+                rows = self.db.execute(
+                    "SELECT id, call_id, host, module, inventory, kwargs FROM tasks"
+                    " WHERE call_id = ? AND (status = 'queued' OR (status = 'leased' AND lease_expires < ?))"
+                    " ORDER BY created LIMIT ?",
+                    (first[0], now, limit),
+                ).fetchall()
+                self.db.executemany(
+                    "UPDATE tasks SET status = 'leased', worker = ?, lease_expires = ?, attempts = attempts + 1, updated = ? WHERE id = ?",
+                    [(worker, now + lease_seconds, now, row[0]) for row in rows],
+                )
+                self.db.execute("COMMIT")
+            except BaseException:
+                self.db.execute("ROLLBACK")
+                raise
+        return [
+            dict(id=i, call_id=c, host=h, module=m, inventory=json.loads(inv), kwargs=json.loads(kw))
+            for i, c, h, m, inv, kw in rows
+        ]
+
+    def renew(self, worker, task_ids, lease_seconds=60):
+        now = time.time()
+        with self.lock:
+            self.db.executemany(
+                "UPDATE tasks SET lease_expires = ?, updated = ? WHERE id = ? AND worker = ? AND status = 'leased'",
+                [(now + lease_seconds, now, task_id, worker) for task_id in task_ids],
+            )
+
+    def complete(self, worker, task_id, result):
+        """Record the result of a task, unless its lease was lost. Returns True if recorded."""
+
+        with self.lock:
+            cursor = self.db.execute(
+                "UPDATE tasks SET status = 'done', result = ?, lease_expires = NULL, updated = ?"
+                " WHERE id = ? AND worker = ? AND status = 'leased'",
+                (pack(result, compression=self.compression), time.time(), task_id, worker),
+            )
+        return cursor.rowcount == 1
+
+    def cancel(self, call_id, msg):
+        now = time.time()
+        result = json.dumps(dict(failed=True, timeout=True, msg=msg))
+        with self.lock:
+            self.db.execute(
+                "UPDATE tasks SET status = 'done', result = ?, updated = ? WHERE call_id = ? AND status != 'done'",
+                (result, now, call_id),
+            )
+
+    def results(self, call_id, exclude=()):
+        rows = self.db.execute("SELECT host, result FROM tasks WHERE call_id = ? AND status = 'done'", (call_id,))
+        return {host_name: unpack(result) for host_name, result in rows if host_name not in exclude}
+
+    def remaining(self, call_id):
+        return self.db.execute("SELECT COUNT(*) FROM tasks WHERE call_id = ? AND status != 'done'", (call_id,)).fetchone()[0]
+
+    def purge(self, call_id):
+        with self.lock:
+            self.db.execute("DELETE FROM tasks WHERE call_id = ?", (call_id,))
+
+    def status(self):
+        return dict(self.db.execute("SELECT status, COUNT(*) FROM tasks GROUP BY status").fetchall())
+
+
+class Coordinator:
+    """Send the module runs of run_module to workers through a WorkQueue.
+
+    Each host becomes a task, so a worker that dies only delays the hosts it
+    had leased. Results are streamed to on_result as workers complete them.
+    """
+
+    def __init__(self, state, path=None, poll=0.2, keep=False):
+        self.state = state
+        self.queue = WorkQueue(path or data_path(state, "queue.sqlite"))
+        self.poll = poll
+        self.keep = keep
+
+    def run_module(self, inventory, module_name, on_result=None, host_args=None, deadline=None, **kwargs):
+        on_result = on_result or self.state.get("on_host_result")
+        if kwargs.get("retry") is not None:
+            # Retry policies are applied by the worker that runs each host
+            kwargs["retry"] = vars(kwargs["retry"])
+        host_inventories = split_inventory(inventory)
+        host_kwargs = {
+            host_name: dict(kwargs, host_args={host_name: host_args[host_name]} if host_args and host_name in host_args else None)
+            for host_name in host_inventories
+        }
+        call_id = uuid.uuid4().hex
+        self.queue.submit(call_id, module_name, host_inventories, host_kwargs)
+
+        start = time.monotonic()
+        seen = {}
+        try:
+            while True:
+                results = self.queue.results(call_id, exclude=seen)
+                for host_name, result in results.items():
+                    seen[host_name] = result
+                    if on_result is not None:
+                        on_result(host_name, result)
+                if len(seen) == len(host_inventories):
+                    break
+                if deadline is not None and time.monotonic() - start > deadline:
+                    self.queue.cancel(call_id, f"exceeded the {deadline}s deadline of the call")
+                    continue
+                time.sleep(self.poll)
+        except BaseException:
+            self.queue.cancel(call_id, "the call was interrupted")
+            raise
+        finally:
+            if not self.keep:
+                self.queue.purge(call_id)
+        return {h: seen[h] for h in host_inventories}
+
+
+def merge_inventories(inventories):
+    merged = {}
+    for inventory in inventories:
+        for name, group in inventory.items():
+            target = merged.setdefault(name, dict(group, hosts={}))
+            target["hosts"].update(group.get("hosts") or {})
+    return merged
+
+
+class Worker:
+    """Lease tasks from a WorkQueue and run them with a local loop and gate cache.
+
+    gate is a gate builder, as in state["gate"], or the path of a prebuilt gate.
+    """
+
+    def __init__(self, path, modules, gate=None, data_dir=None, name=None, lease_seconds=60, batch=50):
+        self.queue = WorkQueue(path)
+        self.name = name or f"{socket.gethostname()}:{os.getpid()}"
+        self.lease_seconds = lease_seconds
+        self.batch = batch
+        if isinstance(gate, str):
+            gate = prebuilt_gate(gate)
+        self.state = {
+            "inventory": {},
+            "modules": modules,
+            "gate_cache": {},
+            "gate": gate,
+            "loop": asyncio.new_event_loop(),
+            "console": None,
+            "log": None,
+        }
+        if data_dir is not None:
+            self.state["data_dir"] = data_dir
+        # Run the loop like the daemon does, so the run_ftl tools do not wait on an idle loop
+        start_loop_thread(self.state)
+
+    def close(self):
+        loop = self.state["loop"]
+        loop.call_soon_threadsafe(loop.stop)
+        self.state["loop_thread"].join()
+        loop.close()
+
+    def run_once(self):
+        """Lease and run one batch of tasks. Returns the number of tasks run."""
+
+        tasks = self.queue.lease(self.name, self.lease_seconds, self.batch)
+        if not tasks:
+            return 0
+        task_ids = {task["host"]: task["id"] for task in tasks}
+        stop = threading.Event()
+
+        def heartbeat():
+            while not stop.wait(self.lease_seconds / 3):
+                self.queue.renew(self.name, list(task_ids.values()), self.lease_seconds)
+
+        renewer = threading.Thread(target=heartbeat, daemon=True)
+        renewer.start()
+        try:
+            kwargs = dict(tasks[0]["kwargs"])
+            host_args = {}
+            for task in tasks:
+                host_args.update(task["kwargs"].get("host_args") or {})
+            kwargs["host_args"] = host_args or None
+            if kwargs.get("retry") is not None:
+                kwargs["retry"] = RetryPolicy(**kwargs["retry"])
+            try:
+                output = run_module(
+                    self.state,
+                    tasks[0]["module"],
+                    inventory=merge_inventories(task["inventory"] for task in tasks),
+                    **kwargs,
+                )
+            except Exception as e:
+                output = {task["host"]: dict(failed=True, msg=f"{type(e).__name__}: {e}") for task in tasks}
+        finally:
+            stop.set()
+            renewer.join()
+        for host_name, task_id in task_ids.items():
+            result = output.get(host_name, dict(failed=True, msg="no result from the worker"))
+            if not self.queue.complete(self.name, task_id, result):
+                logger.warning(f"Lost the lease on {host_name}, dropping its result")
+        return len(tasks)
+
+    def run(self, stop=None, idle_exit=None, poll=0.5):
+        """Run tasks until stop is set, or after idle_exit seconds without work."""
+
+        idle_since = time.monotonic()
+        while stop is None or not stop.is_set():
+            if self.run_once():
+                idle_since = time.monotonic()
+            elif idle_exit is not None and time.monotonic() - idle_since > idle_exit:
+                break
+            else:
+                time.sleep(poll)
+
+
+def enable_coordinator(state, path=None):
+    """Send the module runs of the tools using state to workers through a queue."""
+
+    state["coordinator"] = Coordinator(state, path)
+    return state["coordinator"]
+
+
+def _run_worker(path, modules, gate, data_dir, name, idle_exit):
+    worker = Worker(path, modules, gate, data_dir, name)
+    try:
+        worker.run(idle_exit=idle_exit)
+    finally:
+        worker.close()
+
+
+def start_local_workers(state, count=2, idle_exit=None, context="spawn"):
+    """Start worker processes on this machine for the queue of the coordinator of state.
+
+    Used to try out and test distributed runs without other machines.
+    """
+
+    ctx = multiprocessing.get_context(context)
+    coordinator = state["coordinator"]
+    processes = []
+    for index in range(count):
+        process = ctx.Process(
+            target=_run_worker,
+            args=(coordinator.queue.path, state["modules"], state["gate"], state.get("data_dir"), f"local-{index}", idle_exit),
+            daemon=True,
+        )
+        process.start()
+        processes.append(process)
+    return processes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run ftl_tools module runs from a work queue")
+    parser.add_argument("queue", help="path of the SQLite work queue shared with the coordinator")
+    parser.add_argument("--modules", action="append", default=None, help="module directory, may be repeated")
+    parser.add_argument("--gate", default=None, help="prebuilt gate to use")
+    parser.add_argument("--name", default=None, help="worker name, defaults to host:pid")
+    parser.add_argument("--lease", type=int, default=60, help="seconds a task is leased for")
+    parser.add_argument("--batch", type=int, default=50, help="most tasks leased at once")
+    parser.add_argument("--idle-exit", type=float, default=None, help="exit after this many idle seconds")
+    args = parser.parse_args()
+    gate = prebuilt_gate(args.gate) if args.gate else None
+    worker = Worker(args.queue, args.modules or ["modules"], gate, name=args.name, lease_seconds=args.lease, batch=args.batch)
+    try:
+        worker.run(idle_exit=args.idle_exit)
+    finally:
+        worker.close()
+
+
+if __name__ == "__main__":
+    main()
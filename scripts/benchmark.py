@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+
+"""
+Benchmark tool dispatch overhead against a fake fleet of local hosts.
+
+Every host of the fleet uses a local connection and gets its own working
+directory under a temporary directory, so the benchmarks run offline on one
+machine. The report is written as JSON and can be compared with an earlier
+report using --compare. Benchmarks that fail are recorded in the report with
+their error, listed at the end, and make the script exit with status 1.
+"""
+
+import asyncio
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import click
+from rich import print
+from rich.console import Console
+from rich.table import Table
+
+from ftl_tools.dispatch import dispatch, run_module, start_loop_thread
+from ftl_tools.inventory import limit_inventory, resolve_host_args
+from ftl_tools.tools import LineInFile, Mkdir, Chmod
+from ftl_tools.utils import display_results
+
+
+def measure(fn, repeat):
+    """Call fn repeat times and summarize the wall clock times in seconds."""
+
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    times.sort()
+    return {
+        "runs": repeat,
+        "min": times[0],
+        "median": statistics.median(times),
+        "mean": statistics.fmean(times),
+        "p90": times[min(len(times) - 1, int(len(times) * 0.9))],
+    }
+
+
+def fake_fleet(root, size):
+    """Return an inventory of size local hosts, each with its own directory."""
+
+    hosts = {}
+    for i in range(size):
+        name = f"host{i:04d}"
+        workdir = os.path.join(root, name)
+        os.makedirs(workdir, exist_ok=True)
+        hosts[name] = {
+            "ansible_connection": "local",
+            "ansible_python_interpreter": sys.executable,
+            "workdir": workdir,
+        }
+    return {"fleet": {"hosts": hosts}}
+
+
+def fake_state(inventory, modules, root):
+    """Return a state for the fleet with its loop running in a thread, as the agents run it."""
+
+    state = {
+        "inventory": inventory,
+        "modules": modules,
+        "gate_cache": {},
+        "gate": None,
+        "loop": asyncio.new_event_loop(),
+        "console": Console(file=io.StringIO()),
+        "log": None,
+        "secrets": {},
+        "workspace": root,
+        "localhost": {"all": {"hosts": {"localhost": {"ansible_connection": "local"}}}},
+        "data_dir": os.path.join(root, ".ftl_tools"),
+    }
+    start_loop_thread(state)
+    return state
+
+
+def stop_loop(state):
+    loop = state["loop"]
+    loop.call_soon_threadsafe(loop.stop)
+    state["loop_thread"].join()
+    loop.close()
+
+
+def fake_output(inventory):
+    return {
+        host_name: {"changed": True, "rc": 0, "stdout": "ok", "stderr": ""}
+        for group in inventory.values()
+        for host_name in group["hosts"]
+    }
+
+
+def bench_dispatch(state, repeat):
+    """Time the dispatch pipeline around a run that returns immediately."""
+
+    return measure(lambda: dispatch(state, fake_output, state["inventory"]), repeat)
+
+
+def bench_module(state, repeat):
+    """Time running the command module on every host of the fleet."""
+
+    def run():
+        output = run_module(state, "command", module_args=dict(_raw_params="true"))
+        failed = [h for h, results in output.items() if results.get("failed")]
+        if failed:
+            raise Exception(f"command failed on {len(failed)} hosts: {output[failed[0]].get('msg')}")
+
+    return measure(run, repeat)
+
+
+def bench_tools(state, root, repeat):
+    """Time a few tool calls end to end, recording errors instead of stopping."""
+
+    calls = {
+        "mkdir_tool": lambda: Mkdir(state)(name=os.path.join(root, "bench")),
+        "lineinfile_tool": lambda: LineInFile(state)(line="bench", path="{{ workdir }}/bench.txt"),
+        "chmod_tool": lambda: Chmod(state)(permissions="0644", location="{{ workdir }}/bench.txt"),
+    }
+    results = {}
+    for name, call in calls.items():
+        try:
+            results[name] = measure(call, repeat)
+        except Exception as e:
+            results[name] = {"error": f"{type(e).__name__}: {e}"}
+    return results
+
+
+def bench_gate_build(modules, root):
+    """Time building a gate with an empty gate cache and again with it warm."""
+
+    try:
+        from faster_than_light.gate import build_ftl_gate
+    except ImportError as e:
+        return {"error": f"ImportError: {e}"}
+
+    home = os.environ.get("HOME")
+    # Gates are cached under the home directory, so a fresh one forces a build
+    os.environ["HOME"] = tempfile.mkdtemp(dir=root)
+    try:
+        cold = measure(lambda: build_ftl_gate(module_dirs=modules), 1)
+        warm = measure(lambda: build_ftl_gate(module_dirs=modules), 5)
+    except Exception as e:
+        return {"error": f"{type(e).__name__}: {e}"}
+    finally:
+        if home is None:
+            del os.environ["HOME"]
+        else:
+            os.environ["HOME"] = home
+    return {"cold": cold, "warm": warm}
+
+
+def bench_render(state, repeat):
+    """Time host selection, argument templating and result display."""
+
+    inventory = state["inventory"]
+    output = fake_output(inventory)
+    hosts = list(inventory["fleet"]["hosts"])
+    limit = f"fleet:!{hosts[0]}"
+    log = []
+
+    class Log:
+        write = log.append
+
+    return {
+        "limit": measure(lambda: limit_inventory(dict(state, inventory_index=None), limit), repeat),
+        "templates": measure(
+            lambda: resolve_host_args(inventory, {"path": "{{ workdir }}/file", "line": "x"}), repeat
+        ),
+        "display_console": measure(lambda: display_results(output, state["console"], None), repeat),
+        "display_log": measure(lambda: (display_results(output, None, Log()), log.clear()), repeat),
+    }
+
+
+def failures(report, prefix=""):
+    """Return the errors recorded in a report keyed by path."""
+
+    found = {}
+    for key, value in report.items():
+        if not isinstance(value, dict):
+            continue
+        if "error" in value:
+            found[prefix + key] = value["error"]
+        else:
+            found.update(failures(value, f"{prefix}{key}."))
+    return found
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def flatten(report, prefix=""):
+    """Return the median and single-run timings of a report keyed by path."""
+
+    flat = {}
+    for key, value in report.items():
+        if not isinstance(value, dict):
+            continue
+        if "median" in value:
+            flat[prefix + key] = value["median"]
+        else:
+            flat.update(flatten(value, f"{prefix}{key}."))
+    return flat
+
+
+def compare(report, baseline):
+    current = flatten(report["results"])
+    previous = flatten(baseline["results"])
+    table = Table(title=f"{baseline.get('revision')} -> {report.get('revision')}")
+    table.add_column("benchmark")
+    table.add_column("baseline (ms)", justify="right")
+    table.add_column("current (ms)", justify="right")
+    table.add_column("ratio", justify="right")
+    for key in sorted(current.keys() & previous.keys()):
+        ratio = current[key] / previous[key] if previous[key] else float("inf")
+        style = "red" if ratio > 1.1 else "green" if ratio < 0.9 else ""
+        table.add_row(
+            key,
+            f"{previous[key] * 1000:.3f}",
+            f"{current[key] * 1000:.3f}",
+            f"[{style}]{ratio:.2f}x[/{style}]" if style else f"{ratio:.2f}x",
+        )
+    print(table)
+
+
+@click.command()
+@click.option('--sizes', default='1,10,100,1000', help='Comma separated fleet sizes to benchmark')
+@click.option('--repeat', default=5, help='Number of timed runs of each benchmark')
+@click.option('--modules-dir', 'modules_dir', multiple=True, default=['modules'], help='Module directories to use')
+@click.option('--skip-modules', is_flag=True, help='Only benchmark the in-process overhead, without running modules')
+@click.option('--output', default='benchmark.json', help='File to write the JSON report to')
+@click.option('--compare', 'baseline', type=click.Path(exists=True), help='Earlier report to compare the results with')
+def main(sizes, repeat, modules_dir, skip_modules, output, baseline):
+    modules = list(modules_dir)
+    report = {
+        "revision": git_revision(),
+        "timestamp": time.time(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "config": {"sizes": sizes, "repeat": repeat, "modules": modules, "skip_modules": skip_modules},
+        "results": {"fleet": {}},
+    }
+
+    with tempfile.TemporaryDirectory(prefix="ftl-bench-") as root:
+        if not skip_modules:
+            report["results"]["gate_build"] = bench_gate_build(modules, root)
+        for size in [int(s) for s in sizes.split(",") if s]:
+            print(f"[cyan]fleet of {size}")
+            state = fake_state(fake_fleet(os.path.join(root, str(size)), size), modules, root)
+            results = report["results"]["fleet"][str(size)] = {
+                "dispatch": bench_dispatch(state, repeat),
+                "render": bench_render(state, repeat),
+            }
+            if not skip_modules:
+                try:
+                    # The first run includes starting the hosts and is timed separately
+                    results["module_cold"] = bench_module(state, 1)
+                    results["module"] = bench_module(state, repeat)
+                    results["module"]["hosts_per_second"] = size / results["module"]["median"]
+                except Exception as e:
+                    results["module"] = {"error": f"{type(e).__name__}: {e}"}
+                results["tools"] = bench_tools(state, root, repeat)
+            stop_loop(state)
+
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"[green]wrote {output}")
+
+    if baseline:
+        with open(baseline) as f:
+            compare(report, json.load(f))
+
+    failed = failures(report["results"])
+    if failed:
+        for key, error in sorted(failed.items()):
+            print(f"[red]{key} failed: {error}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+import asyncio
+import json
+import threading
+
+import pytest
+
+
+ECHO = """\
+#!/usr/bin/env python3
+# WANT_JSON
+import json
+import sys
+
+with open(sys.argv[1]) as f:
+    args = json.load(f)
+print(json.dumps(dict(changed=bool(args.get("changed")), args=args)))
+"""
+
+SLEEP = """\
+#!/usr/bin/env python3
+# WANT_JSON
+import json
+import sys
+import time
+
+with open(sys.argv[1]) as f:
+    args = json.load(f)
+time.sleep(float(args.get("seconds", 0)))
+print(json.dumps(dict(changed=False, slept=args.get("seconds", 0))))
+"""
+
+FAIL = """\
+#!/usr/bin/env python3
+# WANT_JSON
+import json
+
+print(json.dumps(dict(failed=True, msg="Connection timed out while downloading the mirror list")))
+"""
+
+
+def local_inventory(*host_names, **host_vars):
+    return {
+        "all": {
+            "hosts": {name: dict(ansible_connection="local", **host_vars.get(name, {})) for name in host_names}
+        }
+    }
+
+
+@pytest.fixture
+def modules(tmp_path):
+    module_dir = tmp_path / "modules"
+    module_dir.mkdir()
+    for name, source in (("echo", ECHO), ("sleep", SLEEP), ("fail", FAIL)):
+        (module_dir / f"{name}.py").write_text(source)
+    return str(module_dir)
+
+
+@pytest.fixture
+def state(tmp_path, modules):
+    loop = asyncio.new_event_loop()
+    state = {
+        "inventory": local_inventory("web1", "web2", "db1"),
+        "modules": [modules],
+        "gate_cache": {},
+        "gate": None,
+        "loop": loop,
+        "console": None,
+        "log": None,
+        "data_dir": str(tmp_path / "data"),
+        "workspace": str(tmp_path),
+    }
+    yield state
+    if loop.is_running():
+        loop.call_soon_threadsafe(loop.stop)
+        thread = state.get("loop_thread")
+        if thread is not None:
+            thread.join(5)
+    if not loop.is_running():
+        loop.close()
+
+
+@pytest.fixture
+def running_loop(state):
+    """Run the loop of state in a thread the way the agent entry points do."""
+
+    thread = threading.Thread(target=state["loop"].run_forever, daemon=True)
+    thread.start()
+    while not state["loop"].is_running():
+        pass
+    yield state["loop"]
+    state["loop"].call_soon_threadsafe(state["loop"].stop)
+    thread.join(5)
+
+
+def dumps(output):
+    return json.dumps(output, sort_keys=True, default=str)
@@ -0,0 +1,62 @@
+import pytest
+
+from ftl_tools.catalog import CATEGORIES, ToolCatalog, tool_catalog, words
+from ftl_tools.tools import FindTools
+
+
+@pytest.fixture(scope="module")
+def catalog():
+    return ToolCatalog()
+
+
+def test_words():
+    assert words("Install the packages with DnfTool") == {"install", "package", "dnf"}
+    assert words("access") == {"access"}
+    assert words(None) == set()
+
+
+def test_every_category_names_existing_tools(catalog):
+    for category, classes in CATEGORIES.items():
+        assert len(catalog.categories[category]) == len(set(classes)), category
+
+
+def test_search_ranks_names_first(catalog):
+    assert catalog.search("open a firewall port")[0] == "firewalld_tool"
+    assert catalog.search("install python packages with pip")[0] == "pip_tool"
+    assert catalog.search("zzz nothing matches") == []
+    assert "find_tools_tool" not in catalog.search()
+
+
+def test_search_filters(catalog):
+    packages = catalog.search(category="packages")
+    assert "dnf_tool" in packages and "slack_tool" not in packages
+    # Package runs dnf or apt, whichever the host uses
+    assert set(catalog.search(module="apt")) == {"apt_tool", "package_tool"}
+    assert "package_tool" in catalog.search(module="dnf")
+    assert set(catalog.search("restart a service", category="services")) == {"service_tool", "systemd_service_tool"}
+    assert len(catalog.search(category="services", limit=1)) == 1
+    with pytest.raises(Exception, match="Unknown category"):
+        catalog.search(category="nope")
+
+
+def test_describe(catalog):
+    described = catalog.describe("apt_tool")
+    assert described["module"] == "apt"
+    assert described["categories"] == ["packages"]
+    assert "\n" not in described["description"]
+
+
+def test_select_and_find_tools(state):
+    catalog = tool_catalog(state)
+    assert tool_catalog(state) is catalog
+    tools = catalog.select(state, query="open a firewall port", categories=["notifications"], names=["bash_tool"], limit=1)
+    assert list(tools) == ["bash_tool", "discord_tool", "slack_tool", "firewalld_tool", "find_tools_tool"]
+    with pytest.raises(Exception, match="Unknown tools"):
+        catalog.load(state, ["missing_tool"])
+
+    state["console"] = None
+    state["log"] = type("Log", (), {"write": lambda self, text: None})()
+    state["agent_tools"] = {"find_tools_tool": tools["find_tools_tool"]}
+    found = FindTools(state).forward(query="timezone")
+    assert found[0]["name"] == "timezone_tool"
+    assert "timezone_tool" in state["agent_tools"]
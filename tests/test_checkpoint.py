@@ -0,0 +1,123 @@
+import io
+
+import faster_than_light as ftl
+import pytest
+from rich.console import Console
+
+from ftl_tools.checkpoint import LOCAL, Checkpoint
+from ftl_tools.dispatch import run_module
+from ftl_tools.tools import Copy
+
+
+class Step:
+    """Tool that runs echo on its hosts, fail on those in failing, then raises if told to."""
+
+    def __init__(self, state, failing=(), raises=False):
+        self.state = state
+        self.failing = failing
+        self.raises = raises
+        self.calls = []
+
+    def forward(self, limit=None):
+        self.calls.append(list(limit))
+        output = run_module(self.state, "echo", limit=[h for h in limit if h not in self.failing])
+        failing = [h for h in limit if h in self.failing]
+        if failing:
+            output.update(run_module(self.state, "fail", limit=failing))
+        if self.raises:
+            raise Exception("interrupted")
+        return output
+
+
+class Local:
+    def __init__(self):
+        self.calls = 0
+
+    def forward(self):
+        self.calls += 1
+        return {"ok": True}
+
+
+def test_resume_after_failure(state):
+    tool = Step(state, failing=["db1"])
+    run = Checkpoint(state, "deploy")
+    output = run.step("install", tool, limit="all")
+    assert output["db1"]["failed"]
+    assert run.completed("install", "web1") and not run.completed("install", "db1")
+
+    # A new run of the sequence reads the checkpoint and only retries db1
+    tool.failing = []
+    again = Checkpoint(state, "deploy")
+    assert sorted(again.step("install", tool, limit="all")) == ["db1"]
+    assert tool.calls[-1] == ["db1"]
+    assert again.step("install", tool, limit="all") == {}
+    assert state.get("on_host_result") is None
+
+
+def test_hosts_are_recorded_before_the_step_ends(state):
+    run = Checkpoint(state, "deploy")
+    with pytest.raises(Exception, match="interrupted"):
+        run.step("install", Step(state, raises=True), limit=["web1", "web2"])
+    assert Checkpoint(state, "deploy").done == {("install", "web1"), ("install", "web2")}
+
+
+def test_later_failure_clears_a_host(state):
+    run = Checkpoint(state, "deploy")
+
+    class Twice(Step):
+        def forward(self, limit=None):
+            run_module(self.state, "echo", limit=limit)
+            return run_module(self.state, "fail", limit=limit)
+
+    run.step("install", Twice(state), limit=["web1"])
+    assert not run.completed("install", "web1")
+    assert not Checkpoint(state, "deploy").completed("install", "web1")
+
+
+def test_chains_on_host_result(state):
+    seen = []
+    state["on_host_result"] = lambda host_name, results: seen.append(host_name)
+    Checkpoint(state, "deploy").step("install", Step(state), limit=["web1"])
+    assert seen == ["web1"]
+    assert state["on_host_result"] is not None
+
+
+def test_local_steps_and_reset(state):
+    tool = Local()
+    run = Checkpoint(state, "deploy")
+    assert run.step("notify", tool) == {"ok": True}
+    assert run.step("notify", tool) == {}
+    assert run.completed("notify", LOCAL)
+    run.reset()
+    assert run.step("notify", tool) == {"ok": True}
+    assert tool.calls == 2
+
+
+def test_partial_line_is_ignored(state):
+    run = Checkpoint(state, "deploy")
+    run.mark("install", ["web1"])
+    with open(run.path, "a") as f:
+        f.write('{"step": "install", "ho')
+    assert Checkpoint(state, "deploy").done == {("install", "web1")}
+
+
+def test_resume_copy_step(state, tmp_path, monkeypatch):
+    copied = []
+
+    async def copy(inventory, gate_cache, src=None, dest=None):
+        hosts = [h for g in inventory.values() for h in g["hosts"]]
+        copied.extend(hosts)
+        return {h: dict(changed=True) if h != "db1" else dict(failed=True, msg="disk full") for h in hosts}
+
+    monkeypatch.setattr(ftl, "copy", copy, raising=False)
+    state["console"] = Console(file=io.StringIO())
+    (tmp_path / "app.conf").write_text("x=1\n")
+    with pytest.raises(Exception, match="disk full"):
+        Checkpoint(state, "deploy").step("config", Copy(state), src="app.conf", dest="/etc/app.conf")
+    assert sorted(copied) == ["db1", "web1", "web2"]
+
+    copied.clear()
+    with pytest.raises(Exception, match="disk full"):
+        Checkpoint(state, "deploy").step("config", Copy(state), src="app.conf", dest="/etc/app.conf")
+    # Only the host that failed is copied to again
+    assert copied == ["db1"]
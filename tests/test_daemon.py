@@ -0,0 +1,68 @@
+import io
+import threading
+import time
+
+import faster_than_light as ftl
+import pytest
+from rich.console import Console
+
+from ftl_tools.daemon import Daemon, DaemonClient, proxy_tools
+from ftl_tools.dispatch import start_loop_thread
+from ftl_tools.gates import prebuilt_gate
+
+
+@pytest.fixture
+def daemon(state, tmp_path, monkeypatch):
+    async def copy(inventory, gate_cache, src=None, dest=None):
+        return {h: dict(changed=True, src=src, dest=dest) for g in inventory.values() for h in g["hosts"]}
+
+    monkeypatch.setattr(ftl, "copy", copy, raising=False)
+    state["console"] = Console(file=io.StringIO())
+    start_loop_thread(state)
+    server = Daemon(state, str(tmp_path / "daemon.sock"), threshold=64)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    # The server is set once the socket is listening
+    while server.server is None:
+        time.sleep(0.01)
+    yield server
+    server.server.shutdown()
+    thread.join(5)
+
+
+@pytest.mark.parametrize("compress", [True, False])
+def test_calls_through_the_daemon(daemon, tmp_path, compress):
+    (tmp_path / "app.conf").write_text("x=1\n")
+    client = DaemonClient(daemon.path, compress=compress)
+    assert client.request(op="ping") == "pong"
+    assert (client.wire is not None) == compress
+
+    output = client.call("copy_tool", dict(src="app.conf", dest="/etc/app.conf", limit="web1"))
+    assert output == {"web1": dict(changed=True, src=str(tmp_path / "app.conf"), dest="/etc/app.conf")}
+    assert client.request(op="status")["tools"] == ["copy_tool"]
+    client.close()
+
+
+def test_plain_by_default(daemon):
+    client = DaemonClient(daemon.path)
+    assert client.request(op="ping") == "pong"
+    assert client.wire is None
+    client.close()
+
+
+def test_proxy_tools(daemon, tmp_path):
+    (tmp_path / "app.conf").write_text("x=1\n")
+    tools = proxy_tools({}, daemon.path)
+    output = tools["copy_tool"](src="app.conf", dest="/tmp/app.conf", limit="db1")
+    assert list(output) == ["db1"]
+    with pytest.raises(Exception, match="Unknown tool"):
+        tools["copy_tool"].state["daemon"].call("missing_tool", {})
+
+
+def test_prebuilt_gate(tmp_path):
+    gate = tmp_path / "gate.pyz"
+    gate.write_bytes(b"gate")
+    path, gate_hash = prebuilt_gate(str(gate))(interpreter="/usr/bin/python3")
+    assert path == str(gate) and len(gate_hash) == 64
+    with pytest.raises(Exception, match="does not exist"):
+        prebuilt_gate(str(tmp_path / "missing.pyz"))
@@ -0,0 +1,85 @@
+import asyncio
+
+from ftl_tools import dispatch
+from ftl_tools.dispatch import FORKS, loop_in_thread, run_module, run_until_complete, start_loop_thread, timed_out
+
+
+async def answer():
+    await asyncio.sleep(0)
+    return 42
+
+
+def test_idle_loop_is_driven_by_the_caller(state):
+    assert not loop_in_thread(state)
+    assert run_until_complete(state, answer()) == 42
+    assert not state["loop"].is_running()
+
+
+def test_loop_running_in_another_thread(state, running_loop):
+    assert loop_in_thread(state)
+    assert run_until_complete(state, answer()) == 42
+
+
+def test_loop_thread(state):
+    start_loop_thread(state)
+    assert loop_in_thread(state)
+    assert run_until_complete(state, answer()) == 42
+
+
+def test_run_module_on_idle_loop(state):
+    output = run_module(state, "echo", module_args=dict(x="1"))
+    assert sorted(output) == ["db1", "web1", "web2"]
+    assert output["web1"]["args"] == {"x": "1"}
+    assert output["web1"]["timing"]["gate"] == "cold"
+
+
+def test_run_module_on_running_loop(state, running_loop):
+    output = run_module(state, "echo", module_args=dict(x="1"), limit="web1")
+    assert list(output) == ["web1"]
+    assert output["web1"]["args"] == {"x": "1"}
+
+
+def test_host_args_and_templates(state):
+    output = run_module(
+        state,
+        "echo",
+        module_args=dict(name="{{ inventory_hostname }}", size="small"),
+        host_args={"db1": dict(size="large")},
+    )
+    assert output["web2"]["args"] == {"name": "web2", "size": "small"}
+    assert output["db1"]["args"] == {"name": "db1", "size": "large"}
+
+
+def test_timeout_fails_only_the_slow_host(state):
+    output = run_module(state, "sleep", host_args={"web1": dict(seconds=5)}, module_args=dict(seconds=0), timeout=1)
+    assert output["web1"]["timeout"] and output["web1"]["failed"]
+    assert not output["web2"].get("failed")
+
+
+def test_deadline_cancels_the_call(state):
+    output = run_module(state, "sleep", module_args=dict(seconds=5), deadline=0.5)
+    assert all(results["timeout"] for results in output.values())
+
+
+def test_timeout_exit_codes():
+    assert timed_out({"rc": 124}, 10, 10.2)
+    # The command ignored TERM and was killed after the grace period
+    assert timed_out({"rc": 137}, 10, 15.1)
+    # Killed before the timeout, by something else
+    assert not timed_out({"rc": 137}, 10, 2.0)
+    assert not timed_out({"rc": 1}, 10, 10.2)
+
+
+def test_forks_are_bounded_by_default(state, monkeypatch):
+    seen = []
+
+    async def run_hosts(state, inventory, module_name, module_args, host_args, dependencies, timeout, deadline, forks=None, spool_id=None):
+        seen.append(forks)
+        return {}
+
+    monkeypatch.setattr(dispatch, "run_hosts", run_hosts)
+    run_module(state, "echo")
+    state["forks"] = 0
+    run_module(state, "echo")
+    run_module(state, "echo", forks=5)
+    assert seen == [FORKS, 0, 5]
@@ -0,0 +1,61 @@
+import io
+import json
+import threading
+import time
+
+import pytest
+from rich.console import Console
+
+from ftl_tools.facts import fact_cache, gather_facts
+from ftl_tools.tools import Package
+
+
+def test_failed_probes_are_reported(state):
+    # The module directory of the tests has no command module, so every probe fails
+    failures = {}
+    assert gather_facts(state, ["web1"], failures=failures) == {"web1": {}}
+    assert failures["web1"]["failed"]
+    assert "command" in failures["web1"]["msg"]
+
+
+def test_package_passes_probe_failures_through(state):
+    state["console"] = Console(file=io.StringIO())
+    fact_cache(state).set("web2", {"pkg_mgr": "zypper"})
+    # The facts failure of web1 is reported as is, not as an unsupported package manager
+    with pytest.raises(Exception, match="ModuleNotFound: Module command not found"):
+        Package(state).forward(name="nginx", limit=["web1", "web2"])
+    with pytest.raises(Exception, match="Unsupported package manager zypper"):
+        Package(state).forward(name="nginx", limit=["web2"])
+
+
+def test_only_needed_facts_must_be_fresh(state):
+    cache = fact_cache(state)
+    now = time.time()
+    cache.set("web1", {"pkg_mgr": "dnf", "python3_dnf": "yes"}, now=now - 600)
+    cache.set("web1", {"disk_free_kb": 100}, now=now - 600)
+    assert cache.fresh("web1", keys=("pkg_mgr",))
+    assert not cache.fresh("web1")
+    assert not cache.fresh("web1", keys=("selinux",))
+    # Nothing is probed for the facts a caller needs, so nothing fails
+    failures = {}
+    assert gather_facts(state, ["web1"], failures=failures, keys=("pkg_mgr",))["web1"]["pkg_mgr"] == "dnf"
+    assert failures == {}
+    gather_facts(state, ["web1"], failures=failures)
+    assert list(failures) == ["web1"]
+
+
+def test_concurrent_saves(state):
+    cache = fact_cache(state)
+
+    def work(i):
+        for j in range(50):
+            cache.set(f"host{i}-{j}", {"pkg_mgr": "apt"})
+            cache.save()
+
+    threads = [threading.Thread(target=work, args=(i,)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    with open(cache.path) as f:
+        assert len(json.load(f)) == 200
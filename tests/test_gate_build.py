@@ -0,0 +1,85 @@
+import os
+import subprocess
+import sys
+import zipfile
+
+import pytest
+from faster_than_light.gate import use_gate
+
+from ftl_tools.gate_build import add_bytecode, build_gate, module_closure, slim_gate
+
+DEPENDENCIES = [
+    "ftl_module_utils @ git+https://github.com/benthomasson/ftl_module_utils@main",
+    "ftl_collections @ git+https://github.com/benthomasson/ftl-collections@main",
+]
+
+
+@pytest.fixture(autouse=True)
+def home(tmp_path, monkeypatch):
+    # build_ftl_gate caches its gates in ~/.ftl
+    monkeypatch.setenv("HOME", str(tmp_path / "home"))
+
+
+@pytest.fixture
+def gate_modules(modules):
+    with open(os.path.join(modules, "lineinfile.py"), "w") as f:
+        f.write("import os\nfrom ftl_module_utils.files import edit\nimport helper\n")
+    with open(os.path.join(modules, "helper.py"), "w") as f:
+        f.write("import json\n")
+    with open(os.path.join(modules, "command"), "w") as f:
+        f.write("#!/bin/sh\necho\n")
+    return modules
+
+
+def test_module_closure(gate_modules):
+    assert module_closure([gate_modules], "lineinfile", DEPENDENCIES) == (("helper", "lineinfile"), (DEPENDENCIES[0],))
+    assert module_closure([gate_modules], "echo", DEPENDENCIES) == (("echo",), ())
+    assert module_closure([gate_modules], "command", DEPENDENCIES) == (("command",), ())
+    assert module_closure([gate_modules], "missing", DEPENDENCIES) is None
+
+
+def test_build_gate_returns_path_and_hash(state, gate_modules):
+    path, gate_hash = build_gate(state, ("echo",), (), interpreter=sys.executable)
+    assert os.path.exists(path)
+    assert build_gate(state, ("echo",), (), interpreter=sys.executable) == (path, gate_hash)
+    assert build_gate(state, ("echo", "helper"), (), interpreter=sys.executable)[1] != gate_hash
+    names = zipfile.ZipFile(path).namelist()
+    assert "ftl_gate/echo.py" in names and "__main__.pyc" in names
+
+
+def test_bytecode_is_loaded_from_the_gate(tmp_path):
+    source = tmp_path / "app.pyz"
+    with zipfile.ZipFile(source, "w") as z:
+        z.writestr("mod.py", "X = 42\n")
+    dest = str(tmp_path / "app_bytecode.pyz")
+    add_bytecode(str(source), dest)
+    check = "import sys; sys.path.insert(0, sys.argv[1]); import mod; print(mod.X, mod.__file__.endswith('.pyc'))"
+    output = subprocess.check_output([sys.executable, "-c", check, dest], text=True)
+    assert output.split() == ["42", "True"]
+
+
+def test_slim_gate_is_a_gate_builder(state, gate_modules):
+    builder = slim_gate(state, "web1", "echo", DEPENDENCIES)
+    path, gate_hash = builder(interpreter=sys.executable)
+    assert os.path.exists(path)
+
+    # Used like the default gate of state, a use_gate partial
+    state["gate_cache"]["web1"] = object()
+    assert slim_gate(state, "web1", "echo", DEPENDENCIES) is builder
+    assert use_gate(path, gate_hash, interpreter=sys.executable) == builder(interpreter=sys.executable)
+
+
+def test_slim_gate_grows_with_the_modules_run(state, gate_modules, monkeypatch):
+    discarded = []
+    monkeypatch.setattr("ftl_tools.gate_build.discard_gate", lambda state, host_name: discarded.append(host_name))
+    slim_gate(state, "web1", "echo", DEPENDENCIES)
+    state["gate_cache"]["web1"] = object()
+    builder = slim_gate(state, "web1", "helper", DEPENDENCIES)
+    assert discarded == ["web1"]
+    assert state["gate_contents"]["web1"][0] == ("echo", "helper")
+    assert builder.args[1] == ("echo", "helper")
+
+
+def test_gate_started_before_slim_gates_is_kept(state, gate_modules):
+    state["gate_cache"]["web1"] = object()
+    assert slim_gate(state, "web1", "echo", DEPENDENCIES) is None
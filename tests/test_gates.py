@@ -0,0 +1,38 @@
+import threading
+import time
+from types import SimpleNamespace
+
+from ftl_tools.dispatch import start_loop_thread
+from ftl_tools.gates import GateKeeper, check_gates, gate_alive
+
+
+class Part:
+    def __init__(self, exit_status=None):
+        self.exit_status = exit_status
+        self.closed_on = None
+
+    def close(self):
+        self.closed_on = threading.current_thread()
+
+
+def gate(exit_status=None):
+    return SimpleNamespace(gate_process=Part(exit_status), conn=Part())
+
+
+def test_check_gates_discards_dead_and_idle(state):
+    state["gate_cache"] = {"web1": gate(), "web2": gate(exit_status=1), "db1": gate()}
+    state["gate_used"] = {"db1": time.monotonic() - 3600}
+    assert sorted(check_gates(state)) == ["db1", "web2"]
+    assert list(state["gate_cache"]) == ["web1"]
+    assert gate_alive(state["gate_cache"]["web1"])
+
+
+def test_keeper_maintains_gates_on_the_loop(state):
+    start_loop_thread(state)
+    dead = gate(exit_status=1)
+    state["gate_cache"] = {"web1": gate(), "web2": dead}
+    keeper = GateKeeper(state, interval=60, keepalive=300)
+    assert keeper.maintain() == []
+    assert list(state["gate_cache"]) == ["web1"]
+    assert dead.gate_process.closed_on is state["loop_thread"]
+    assert dead.conn.closed_on is state["loop_thread"]
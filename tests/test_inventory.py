@@ -0,0 +1,37 @@
+from ftl_tools.dispatch import run_module
+from ftl_tools.inventory import limit_hosts, limit_inventory
+
+
+def test_limit_patterns(state):
+    assert limit_hosts(state) == ["web1", "web2", "db1"]
+    assert limit_hosts(state, "") == ["web1", "web2", "db1"]
+    assert limit_hosts(state, "all:!db1") == ["web1", "web2"]
+    assert limit_hosts(state, "web*") == ["web1", "web2"]
+    assert limit_hosts(state, ["db1", "missing"]) == ["db1"]
+
+
+def test_empty_list_selects_no_hosts(state):
+    assert limit_hosts(state, []) == []
+    assert limit_inventory(state, []) == {}
+    assert run_module(state, "echo", limit=[]) == {}
+
+
+def test_exclusions_alone_start_from_every_host(state):
+    assert limit_hosts(state, "!web2") == ["web1", "db1"]
+    assert limit_hosts(state, "&web*") == ["web1", "web2"]
+
+
+def test_host_replaced_in_place(state):
+    hosts = state["inventory"]["all"]["hosts"]
+    assert limit_hosts(state, "db*") == ["db1"]
+    hosts["db2"] = hosts.pop("db1")
+    assert limit_hosts(state, "db*") == ["db2"]
+    assert list(limit_inventory(state, "db*")["all"]["hosts"]) == ["db2"]
+
+
+def test_index_follows_new_groups(state):
+    state["inventory"]["db"] = {"hosts": {"db9": {"ansible_connection": "local"}}, "vars": {"role": "db"}}
+    assert limit_hosts(state, "db") == ["db9"]
+    assert limit_inventory(state, "db") == {"db": state["inventory"]["db"]}
+    del state["inventory"]["db"]
+    assert limit_hosts(state, "db") == []
@@ -0,0 +1,70 @@
+import pytest
+
+from ftl_tools.dispatch import run_module
+from ftl_tools.journal import Journal, args_hash, current_call, enable_journal, journaled
+from ftl_tools.retry import RetryPolicy
+
+
+@journaled
+class Echo:
+    name = "echo_tool"
+    module = "echo"
+
+    def __init__(self, state):
+        self.state = state
+
+    def forward(self, limit=None, token: str = None):
+        run_module(self.state, "echo", module_args=dict(changed=True), limit=limit)
+        return run_module(self.state, "fail", limit=limit)
+
+
+def test_one_row_per_host_per_dispatch(state):
+    journal = enable_journal(state)
+    Echo(state).forward(limit=["web1", "db1"], token="secret")
+    rows = journal.query(tool="echo_tool")
+    assert len(rows) == 4
+    assert {r["call_id"] for r in rows} == {rows[0]["call_id"]}
+    assert {(r["host"], r["status"], r["changed"]) for r in rows} == {
+        ("web1", "changed", 1),
+        ("db1", "changed", 1),
+        ("web1", "failed", 0),
+        ("db1", "failed", 0),
+    }
+    assert all(r["elapsed"] is not None and r["output_bytes"] > 0 for r in rows)
+    # Arguments are stored as a hash only
+    assert rows[0]["args_hash"] == args_hash(limit=["web1", "db1"], token="secret")
+    assert journal.last("web1")["status"] == "failed"
+    assert current_call.get() is None
+
+
+def test_query_filters_and_summary(state):
+    journal = enable_journal(state)
+    Echo(state).forward(limit=["web1"])
+    run_module(state, "echo", limit=["web2"])
+    assert [r["host"] for r in journal.query(status="failed")] == ["web1"]
+    assert journal.query(since=-3600, limit=1)[0]["host"] == "web2"
+    assert journal.query(until=0) == []
+    # Dispatches outside a tool call are journaled without one
+    assert journal.last("web2")["tool"] is None
+    summary = journal.summary(by="host")
+    assert {host: s["count"] for host, s in summary.items()} == {"web1": 2, "web2": 1}
+    assert journal.summary(by="status", tool="echo_tool")["failed"]["count"] == 1
+    with pytest.raises(Exception, match="Cannot group"):
+        journal.summary(by="msg; DROP TABLE runs")
+    with pytest.raises(Exception, match="Unknown journal column"):
+        journal.summary(nope=1)
+
+
+def test_retries_record_attempts(state):
+    journal = enable_journal(state)
+    run_module(state, "fail", limit=["web1"], retry=RetryPolicy(attempts=2, backoff=0, retry_on=("timed out",)))
+    assert [r["attempts"] for r in journal.query(host="web1")] == [2, 1]
+
+
+def test_rows_survive_reopening(tmp_path):
+    path = str(tmp_path / "journal.sqlite")
+    journal = Journal(path)
+    journal.record({"id": "c1", "tool": "t"}, {"web1": {"changed": True, "msg": "x" * 1000}, "skipped": "not a host"}, 0.5)
+    journal.close()
+    (row,) = Journal(path).query()
+    assert row["call_id"] == "c1" and row["elapsed"] == 0.5 and len(row["msg"]) == 500
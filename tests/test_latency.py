@@ -0,0 +1,56 @@
+from ftl_tools.dispatch import run_module
+from ftl_tools.latency import LatencyHistogram, LatencyTracker, latency_tracker
+
+
+def test_histogram_quantiles():
+    histogram = LatencyHistogram(window=1000)
+    assert histogram.quantile(0.5) is None
+    for _ in range(90):
+        histogram.add(0.003)
+    for _ in range(10):
+        histogram.add(1.5)
+    # Buckets are bounded by powers of two milliseconds
+    assert histogram.quantile(0.5) == 0.004
+    assert histogram.quantile(0.99) == 2.048
+    assert histogram.as_dict()["buckets"] == {"le_4ms": 90, "le_2048ms": 10}
+
+
+def test_histogram_fades_old_samples():
+    histogram = LatencyHistogram(window=4)
+    for _ in range(4):
+        histogram.add(1.0)
+    assert histogram.counts[10] == 2
+    assert histogram.samples == 4
+
+
+def test_stragglers():
+    tracker = LatencyTracker()
+    for _ in range(5):
+        tracker.record("command", "web1", 0.1)
+        tracker.record("command", "web2", 0.1)
+        tracker.record("command", "web3", 0.1)
+        tracker.record("command", "db1", 2.0)
+        # Cold runs pay for connecting and are left out
+        tracker.record("command", "web2", 5.0, cold=True)
+    assert tracker.stragglers() == [("db1", 2.048, 0.128)]
+    assert tracker.report()["stragglers"] == ["db1"]
+    assert tracker.report()["modules"]["command"]["samples"] == 25
+
+
+def test_stragglers_need_enough_samples():
+    tracker = LatencyTracker()
+    for host_name, seconds in (("web1", 0.1), ("web2", 0.1), ("db1", 2.0)):
+        for _ in range(4):
+            tracker.record("command", host_name, seconds)
+    assert tracker.stragglers() == []
+    assert tracker.stragglers(min_samples=4) == [("db1", 2.048, 0.128)]
+
+
+def test_dispatch_records_latency(state):
+    output = run_module(state, "echo")
+    tracker = latency_tracker(state)
+    assert sorted(tracker.cold_hosts) == ["db1", "web1", "web2"]
+    assert tracker.modules["echo"].samples == 3
+    assert output["web1"]["timing"]["gate"] == "cold"
+    run_module(state, "echo", limit=["web1"])
+    assert tracker.modules["echo"].samples == 4
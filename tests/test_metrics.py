@@ -0,0 +1,67 @@
+import json
+import threading
+
+from ftl_tools.dispatch import run_module
+from ftl_tools.metrics import Metrics, enable_metrics, instrument
+
+
+@instrument
+class Echo:
+    name = "echo_tool"
+
+    def __init__(self, state):
+        self.state = state
+
+    def forward(self, limit=None):
+        return run_module(self.state, "echo", module_args=dict(text="x" * 10), limit=limit)
+
+
+def test_tool_calls_are_exported(state):
+    metrics = enable_metrics(state)
+    Echo(state).forward(limit=["web1", "web2"])
+    with open(metrics.prometheus_file) as f:
+        text = f.read()
+    assert 'ftl_tools_tool_calls_total{tool="echo_tool"} 1' in text
+    assert 'ftl_tools_hosts_contacted_total{module="echo"} 2' in text
+    assert "ftl_tools_bytes_received_total" in text
+    with open(metrics.trace_file) as f:
+        events = [json.loads(line) for line in f]
+    assert [e["event"] for e in events].count("host") == 2
+    assert events[-1]["event"] == "tool"
+
+
+def test_export_errors_do_not_fail_the_call(state, tmp_path):
+    state["metrics"] = Metrics(str(tmp_path / "missing" / "metrics.prom"))
+    assert sorted(Echo(state).forward(limit=["web1"])) == ["web1"]
+
+
+def test_record_while_exporting(tmp_path):
+    metrics = Metrics(str(tmp_path / "metrics.prom"), str(tmp_path / "trace.jsonl"))
+    stop = threading.Event()
+
+    def record():
+        i = 0
+        while not stop.is_set():
+            metrics.host_result(f"module{i % 500}", "web1", 0.01, False, {"changed": True, "stdout": "ok"})
+            i += 1
+
+    thread = threading.Thread(target=record)
+    thread.start()
+    try:
+        for _ in range(50):
+            metrics.tool_call("echo_tool", 0.1, False)
+    finally:
+        stop.set()
+        thread.join()
+    metrics.export()
+    with open(metrics.trace_file) as f:
+        hosts = sum(1 for line in f if '"host"' in line)
+    assert hosts == sum(v for (name, _), v in metrics.counters.items() if name == "ftl_tools_hosts_contacted_total")
+
+
+def test_received_bytes_count_spooled_output(tmp_path):
+    metrics = Metrics()
+    results = {"stdout": "preview", "stdout_spool": {"bytes": 1000}, "stderr": "err"}
+    metrics.host_result("command", "web1", 0.1, True, results)
+    assert metrics.counters[("ftl_tools_bytes_received_total", (("module", "command"),))] == 1003
+    assert metrics.counters[("ftl_tools_gate_cache_misses_total", (("module", "command"),))] == 1
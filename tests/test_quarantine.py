@@ -0,0 +1,57 @@
+import asyncssh
+import faster_than_light as ftl
+import pytest
+
+from ftl_tools.dispatch import run_module
+from ftl_tools.quarantine import Quarantine, host_quarantine, is_unreachable
+
+
+def test_module_failures_are_not_unreachable():
+    assert not is_unreachable(dict(failed=True, msg="Connection timed out while downloading repomd.xml"))
+    assert not is_unreachable(dict(failed=True, msg="curl: (7) Failed to connect: Connection refused"))
+    assert not is_unreachable(dict(failed=True, timeout=True, msg="exceeded the 10s timeout"))
+    assert is_unreachable(dict(failed=True, unreachable=True, msg="[Errno 111] Connection refused"))
+
+
+def test_failing_module_does_not_quarantine(state):
+    output = run_module(state, "fail", limit="web1")
+    assert output["web1"]["failed"] and not output["web1"].get("unreachable")
+    assert not host_quarantine(state).hosts
+
+
+@pytest.mark.parametrize(
+    "error",
+    [
+        ConnectionRefusedError(111, "Connection refused"),
+        OSError(113, "No route to host"),
+        asyncssh.PermissionDenied("Permission denied"),
+        asyncssh.ConnectionLost("Connection lost"),
+    ],
+)
+def test_transport_errors_quarantine(state, monkeypatch, error):
+    async def run_module_raising(inventory, *args, **kwargs):
+        raise error
+
+    monkeypatch.setattr(ftl, "run_module", run_module_raising)
+    output = run_module(state, "echo", limit="web1")
+    assert output["web1"]["unreachable"]
+    assert set(host_quarantine(state).hosts) == {"web1"}
+
+    # The next call skips the host without contacting it
+    monkeypatch.undo()
+    output = run_module(state, "echo", limit="web1,web2")
+    assert output["web1"]["quarantined"]
+    assert output["web2"]["args"] == {}
+
+
+def test_backoff_doubles_and_success_releases():
+    quarantine = Quarantine(base_delay=10, max_delay=25)
+    quarantine.record_failure("web1", now=0)
+    assert quarantine.quarantined(["web1", "web2"], now=5) == {"web1"}
+    assert not quarantine.quarantined(["web1"], now=11)
+    quarantine.record_failure("web1", now=11)
+    assert quarantine.hosts["web1"]["until"] == 31
+    quarantine.record_failure("web1", now=31)
+    assert quarantine.hosts["web1"]["until"] == 56
+    quarantine.record_success("web1")
+    assert not quarantine.hosts
@@ -0,0 +1,47 @@
+import pytest
+
+from ftl_tools.retry import DOWNLOAD_RETRY, RetryPolicy
+
+
+@pytest.mark.parametrize(
+    "results",
+    [
+        {"unreachable": True, "msg": "Connection refused"},
+        {"failed": True, "msg": "Connection timed out while downloading the mirror list"},
+        {"failed": True, "msg": "Curl error (28): Timeout was reached for https://mirror/repomd.xml"},
+        {"failed": True, "msg": "ReadTimeoutError: HTTPSConnectionPool(host='pypi.org'): Read timed out."},
+        {"failed": True, "msg": "Failed to download metadata for repo 'appstream'"},
+        {"failed": True, "msg": "Status code was 503 and not [200]: HTTP Error 503: Service Unavailable"},
+        {"failed": True, "status_code": 503, "msg": "Request failed"},
+    ],
+)
+def test_download_retry_transient_errors(results):
+    assert DOWNLOAD_RETRY.should_retry(results)
+
+
+@pytest.mark.parametrize(
+    "results",
+    [
+        {"failed": True, "timeout": True, "msg": "exceeded the 600s timeout"},
+        {"failed": True, "msg": "No match for argument: nginx-missing"},
+        {"failed": True, "msg": "No package nginx-1.25.3-1.el9.x86_64 available, checksum 5035a1"},
+        {"failed": True, "status_code": 404, "msg": "Status code was 404 and not [200]: HTTP Error 404: Not Found"},
+        {"failed": True, "unreachable": True, "quarantined": True, "msg": "quarantined"},
+        {"changed": True},
+    ],
+)
+def test_download_retry_skips_other_failures(results):
+    assert not DOWNLOAD_RETRY.should_retry(results)
+
+
+def test_timeout_class():
+    policy = RetryPolicy(retry_on=("timeout",))
+    assert policy.should_retry({"failed": True, "timeout": True, "msg": "exceeded the 60s timeout"})
+    assert not policy.should_retry({"failed": True, "msg": "exit status 1"})
+
+
+def test_delay_backs_off():
+    policy = RetryPolicy(backoff=1.0, max_backoff=4.0)
+    assert 1.0 <= policy.delay(1) <= 1.1
+    assert 2.0 <= policy.delay(2) <= 2.2
+    assert 4.0 <= policy.delay(5) <= 4.4
@@ -0,0 +1,38 @@
+import io
+
+import faster_than_light as ftl
+import pytest
+from rich.console import Console
+
+from ftl_tools.dispatch import run_ftl
+from ftl_tools.tools import Mkdir
+
+
+@pytest.fixture
+def ftl_mkdir(monkeypatch):
+    calls = []
+
+    async def mkdir(inventory, gate_cache, name=None):
+        calls.append(name)
+        return {host_name: dict(changed=True, path=name) for group in inventory.values() for host_name in group["hosts"]}
+
+    monkeypatch.setattr(ftl, "mkdir", mkdir, raising=False)
+    return calls
+
+
+def test_name_argument_reaches_the_helper(state, ftl_mkdir):
+    output = run_ftl(state, "mkdir", state["inventory"], state["gate_cache"], name="/tmp/x")
+    assert ftl_mkdir == ["/tmp/x"]
+    assert output["web1"] == dict(changed=True, path="/tmp/x")
+
+
+def test_running_loop(state, running_loop, ftl_mkdir):
+    output = run_ftl(state, "mkdir", state["inventory"], state["gate_cache"], name="/tmp/y")
+    assert output["db1"]["path"] == "/tmp/y"
+
+
+def test_mkdir_tool(state, ftl_mkdir):
+    state["console"] = Console(file=io.StringIO())
+    output = Mkdir(state)(name="/srv/app", limit="web1")
+    assert ftl_mkdir == ["/srv/app"]
+    assert list(output) == ["web1"]
@@ -0,0 +1,42 @@
+from ftl_tools.dispatch import run_module
+from ftl_tools.schedule import DurationHistory, duration_history
+
+
+def test_moving_average():
+    history = DurationHistory(alpha=0.5)
+    history.update("dnf", "web1", 10.0)
+    assert history.estimate("dnf", "web1") == 10.0
+    history.update("dnf", "web1", 20.0)
+    assert history.estimate("dnf", "web1") == 15.0
+    assert history.estimate("dnf", "web2", default=1.0) == 1.0
+
+
+def test_longest_first():
+    history = DurationHistory()
+    assert history.longest_first("dnf", ["web1", "web2"]) == ["web1", "web2"]
+    history.update("dnf", "web1", 1.0)
+    history.update("dnf", "db1", 9.0)
+    # web2 has no history and is expected to take the mean of 5 seconds
+    assert history.longest_first("dnf", ["web1", "web2", "db1"]) == ["db1", "web2", "web1"]
+
+
+def test_saved_between_sessions(tmp_path):
+    path = str(tmp_path / "durations.json")
+    history = DurationHistory(path)
+    history.update("dnf", "web1", 3.0)
+    history.save()
+    assert DurationHistory(path).estimate("dnf", "web1") == 3.0
+
+
+def test_dispatch_starts_the_slowest_hosts_first(state):
+    history = duration_history(state)
+    for host_name, seconds in (("web1", 1.0), ("web2", 2.0), ("db1", 3.0)):
+        history.update("sleep", host_name, seconds)
+    finished = []
+    state["on_host_result"] = lambda host_name, results: finished.append(host_name)
+    output = run_module(state, "sleep", module_args=dict(seconds=0), forks=1)
+    assert finished == ["db1", "web2", "web1"]
+    # The results keep the order of the inventory
+    assert list(output) == ["web1", "web2", "db1"]
+    assert history.estimate("sleep", "db1") < 3.0
+    assert DurationHistory(history.path).estimate("sleep", "db1") == history.estimate("sleep", "db1")
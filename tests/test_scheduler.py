@@ -0,0 +1,25 @@
+from ftl_tools.dispatch import run_module
+from ftl_tools.latency import latency_tracker
+from ftl_tools.quarantine import host_quarantine
+from ftl_tools.scheduler import enable_scheduler, session_state
+
+
+def test_sessions_share_lazy_stores(state):
+    enable_scheduler(state, capacity=4)
+    a = session_state(state, "a")
+    b = session_state(state, "b", priority="high")
+    assert host_quarantine(a) is host_quarantine(b) is host_quarantine(state)
+    assert latency_tracker(a) is latency_tracker(b)
+    assert a["facts"] is b["facts"]
+    assert a["durations"] is b["durations"]
+
+    run_module(a, "echo", limit="web1")
+    run_module(b, "echo", limit="web2")
+    assert {"web1", "web2"} <= set(state["gate_used"])
+
+
+def test_does_not_start_a_second_thread_on_a_running_loop(state, running_loop):
+    enable_scheduler(state)
+    assert state.get("loop_thread") is None
+    output = run_module(session_state(state, "a"), "echo", limit="db1")
+    assert list(output) == ["db1"]
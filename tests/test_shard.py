@@ -0,0 +1,51 @@
+import threading
+
+import pytest
+
+from ftl_tools.dispatch import run_module
+from ftl_tools.latency import latency_tracker
+from ftl_tools.metrics import enable_metrics
+from ftl_tools.quarantine import host_quarantine
+from ftl_tools.shard import enable_sharding
+
+
+@pytest.fixture
+def pool(state):
+    pool = enable_sharding(state, workers=2)
+    yield pool
+    pool.close()
+
+
+def test_hosts_are_streamed_and_merged(state, pool):
+    seen = []
+    state["on_host_result"] = lambda host_name, results: seen.append(host_name)
+    output = run_module(state, "echo", module_args=dict(name="x"))
+    assert list(output) == ["web1", "web2", "db1"]
+    assert all(r["args"] == {"name": "x"} for r in output.values())
+    # Each host is reported once, as it finishes
+    assert sorted(seen) == ["db1", "web1", "web2"]
+
+
+def test_quarantine_latency_and_metrics_stay_in_this_process(state, pool):
+    metrics = enable_metrics(state)
+    host_quarantine(state).record_failure("db1", "No route to host")
+    output = run_module(state, "echo")
+    assert output["db1"]["quarantined"]
+    assert not output["web1"].get("failed")
+    assert sorted(latency_tracker(state).cold_hosts) == ["web1", "web2"]
+    assert metrics.counters[("ftl_tools_hosts_contacted_total", (("module", "echo"),))] == 2
+
+
+def test_sessions_share_the_workers(state, pool):
+    outputs = {}
+
+    def call(host_name):
+        outputs[host_name] = run_module(state, "sleep", module_args=dict(seconds=0.5), limit=[host_name])
+
+    threads = [threading.Thread(target=call, args=(h,)) for h in ("web1", "web2", "db1")]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert {h: list(o) for h, o in outputs.items()} == {"web1": ["web1"], "web2": ["web2"], "db1": ["db1"]}
+    assert not pool.calls
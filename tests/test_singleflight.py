@@ -0,0 +1,70 @@
+import threading
+
+from ftl_tools.dispatch import run_module
+from ftl_tools.scheduler import enable_scheduler, session_state
+from ftl_tools.singleflight import coalesced, single_flight
+
+
+class Sleep:
+    name = "sleep_tool"
+    module = "sleep"
+
+    def __init__(self, state):
+        self.state = state
+        self.calls = 0
+
+    def forward(self, seconds: float, limit=None):
+        self.calls += 1
+        return run_module(self.state, "sleep", module_args=dict(seconds=seconds), limit=limit)
+
+
+@coalesced
+class Converge(Sleep):
+    single_flight = True
+
+
+def test_tools_that_do_not_opt_in_are_not_wrapped():
+    forward = Sleep.forward
+    assert coalesced(Sleep) is Sleep
+    assert Sleep.forward is forward
+
+
+def concurrently(*calls):
+    results = [None] * len(calls)
+
+    def call(index, fn, kwargs):
+        results[index] = fn(**kwargs)
+
+    threads = [threading.Thread(target=call, args=(i, fn, kwargs)) for i, (fn, kwargs) in enumerate(calls)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_sessions_coalesce_identical_calls(state):
+    enable_scheduler(state)
+    first = Converge(session_state(state, "a"))
+    second = Converge(session_state(state, "b"))
+    assert first.state["single_flight_calls"] is second.state["single_flight_calls"]
+    flights = single_flight(state)
+    results = {}
+    leader = threading.Thread(target=lambda: results.update(whole=first.forward(seconds=0.5)))
+    leader.start()
+    while not flights.flights:
+        pass
+    part = second.forward(seconds=0.5, limit=["web1"])
+    leader.join()
+    whole = results["whole"]
+    assert sorted(whole) == ["db1", "web1", "web2"]
+    assert list(part) == ["web1"]
+    assert first.calls + second.calls == 1
+    assert flights.coalesced == 1
+
+
+def test_turned_off(state):
+    state["single_flight"] = False
+    tool = Converge(state)
+    concurrently((tool.forward, dict(seconds=0.2)), (tool.forward, dict(seconds=0.2)))
+    assert tool.calls == 2
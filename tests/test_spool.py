@@ -0,0 +1,56 @@
+import os
+
+from ftl_tools.dispatch import run_module
+from ftl_tools.journal import current_call
+from ftl_tools.spool import SpooledOutput, spool_output
+
+BIG = """\
+#!/usr/bin/env python3
+# WANT_JSON
+import json
+
+lines = [f"line {i}" for i in range(1000)]
+print(json.dumps(dict(changed=False, stdout="\\n".join(lines), stderr="\\n".join(reversed(lines)))))
+"""
+
+
+def test_hosts_of_a_dispatch_share_a_directory(state, modules):
+    with open(os.path.join(modules, "big.py"), "w") as f:
+        f.write(BIG)
+    state["spool_threshold"] = 1000
+    output = run_module(state, "big")
+    handles = [r[f"{s}_spool"]["handle"] for r in output.values() for s in ("stdout", "stderr")]
+    assert len(handles) == 6
+    assert len({h.split("/")[0] for h in handles}) == 1
+    assert output["web1"]["stdout"].startswith("line 0\n")
+    assert "lines omitted" in output["web1"]["stdout"]
+
+    # A later dispatch gets a directory of its own
+    again = run_module(state, "big", limit=["web1"])
+    assert again["web1"]["stdout_spool"]["handle"].split("/")[0] != handles[0].split("/")[0]
+
+
+def test_spool_id(state):
+    text = "x\n" * 100
+    results = spool_output(dict(state, spool_threshold=10), "web1", dict(stdout=text, stdout_lines=[]), "call1")
+    assert results["stdout_spool"] == dict(handle="call1/web1.stdout", bytes=200, lines=101)
+    assert "stdout_lines" not in results
+
+    token = current_call.set({"id": "journaled"})
+    try:
+        results = spool_output(dict(state, spool_threshold=10), "web1", dict(stdout=text))
+    finally:
+        current_call.reset(token)
+    assert results["stdout_spool"]["handle"] == "journaled/web1.stdout"
+
+    results = spool_output(dict(state, spool_threshold=None), "web1", dict(stdout=text))
+    assert results == dict(stdout=text)
+
+
+def test_spooled_output(state):
+    text = "\n".join(f"line {i}" for i in range(50))
+    spool_output(dict(state, spool_threshold=10), "web1", dict(stdout=text), "call1")
+    with SpooledOutput(state, "call1/web1.stdout") as spooled:
+        assert spooled.lines(10, 2) == ["line 10", "line 11"]
+        assert spooled.grep(r"line 4\d", limit=2) == [(40, "line 40"), (41, "line 41")]
+        assert spooled.read(0, 6) == "line 0"
@@ -0,0 +1,71 @@
+import io
+import json
+import os
+
+import faster_than_light as ftl
+import pytest
+from rich.console import Console
+
+from ftl_tools.spool import spool_dir
+from ftl_tools.summary import excerpt, is_host_output, summarize, trim
+from ftl_tools.tools import Copy
+
+
+def output(hosts=30, failed=()):
+    return {
+        f"web{i}": dict(failed=True, msg="x" * 500 + "disk full") if f"web{i}" in failed else dict(changed=i % 2 == 0, rc=0)
+        for i in range(hosts)
+    }
+
+
+def test_full_is_unchanged(state):
+    out = output(3)
+    assert summarize(state, out) is out
+
+
+def test_summary(state):
+    summary = summarize(state, output(50, failed=["web3"]), "summary")
+    assert summary["hosts"] == 50
+    assert summary["status"] == {"changed": 25, "ok": 24, "failed": 1}
+    assert len(summary["changed"]) == 21 and summary["changed"][-1] == "... 5 more"
+    assert summary["failed"]["web3"].endswith("disk full") and len(summary["failed"]["web3"]) == 303
+    assert sum(g["count"] for g in summary["results"]) == 50
+    with open(os.path.join(spool_dir(state), summary["detail"])) as f:
+        assert len(json.load(f)) == 50
+
+
+def test_brief_leaves_out_results(state):
+    summary = summarize(state, output(3), "brief")
+    assert "results" not in summary and summary["status"] == {"changed": 2, "ok": 1}
+
+
+def test_unknown_verbosity(state):
+    with pytest.raises(Exception, match="Unknown verbosity"):
+        summarize(state, output(1), "loud")
+
+
+def test_facts_are_not_host_results(state):
+    facts = {"web1": {"pkg_mgr": "dnf", "os_family": "RedHat"}}
+    assert not is_host_output(facts)
+    assert summarize(state, facts, "brief") is facts
+
+
+def test_trim_and_excerpt():
+    assert excerpt("abc", 2) == "...bc"
+    assert trim({"stdout": "x" * 10, "stdout_lines": ["x"]}, 4) == {"stdout": "xxxx... (10 characters)"}
+
+
+def test_failed_call_raises_the_summary(state, tmp_path, monkeypatch):
+    async def copy(inventory, gate_cache, src=None, dest=None):
+        hosts = [h for g in inventory.values() for h in g["hosts"]]
+        return {h: dict(failed=True, msg="disk full") if h == "db1" else dict(changed=True) for h in hosts}
+
+    monkeypatch.setattr(ftl, "copy", copy, raising=False)
+    state["console"] = Console(file=io.StringIO())
+    state["verbosity"] = "brief"
+    (tmp_path / "app.conf").write_text("x=1\n")
+    with pytest.raises(Exception) as raised:
+        Copy(state).forward(src="app.conf", dest="/etc/app.conf")
+    summary = json.loads(str(raised.value))
+    assert summary["status"] == {"changed": 2, "failed": 1}
+    assert summary["failed"] == {"db1": "disk full"}
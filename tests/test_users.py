@@ -0,0 +1,115 @@
+import json
+import os
+import subprocess
+
+import pytest
+
+from ftl_tools.tools.authorized_key import authorized_keys_script, report_changes
+from ftl_tools.tools.user import users_script
+
+# Stands in for the account commands, keeping users and groups in $FAKE_DB
+FAKE = """\
+#!/usr/bin/env python3
+import json
+import os
+import sys
+
+path = os.environ["FAKE_DB"]
+with open(path) as f:
+    db = json.load(f)
+command, args = os.path.basename(sys.argv[0]), sys.argv[1:]
+users, groups = db["users"], db["groups"]
+if command == "getent":
+    if args[0] == "group":
+        sys.exit(0 if args[1] in groups else 2)
+    user = users.get(args[1])
+    if user is None:
+        sys.exit(2)
+    print(f"{args[1]}:x:1000:1000::{user['home']}:/bin/sh")
+elif command == "id":
+    user = users.get(args[-1])
+    if user is None:
+        sys.exit(1)
+    print({"-u": "1000", "-gn": user["group"], "-nG": " ".join([user["group"], *user["groups"]])}[args[0]])
+elif command == "groupadd":
+    groups.append(args[0])
+elif command == "useradd":
+    users[args[-1]] = dict(group=args[args.index("-g") + 1], groups=[], home=os.path.join(db["homes"], args[-1]))
+elif command == "usermod":
+    if args[0] == "-g":
+        users[args[2]]["group"] = args[1]
+    else:
+        users[args[2]]["groups"].append(args[1])
+elif command == "install":
+    os.makedirs(args[-1], exist_ok=True)
+with open(path, "w") as f:
+    json.dump(db, f)
+"""
+
+
+@pytest.fixture
+def shell(tmp_path):
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    for command in ("getent", "id", "groupadd", "useradd", "usermod", "install", "chown"):
+        (bin_dir / command).write_text(FAKE)
+        (bin_dir / command).chmod(0o755)
+    db = tmp_path / "db.json"
+    (tmp_path / "homes").mkdir()
+    db.write_text(json.dumps(dict(users={}, groups=[], homes=str(tmp_path / "homes"))))
+    env = dict(os.environ, PATH=f"{bin_dir}:{os.environ['PATH']}", FAKE_DB=str(db))
+
+    def run(lines):
+        process = subprocess.run(["sh", "-c", "\n".join(["set -e", *lines])], env=env, capture_output=True, text=True)
+        output = report_changes({"host": dict(rc=process.returncode, stdout=process.stdout, failed=process.returncode != 0)})
+        return output["host"], json.loads(db.read_text())
+
+    return run
+
+
+def test_users_script_is_idempotent(shell):
+    results, db = shell(users_script("alice", "staff", ["wheel"]))
+    assert results["changed"] and not results["failed"]
+    assert db["groups"] == ["staff", "wheel"]
+    assert db["users"]["alice"]["group"] == "staff" and db["users"]["alice"]["groups"] == ["wheel"]
+
+    results, db = shell(users_script("alice", "staff", ["wheel"]))
+    assert not results["changed"] and not results["failed"]
+
+
+def test_users_script_moves_an_existing_user(shell):
+    shell(users_script("alice", "staff"))
+    results, db = shell(users_script("alice", "admins"))
+    assert results["changed"]
+    assert db["users"]["alice"]["group"] == "admins"
+
+
+def test_authorized_keys_present_and_absent(shell, tmp_path):
+    shell(users_script("alice", "staff"))
+    keys = tmp_path / "homes" / "alice" / ".ssh" / "authorized_keys"
+    results, _ = shell(authorized_keys_script("alice", ["ssh-ed25519 AAAA alice@a", "ssh-ed25519 BBBB alice@b"]))
+    assert results["changed"]
+    assert keys.read_text().splitlines() == ["ssh-ed25519 AAAA alice@a", "ssh-ed25519 BBBB alice@b"]
+    results, _ = shell(authorized_keys_script("alice", ["ssh-ed25519 AAAA alice@a"]))
+    assert not results["changed"]
+
+    results, _ = shell(authorized_keys_script("alice", ["ssh-ed25519 AAAA alice@a"], state="absent"))
+    assert results["changed"]
+    assert keys.read_text().splitlines() == ["ssh-ed25519 BBBB alice@b"]
+    results, _ = shell(authorized_keys_script("alice", ["ssh-ed25519 AAAA alice@a"], state="absent"))
+    assert not results["changed"]
+
+
+def test_authorized_keys_for_a_missing_user(shell):
+    results, _ = shell(authorized_keys_script("bob", ["ssh-ed25519 AAAA bob@a"]))
+    assert results["failed"]
+    # Removing keys of a user that does not exist has nothing to do
+    lines = authorized_keys_script("bob", ["ssh-ed25519 AAAA bob@a"], state="absent") + ["echo next"]
+    results, _ = shell(lines)
+    assert not results["failed"] and not results["changed"]
+    assert results["stdout"] == "next\n"
+
+
+def test_unknown_state():
+    with pytest.raises(Exception, match="Unknown state"):
+        authorized_keys_script("alice", [], state="gone")
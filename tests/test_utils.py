@@ -0,0 +1,47 @@
+import io
+
+import pytest
+from rich.console import Console
+
+from ftl_tools.utils import HostsFailed, display_results, group_results, host_names, normalize_result
+
+
+def test_identical_results_are_grouped():
+    output = {
+        f"web{i}": dict(changed=True, msg="installed", timing=dict(elapsed=i / 10, gate="warm"), start=f"12:00:0{i}")
+        for i in range(5)
+    }
+    output["db1"] = dict(failed=True, msg="No match for argument: nginx")
+    output["db2"] = dict(changed=True, msg="installed", rc=0)
+    groups = group_results(output)
+    assert [(g["status"], g["count"]) for g in groups] == [("changed", 5), ("failed", 1), ("changed", 1)]
+    assert groups[0]["hosts"] == [f"web{i}" for i in range(5)]
+    # Timings and timestamps are left out of the shared result
+    assert groups[0]["result"] == dict(changed=True, msg="installed")
+
+
+def test_spool_handles_do_not_split_groups():
+    output = {
+        h: dict(changed=True, stdout_spool=dict(handle=f"call1/{h}.stdout", bytes=10, lines=2)) for h in ("web1", "web2")
+    }
+    (group,) = group_results(output)
+    assert group["count"] == 2
+    assert group["result"]["stdout_spool"] == dict(bytes=10, lines=2)
+    assert output["web1"]["stdout_spool"]["handle"] == "call1/web1.stdout"
+    assert normalize_result(output["web1"]) is not output["web1"]
+
+
+def test_host_names():
+    assert host_names(["web1", "web2"]) == "web1, web2"
+    assert host_names([f"web{i}" for i in range(12)], limit=2) == "web0, web1 and 10 more"
+
+
+def test_display_results_raises_for_failed_hosts():
+    console = Console(file=io.StringIO())
+    output = {"web1": dict(changed=True), "web2": dict(changed=True), "db1": dict(failed=True, msg="disk full")}
+    with pytest.raises(HostsFailed, match="disk full") as failed:
+        display_results(output, console, None)
+    assert failed.value.output is output
+
+    display_results({"web1": dict(changed=True), "web2": dict(changed=True)}, console, None)
+    assert "changed: [web1, web2]" in console.file.getvalue()
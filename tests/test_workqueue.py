@@ -0,0 +1,93 @@
+from conftest import local_inventory
+
+from ftl_tools.inventory import split_inventory
+from ftl_tools.workqueue import Worker, WorkQueue
+
+
+def submit(queue, call_id, *host_names):
+    inventories = split_inventory(local_inventory(*host_names))
+    queue.submit(call_id, "echo", inventories, {name: {"module_args": {"name": name}} for name in host_names})
+
+
+def test_lease_complete(tmp_path):
+    queue = WorkQueue(str(tmp_path / "queue.sqlite"))
+    submit(queue, "call", "web1", "web2")
+    tasks = queue.lease("w1")
+    assert sorted(task["host"] for task in tasks) == ["web1", "web2"]
+    assert tasks[0]["kwargs"]["module_args"]["name"] == tasks[0]["host"]
+    # Leased tasks are not handed to a second worker
+    assert queue.lease("w2") == []
+    for task in tasks:
+        assert queue.complete("w1", task["id"], {"changed": True, "host": task["host"]})
+    assert queue.remaining("call") == 0
+    assert queue.results("call") == {"web1": {"changed": True, "host": "web1"}, "web2": {"changed": True, "host": "web2"}}
+    assert queue.results("call", exclude={"web1": None}) == {"web2": {"changed": True, "host": "web2"}}
+
+
+def test_lease_one_call_at_a_time(tmp_path):
+    queue = WorkQueue(str(tmp_path / "queue.sqlite"))
+    submit(queue, "first", "web1")
+    submit(queue, "second", "web2")
+    assert [task["call_id"] for task in queue.lease("w1")] == ["first"]
+    assert [task["call_id"] for task in queue.lease("w1")] == ["second"]
+
+
+def test_expired_lease_is_fenced(tmp_path):
+    queue = WorkQueue(str(tmp_path / "queue.sqlite"))
+    submit(queue, "call", "web1")
+    (task,) = queue.lease("w1", lease_seconds=-1)
+    (again,) = queue.lease("w2")
+    assert again["id"] == task["id"]
+    # The first worker lost the lease and cannot complete the task
+    assert not queue.complete("w1", task["id"], {"changed": True})
+    assert queue.complete("w2", task["id"], {"changed": False})
+    assert queue.results("call") == {"web1": {"changed": False}}
+
+
+def test_max_attempts(tmp_path):
+    queue = WorkQueue(str(tmp_path / "queue.sqlite"), max_attempts=2)
+    submit(queue, "call", "web1")
+    queue.lease("w1", lease_seconds=-1)
+    queue.lease("w2", lease_seconds=-1)
+    assert queue.lease("w3") == []
+    result = queue.results("call")["web1"]
+    assert result["failed"]
+    assert "expired 2 times" in result["msg"]
+
+
+def test_renew_and_cancel(tmp_path):
+    queue = WorkQueue(str(tmp_path / "queue.sqlite"))
+    submit(queue, "call", "web1", "web2")
+    tasks = queue.lease("w1", lease_seconds=-1)
+    queue.renew("w1", [task["id"] for task in tasks], lease_seconds=60)
+    assert queue.lease("w2") == []
+    queue.cancel("call", "stopped")
+    assert queue.remaining("call") == 0
+    assert all(r["failed"] and r["msg"] == "stopped" for r in queue.results("call").values())
+    queue.purge("call")
+    assert queue.status() == {}
+
+
+def test_large_results_round_trip(tmp_path):
+    queue = WorkQueue(str(tmp_path / "queue.sqlite"))
+    submit(queue, "call", "web1")
+    (task,) = queue.lease("w1")
+    result = {"changed": False, "stdout": "x" * 100000}
+    assert queue.complete("w1", task["id"], result)
+    assert queue.results("call") == {"web1": result}
+
+
+def test_worker_run_once(tmp_path, modules):
+    path = str(tmp_path / "queue.sqlite")
+    queue = WorkQueue(path)
+    submit(queue, "call", "web1", "web2")
+    worker = Worker(path, [modules], data_dir=str(tmp_path / "data"), name="w1")
+    try:
+        assert worker.state["loop"].is_running() or worker.state["loop_thread"].is_alive()
+        assert worker.run_once() == 2
+        assert worker.run_once() == 0
+    finally:
+        worker.close()
+    results = queue.results("call")
+    assert sorted(results) == ["web1", "web2"]
+    assert results["web1"]["args"] == {"name": "web1"}
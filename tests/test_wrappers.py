@@ -0,0 +1,56 @@
+import threading
+
+from ftl_tools.dispatch import run_module, start_loop_thread
+from ftl_tools.journal import current_call, enable_journal, journaled
+from ftl_tools.metrics import instrument
+from ftl_tools.singleflight import coalesced
+from ftl_tools.summary import summarized
+
+
+def wrapped(cls):
+    for wrap in (instrument, journaled, coalesced, summarized):
+        wrap(cls)
+    return cls
+
+
+@wrapped
+class Echo:
+    name = "echo_tool"
+    module = "echo"
+
+    def __init__(self, state):
+        self.state = state
+
+    def forward(self, limit=None, label: str = None):
+        return run_module(self.state, "echo", module_args=dict(label=label), limit=limit)
+
+
+def test_pass_through_when_disabled(state):
+    output = Echo(state).forward(limit=["web1"], label="a")
+    assert output["web1"]["args"] == {"label": "a"}
+    assert current_call.get() is None
+    assert "call" not in state
+
+
+def test_journal_keeps_calls_apart_across_threads(state):
+    journal = enable_journal(state)
+    start_loop_thread(state)
+    tool = Echo(state)
+    threads = [threading.Thread(target=tool.forward, kwargs=dict(limit=[h], label=h)) for h in ("web1", "web2", "db1")]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    rows = journal.query(tool="echo_tool")
+    assert sorted(r["host"] for r in rows) == ["db1", "web1", "web2"]
+    # Each dispatch is journaled under the call that made it
+    assert len({r["call_id"] for r in rows}) == 3
+    assert current_call.get() is None
+
+
+def test_summary_verbosity(state):
+    state["verbosity"] = "brief"
+    summary = Echo(state).forward(label="a")
+    assert summary["hosts"] == 3
+    assert summary["status"] == {"ok": 3}
+    assert summary["detail"].endswith("/output.json")